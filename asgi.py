@@ -0,0 +1,10 @@
+"""
+ASGI entry point: the game routes run on an event loop, everything else is served by the Flask app.
+
+Usage:
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+from packages import create_app
+from packages.asgi import GameApp
+
+app = GameApp(create_app())
@@ -0,0 +1,106 @@
+"""
+Worker cold-start import-time check.
+
+Starts fresh interpreters with `-X importtime` that import `packages` and call `create_app()` the way a worker does,
+on an already migrated database, and parses their import-time reports. Prints the median time of the slowest top-level
+imports, the total import time and the time spent in `create_app()`. Exits with status 1 when the total import time
+exceeds `--budget` milliseconds, or when one of `LAZY_MODULES`, which must only be imported on first use, was
+imported during startup.
+
+Usage:
+    python -m benchmarks.import_time --budget 400 --repeat 5
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Heavy modules that only some requests need. Importing one at startup fails the check.
+LAZY_MODULES = ("markdown", "pygments", "PIL", "dateutil", "IPython")
+REPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+CHILD = """
+import time
+started = time.perf_counter()
+from packages import create_app
+imported = time.perf_counter()
+create_app({{"DATABASE": {database!r}}})
+print(f"{{(imported - started) * 1000:.3f}} {{(time.perf_counter() - imported) * 1000:.3f}}")
+"""
+
+
+def parse_report(stderr: str) -> dict:
+    """
+    Parses the `-X importtime` report of one interpreter.
+
+    Returns:
+        dict: 'top' maps each top-level import to its cumulative milliseconds, 'modules' is the set of every
+        imported module name.
+    """
+    top = {}
+    modules = set()
+    for line in stderr.splitlines():
+        match = REPORT_LINE.match(line)
+        if match is None:
+            continue
+        modules.add(match[4])
+        if not match[3]:
+            top[match[4]] = int(match[2]) / 1000
+    return {"top": top, "modules": modules}
+
+
+def measure(database: str) -> tuple:
+    """
+    Runs one cold start and returns its parsed report and the (import, create_app) wall milliseconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD.format(database=database)], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    import_ms, create_ms = (float(value) for value in result.stdout.split())
+    return parse_report(result.stderr), import_ms, create_ms
+
+
+def main(argv=None) -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--budget", type=float, default=400.0,
+                                 help="largest allowed total import time in milliseconds")
+    argument_parser.add_argument("--repeat", type=int, default=5, help="cold starts to take the median of")
+    argument_parser.add_argument("--top", type=int, default=15, help="top-level imports to list")
+    args = argument_parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="import-time-")
+    try:
+        database = os.path.join(workdir, "app.db")
+        # Apply the schema and migrations once, so the measured starts do the work of a worker restart.
+        subprocess.run([sys.executable, "-c", CHILD.format(database=database)], cwd=ROOT, check=True,
+                       capture_output=True)
+        runs = [measure(database) for _ in range(args.repeat)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    names = {name for report, _, _ in runs for name in report["top"]}
+    medians = {name: statistics.median(report["top"].get(name, 0.0) for report, _, _ in runs) for name in names}
+    total = statistics.median(sum(report["top"].values()) for report, _, _ in runs)
+    for name, milliseconds in sorted(medians.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:40} {milliseconds:8.1f} ms")
+    print(f"total imports {total:.1f} ms (budget {args.budget:.0f} ms), "
+          f"'from packages import create_app' {statistics.median(run[1] for run in runs):.1f} ms, "
+          f"create_app() {statistics.median(run[2] for run in runs):.1f} ms")
+    failed = False
+    eager = sorted({name for report, _, _ in runs for name in report["modules"]
+                    if name.split(".")[0] in LAZY_MODULES})
+    if eager:
+        print(f"FAIL imported at startup, should be lazy: {', '.join(eager[:10])}"
+              f"{' ...' if len(eager) > 10 else ''}")
+        failed = True
+    if total > args.budget:
+        print(f"FAIL total import time {total:.1f} ms exceeds the budget of {args.budget:.0f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Insert throughput benchmark.
+
+Compares the old create path of `POST /events/<module_id>` (insert, commit, then re-select the new row by its
+unindexed title) with the current one (insert, commit, `cursor.lastrowid`) on an event table that already holds
+a large number of rows. Both runs use the same pragmas as the connection pool.
+
+Usage:
+    python -m benchmarks.insert_throughput --rows 100000 --inserts 2000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "databases", "app.sql")
+INSERT_EVENT = ("INSERT INTO event (fk_module_id, event_date, event_title, event_image_url, event_description, event_date_key) "
+                "VALUES (?, ?, ?, ?, ?, ?)")
+
+
+def build(path: str, rows: int, migrated: bool) -> sqlite3.Connection:
+    """
+    Creates a database with `rows` events.
+
+    Args:
+        path (str): Path of the database file to create.
+        rows (int): Number of events to insert up front.
+        migrated (bool): Whether to apply the migrations (indexes) or keep only the base `app.sql` schema
+            plus the date key column, as the old code had.
+
+    Returns:
+        sqlite3.Connection: A connection configured like the pooled ones.
+    """
+    from packages.database import DEFAULT_PRAGMAS
+    from packages.dates import date_key
+    from packages.migrations import migrate
+
+    db = sqlite3.connect(path)
+    for name, value in DEFAULT_PRAGMAS.items():
+        db.execute(f"PRAGMA {name} = {value}")
+    with open(SCHEMA, encoding="utf-8") as schema:
+        db.executescript(schema.read())
+    if migrated:
+        migrate(db)
+    else:
+        db.execute("ALTER TABLE event ADD COLUMN event_date_key INTEGER")
+    db.execute("INSERT INTO modules (module_title, module_image_url, module_description) VALUES ('m', 'u', 'd')")
+    db.executemany(INSERT_EVENT, ((1, "1410-07-15", f"Event {row}", "u", "d", date_key("1410-07-15"))
+                                  for row in range(rows)))
+    db.commit()
+    return db
+
+
+def insert_reselect(db: sqlite3.Connection, title: str) -> int:
+    cur = db.cursor()
+    cur.execute(INSERT_EVENT, (1, "1410-07-15", title, "u", "d", 14100715))
+    db.commit()
+    cur.execute("SELECT * FROM event WHERE event_title = ?", (title,))
+    return cur.fetchone()[0]
+
+
+def insert_lastrowid(db: sqlite3.Connection, title: str) -> int:
+    cur = db.cursor()
+    cur.execute(INSERT_EVENT, (1, "1410-07-15", title, "u", "d", 14100715))
+    db.commit()
+    return cur.lastrowid
+
+
+def measure(db: sqlite3.Connection, insert, inserts: int) -> float:
+    """
+    Runs `inserts` create calls and returns the achieved inserts per second.
+    """
+    started = time.perf_counter()
+    for number in range(inserts):
+        insert(db, f"New event {number}")
+    return inserts / (time.perf_counter() - started)
+
+
+def main(argv=None) -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--rows", type=int, default=100000, help="events in the table before inserting")
+    argument_parser.add_argument("--inserts", type=int, default=2000, help="create calls to time")
+    args = argument_parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="insert-throughput-")
+    results = {}
+    for name, insert, migrated in (("before (insert + re-select by title)", insert_reselect, False),
+                                   ("after (lastrowid)", insert_lastrowid, True)):
+        db = build(os.path.join(workdir, f"{insert.__name__}.db"), args.rows, migrated)
+        results[name] = measure(db, insert, args.inserts)
+        db.close()
+    for name, rate in results.items():
+        print(f"{name:40} {rate:10.1f} inserts/s")
+    before, after = results.values()
+    print(f"speed-up: {after / before:.1f}x on a {args.rows}-row table")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
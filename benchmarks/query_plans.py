@@ -0,0 +1,202 @@
+"""
+Query-plan regression check.
+
+Builds a large synthetic database, drives every route of the API through Flask's test client while recording
+the SQL each one executes, and runs `EXPLAIN QUERY PLAN` for every recorded statement. The check fails when a
+statement falls back to a full table scan or sorts through a temporary B-tree.
+
+Usage:
+    python -m benchmarks.query_plans --modules 20 --events 5000 --questions 500
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+# Statements that are expected to read a whole table.
+ALLOWED_SCANS = re.compile(
+    r"^SELECT .+ FROM modules ORDER BY module_id$"
+    # FTS5 reads its one-row configuration table when it opens an index.
+    r"|^SELECT k, v FROM 'main'\."
+)
+CHECKED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+# Settings the app is created with, so that the scoring routes run too.
+CONFIG = {"SCORING_ENABLED": True, "SECRET_KEY": "query-plans"}
+# Default dataset size: large enough for `ANALYZE` statistics, and so the planner's choices, to match production.
+MODULES = 20
+EVENTS_PER_MODULE = 5000
+QUESTIONS_PER_MODULE = 500
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "images")
+
+
+def routes(module_id: int, event_id: int, question_id: int) -> list:
+    """
+    Returns the requests used to exercise every route.
+
+    Args:
+        module_id (int): A module that has events and questions.
+        event_id (int): An event of that module.
+        question_id (int): A question of that module.
+
+    Returns:
+        list: (method, path, json body) tuples. Write requests come last so that reads see the full dataset. A
+        callable body is called with the test client when its request is sent.
+    """
+    event = {"date": "1410-07-15", "title": "Battle of Grunwald", "image_url": "https://example.com/g.png",
+             "description": "Synthetic"}
+    question = {"question": "Synthetic?", "answers": ["a", "b"], "correct_answer": "a"}
+    module = {"title": "Synthetic", "image_url": "https://example.com/m.png", "description": "Synthetic"}
+
+    def answer(client) -> dict:
+        drawn = client.get(f"/game/trivia/{module_id}").get_json()
+        return {"round_token": drawn["round_token"], "answer": "a"}
+    return [
+        ("GET", "/modules", None),
+        ("GET", f"/modules/{module_id}", None),
+        ("GET", f"/events/{module_id}", None),
+        ("GET", f"/event/{event_id}", None),
+        ("GET", "/timeline/1", None),
+        ("GET", f"/timeline/{module_id}", None),
+        ("GET", "/modules?limit=5&after=1", None),
+        ("GET", f"/events/{module_id}?limit=50&after=1", None),
+        ("GET", f"/questions/{module_id}?limit=50&after=1", None),
+        ("GET", "/timeline/1?limit=50&after=10000101:1", None),
+        ("GET", f"/timeline/{module_id}?limit=50&after=10000101:1&stream=ndjson", None),
+        ("GET", "/timeline?from=1500&to=1700", None),
+        ("GET", f"/timeline/{module_id}?from=1500-06&to=1510&limit=20", None),
+        ("GET", "/timeline?buckets=century", None),
+        ("GET", f"/timeline/{module_id}?buckets=decade&from=1800", None),
+        ("GET", f"/game/image-name/{module_id}/4", None),
+        ("GET", f"/game/image-date/{module_id}/4", None),
+        ("GET", f"/game/higher-lower/{module_id}", None),
+        ("GET", f"/game/chronological/{module_id}/5", None),
+        ("GET", f"/game/trivia/{module_id}", None),
+        ("GET", f"/thumbnails/event/{event_id}/320", None),
+        ("GET", f"/thumbnails/module/{module_id}/160", None),
+        ("GET", f"/questions/{module_id}", None),
+        ("GET", "/search?q=battle%20king", None),
+        ("GET", f"/search?q=treat&module_id={module_id}&limit=5&offset=5", None),
+        ("GET", f"/question/{question_id}", None),
+        ("GET", f"/leaderboard/trivia/{module_id}", None),
+        ("POST", f"/game/check/trivia/{module_id}", answer),
+        ("POST", f"/scores/trivia/{module_id}", lambda client: {"player": "Synthetic", "answers": [answer(client)]}),
+        ("POST", "/modules", module),
+        ("PUT", f"/modules/{module_id}", module),
+        ("POST", f"/events/{module_id}", event),
+        ("PUT", f"/event/{event_id}", event),
+        ("POST", f"/questions/{module_id}", question),
+        ("PUT", f"/question/{question_id}", question),
+        ("DELETE", f"/event/{event_id}", None),
+        ("DELETE", f"/question/{question_id}", None),
+        ("DELETE", f"/modules/{module_id}", None),
+    ]
+
+
+def collect_statements(app, requests: list) -> dict:
+    """
+    Sends requests through the test client and records the statements they execute.
+
+    Args:
+        app (Flask): The application, created on the database to check.
+        requests (list): (method, path, json body) tuples, see `routes()`.
+
+    Returns:
+        dict: Each checked statement, with parameters substituted, mapped to the first request that ran it.
+    """
+    from packages.backend import get_db
+
+    statements = {}
+    current = {}
+
+    def record(statement):
+        if statement.lstrip().upper().startswith(CHECKED_STATEMENTS):
+            statements.setdefault(statement, current["route"])
+
+    client = app.test_client()
+    for method, path, body in requests:
+        current["route"] = f"{method} {path}"
+        with app.app_context():
+            get_db().set_trace_callback(record)
+            try:
+                client.open(path, method=method, json=body(client) if callable(body) else body)
+            finally:
+                get_db().set_trace_callback(None)
+    return statements
+
+
+def plan_problems(db: sqlite3.Connection, statement: str) -> list:
+    """
+    Returns the query-plan lines of a statement that indicate a full scan or an unindexed sort.
+
+    Args:
+        db (sqlite3.Connection): A connection to the synthetic database.
+        statement (str): An expanded SQL statement, with parameters already substituted.
+
+    Returns:
+        list: The offending plan lines, empty if the plan only uses indexes.
+    """
+    problems = []
+    for row in db.execute(f"EXPLAIN QUERY PLAN {statement}"):
+        detail = row[-1]
+        full_scan = detail.startswith("SCAN ") and " USING " not in detail and " VIRTUAL TABLE INDEX " not in detail
+        if (full_scan and not ALLOWED_SCANS.search(statement)) or "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def prepare(database: str, modules=MODULES, events=EVENTS_PER_MODULE, questions=QUESTIONS_PER_MODULE) -> tuple:
+    """
+    Creates the app on a new database, fills it with synthetic data and analyzes it.
+
+    Args:
+        database (str): Path of the database to create.
+        modules (int): Number of modules.
+        events (int): Events per module.
+        questions (int): Questions per module.
+
+    Returns:
+        tuple: (app, module ID, event ID, question ID), the IDs being those of the last module's last rows, as
+        `routes()` takes them.
+    """
+    from packages import create_app
+    from packages.thumbnails import directory_fetcher
+    from benchmarks.synthetic import populate
+
+    app = create_app({"DATABASE": database, "IMAGE_FETCHER": directory_fetcher(IMAGES), **CONFIG})
+    with sqlite3.connect(database) as db:
+        dataset = populate(db, modules=modules, events_per_module=events, questions_per_module=questions)
+        db.execute("ANALYZE")
+        module_id = dataset["module_ids"][-1]
+        event_id = db.execute("SELECT MAX(event_id) FROM event").fetchone()[0]
+        question_id = db.execute("SELECT MAX(question_id) FROM questions").fetchone()[0]
+    db.close()
+    return app, module_id, event_id, question_id
+
+
+def main(argv=None) -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--modules", type=int, default=MODULES)
+    argument_parser.add_argument("--events", type=int, default=EVENTS_PER_MODULE, help="events per module")
+    argument_parser.add_argument("--questions", type=int, default=QUESTIONS_PER_MODULE, help="questions per module")
+    args = argument_parser.parse_args(argv)
+
+    database = os.path.join(tempfile.mkdtemp(prefix="query-plans-"), "app.db")
+    app, module_id, event_id, question_id = prepare(database, args.modules, args.events, args.questions)
+    statements = collect_statements(app, routes(module_id, event_id, question_id))
+    failures = 0
+    with sqlite3.connect(database) as db:
+        for statement, route in statements.items():
+            problems = plan_problems(db, statement)
+            status = "FAIL" if problems else "ok"
+            print(f"{status:4}  {route:40}  {statement[:100]}")
+            for problem in problems:
+                print(f"      -> {problem}")
+            failures += bool(problems)
+    print(f"{len(statements)} statements checked, {failures} regressed to a scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
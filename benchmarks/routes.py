@@ -0,0 +1,299 @@
+"""
+Route benchmark and load test.
+
+Generates a synthetic database of the requested size, then drives every route of the API, first through Flask's
+test client (application cost only) and then through a real threaded WSGI server over HTTP with concurrent
+keep-alive clients. Reports p50/p95/p99 latency and requests per second per route, can save the results as a JSON
+baseline and compare a run against an earlier baseline.
+
+Usage:
+    python -m benchmarks.routes --modules 10 --events 1000 --questions 100 --requests 200 --output baseline.json
+    python -m benchmarks.routes --compare baseline.json --threshold 20
+    python -m benchmarks.routes --snapshot    # read routes served from a compiled snapshot
+"""
+import argparse
+import concurrent.futures
+import datetime
+import http.client
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+EVENT = {"date": "1410-07-15", "title": "Battle of Grunwald", "image_url": "https://example.com/g.png",
+         "description": "Synthetic"}
+QUESTION = {"question": "Synthetic?", "answers": ["a", "b", "c"], "correct_answer": "a"}
+MODULE = {"title": "Synthetic", "image_url": "https://example.com/m.png", "description": "Synthetic"}
+
+# (name, method, path template, json body). Templates are filled from the dataset; '{spare_*}' fields take a
+# different pre-created row on every request, so DELETE requests always remove an existing row.
+ROUTES = [
+    ("index", "GET", "/", None),
+    ("modules", "GET", "/modules", None),
+    ("modules page", "GET", "/modules?limit=5", None),
+    ("module", "GET", "/modules/{module_id}", None),
+    ("events", "GET", "/events/{module_id}", None),
+    ("event", "GET", "/event/{event_id}", None),
+    ("timeline", "GET", "/timeline/{module_id}", None),
+    ("timeline all", "GET", "/timeline/1", None),
+    ("timeline page", "GET", "/timeline/1?limit=100", None),
+    ("timeline stream", "GET", "/timeline/{module_id}?stream=ndjson", None),
+    ("timeline range", "GET", "/timeline?from=1500&to=1700&limit=100", None),
+    ("timeline decades", "GET", "/timeline/{module_id}?buckets=decade", None),
+    ("questions", "GET", "/questions/{module_id}", None),
+    ("question", "GET", "/question/{question_id}", None),
+    ("game image-name", "GET", "/game/image-name/{module_id}/4", None),
+    ("game image-date", "GET", "/game/image-date/{module_id}/4", None),
+    ("game higher-lower", "GET", "/game/higher-lower/{module_id}", None),
+    ("game chronological", "GET", "/game/chronological/{module_id}/5", None),
+    ("game trivia", "GET", "/game/trivia/{module_id}", None),
+    ("thumbnail", "GET", "/thumbnails/event/{event_id}/320", None),
+    ("leaderboard", "GET", "/leaderboard/trivia/{module_id}", None),
+    ("bulk export", "GET", "/bulk/export?module_id={module_id}", None),
+    ("create module", "POST", "/modules", MODULE),
+    ("update module", "PUT", "/modules/{module_id}", MODULE),
+    ("create event", "POST", "/events/{module_id}", EVENT),
+    ("update event", "PUT", "/event/{event_id}", EVENT),
+    ("create question", "POST", "/questions/{module_id}", QUESTION),
+    ("update question", "PUT", "/question/{question_id}", QUESTION),
+    ("delete event", "DELETE", "/event/{spare_event_id}", None),
+    ("delete question", "DELETE", "/question/{spare_question_id}", None),
+    ("delete module", "DELETE", "/modules/{spare_module_id}", None),
+]
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Returns the nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    """
+    Turns raw latencies in seconds into the reported statistics.
+
+    Returns:
+        dict: 'requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms' and 'rps'.
+    """
+    latencies = sorted(latencies)
+    return {"requests": len(latencies), "errors": errors,
+            "p50_ms": percentile(latencies, 0.50) * 1000, "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "rps": len(latencies) / elapsed if elapsed else 0.0}
+
+
+def prepare(database: str, args) -> dict:
+    """
+    Fills the synthetic database and creates the spare rows consumed by DELETE requests.
+
+    Returns:
+        dict: Template values: 'module_id', 'event_id', 'question_id' and lists of spare IDs.
+    """
+    from benchmarks.synthetic import populate
+
+    spares = args.requests * 2
+    with sqlite3.connect(database) as db:
+        dataset = populate(db, modules=args.modules, events_per_module=args.events,
+                           questions_per_module=args.questions)
+        module_id = dataset["module_ids"][-1]
+        values = {
+            "module_id": module_id,
+            "event_id": db.execute("SELECT MAX(event_id) FROM event").fetchone()[0],
+            "question_id": db.execute("SELECT MAX(question_id) FROM questions").fetchone()[0],
+        }
+        spare = populate(db, modules=spares, events_per_module=1, questions_per_module=1, seed=1)
+        values["spare_module_id"] = spare["module_ids"]
+        values["spare_event_id"] = [row[0] for row in db.execute(
+            "SELECT event_id FROM event WHERE fk_module_id >= ? ORDER BY event_id", (spare["module_ids"][0],))]
+        values["spare_question_id"] = [row[0] for row in db.execute(
+            "SELECT question_id FROM questions WHERE fk_module_id >= ? ORDER BY question_id",
+            (spare["module_ids"][0],))]
+        db.execute("ANALYZE")
+    return values
+
+
+def request_paths(template: str, values: dict, count: int) -> list:
+    """
+    Expands a path template into `count` concrete paths.
+    """
+    paths = []
+    for _ in range(count):
+        fields = {name: value.pop() if isinstance(value, list) else value
+                  for name, value in values.items() if "{" + name + "}" in template}
+        paths.append(template.format(**fields))
+    return paths
+
+
+def run_test_client(app, values: dict, args) -> dict:
+    """
+    Drives every route sequentially through Flask's test client.
+    """
+    client = app.test_client()
+    results = {}
+    for name, method, template, body in args.routes:
+        latencies = []
+        errors = 0
+        paths = request_paths(template, values, args.requests)
+        for path in paths[:args.warmup]:
+            client.open(path, method=method, json=body)
+        started = time.perf_counter()
+        for path in paths[args.warmup:] or paths:
+            request_started = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            latencies.append(time.perf_counter() - request_started)
+            errors += response.status_code >= 400
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+        print_result("test-client", name, results[name])
+    return results
+
+
+def run_wsgi(app, values: dict, args) -> dict:
+    """
+    Serves the app with Werkzeug's threaded WSGI server and drives every route over HTTP with concurrent clients.
+    """
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    local = threading.local()
+
+    def send(method, path, body):
+        connection = getattr(local, "connection", None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=30)
+        payload = None if body is None else json.dumps(body)
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            local.connection = None
+            status = 599
+        return time.perf_counter() - started, status
+
+    results = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(args.concurrency) as executor:
+            for name, method, template, body in args.routes:
+                paths = request_paths(template, values, args.requests)
+                started = time.perf_counter()
+                outcomes = list(executor.map(lambda path: send(method, path, body), paths))
+                elapsed = time.perf_counter() - started
+                results[name] = summarize([latency for latency, _ in outcomes],
+                                          sum(status >= 400 for _, status in outcomes), elapsed)
+                print_result("wsgi", name, results[name])
+    finally:
+        server.shutdown()
+    return results
+
+
+def print_result(mode: str, name: str, result: dict):
+    print(f"{mode:12} {name:22} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+          f"p99 {result['p99_ms']:8.2f} ms  {result['rps']:9.1f} req/s  errors {result['errors']}")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """
+    Prints the change of every route against a baseline and counts p95 regressions above `threshold` percent.
+
+    Returns:
+        int: The number of regressed routes.
+    """
+    regressions = 0
+    print(f"\ncompared with {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    for mode, routes in current["results"].items():
+        for name, result in routes.items():
+            before = baseline["results"].get(mode, {}).get(name)
+            if before is None or not before["p95_ms"]:
+                continue
+            change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            rps_change = (result["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+            regressed = change > threshold
+            regressions += regressed
+            print(f"{'REGRESSED' if regressed else 'ok':9} {mode:12} {name:22} p95 {change:+7.1f}%  "
+                  f"req/s {rps_change:+7.1f}%")
+    return regressions
+
+
+def main(argv=None) -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--modules", type=int, default=10)
+    argument_parser.add_argument("--events", type=int, default=1000, help="events per module")
+    argument_parser.add_argument("--questions", type=int, default=100, help="questions per module")
+    argument_parser.add_argument("--requests", type=int, default=200, help="requests per route and mode")
+    argument_parser.add_argument("--warmup", type=int, default=10, help="untimed test-client requests per route")
+    argument_parser.add_argument("--concurrency", type=int, default=8, help="concurrent HTTP clients")
+    argument_parser.add_argument("--mode", choices=["test-client", "wsgi", "both"], default="both")
+    argument_parser.add_argument("--output", help="write the results to this JSON file")
+    argument_parser.add_argument("--compare", help="compare with a baseline JSON file")
+    argument_parser.add_argument("--threshold", type=float, default=20.0,
+                                 help="p95 increase in percent counted as a regression")
+    argument_parser.add_argument("--snapshot", action="store_true",
+                                 help="compile a snapshot and benchmark the read routes in read-only mode")
+    args = argument_parser.parse_args(argv)
+    args.routes = [route for route in ROUTES if not args.snapshot or route[1] == "GET"]
+
+    workdir = tempfile.mkdtemp(prefix="route-bench-")
+    database = os.path.join(workdir, "app.db")
+    from packages import create_app
+    from packages.thumbnails import directory_fetcher
+
+    # Thumbnails are made from the repository's images, so the benchmark never downloads anything.
+    images = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "images")
+    fetcher = directory_fetcher(images)
+    app = create_app({"DATABASE": database, "IMAGE_FETCHER": fetcher})
+    values = prepare(database, args)
+    if args.snapshot:
+        from packages.snapshot import compile_snapshot
+
+        snapshot = os.path.join(workdir, "app.snapshot")
+        with sqlite3.connect(database) as db:
+            compile_snapshot(db, snapshot)
+        app = create_app({"DATABASE": database, "SNAPSHOT_PATH": snapshot, "IMAGE_FETCHER": fetcher})
+    report = {
+        "meta": {"commit": git_commit(), "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                 "modules": args.modules, "events_per_module": args.events,
+                 "questions_per_module": args.questions, "requests": args.requests,
+                 "concurrency": args.concurrency, "snapshot": args.snapshot},
+        "results": {},
+    }
+    if args.mode in ("test-client", "both"):
+        report["results"]["test-client"] = run_test_client(app, values, args)
+    if args.mode in ("wsgi", "both"):
+        report["results"]["wsgi"] = run_wsgi(app, values, args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline:
+            return 1 if compare(json.load(baseline), report, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Full-text search benchmark.
+
+Builds a synthetic database with a large number of events, then times `search.search()` on the FTS5 indexes against
+the LIKE scan over titles and descriptions that clients otherwise have to do, for common, rare and prefix terms.
+
+Usage:
+    python -m benchmarks.search --modules 10 --events 100000 --repeat 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# (label, search text). The synthetic vocabulary makes 'battle' the most common word and 'comet' the rarest.
+QUERIES = [
+    ("common word", "battle"),
+    ("rare word", "comet"),
+    ("two words", "treaty castle"),
+    ("prefix", "corona"),
+]
+
+
+def like_scan(cur: sqlite3.Cursor, text: str, limit: int) -> list:
+    """
+    The baseline: scans every event for rows containing all words, then keeps the first `limit` matches.
+    """
+    words = text.split()
+    conditions = " AND ".join(["(event_title LIKE ? OR event_description LIKE ?)"] * len(words))
+    params = [f"%{word}%" for word in words for _ in range(2)]
+    cur.execute(f"SELECT event_id, fk_module_id, event_title, event_date FROM event WHERE {conditions}", params)
+    return cur.fetchall()[:limit]
+
+
+def timed(function, repeat: int) -> tuple:
+    """
+    Runs `function` `repeat` times.
+
+    Returns:
+        tuple: (median milliseconds, result of the last run).
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, result
+
+
+def main(argv=None) -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--modules", type=int, default=10)
+    argument_parser.add_argument("--events", type=int, default=100000, help="events per module")
+    argument_parser.add_argument("--limit", type=int, default=20, help="results per search")
+    argument_parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    args = argument_parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="search-bench-")
+    database = os.path.join(workdir, "app.db")
+    from packages import create_app
+    from packages.search import search
+    from benchmarks.synthetic import populate
+
+    create_app({"DATABASE": database})
+    started = time.perf_counter()
+    with sqlite3.connect(database) as db:
+        populate(db, modules=args.modules, events_per_module=args.events, questions_per_module=0)
+        db.execute("ANALYZE")
+    total = args.modules * args.events
+    print(f"{total} events written and indexed in {time.perf_counter() - started:.1f} s")
+
+    db = sqlite3.connect(database)
+    cur = db.cursor()
+    for label, text in QUERIES:
+        fts_ms, found = timed(lambda: search(cur, text, types=("event",), limit=args.limit), args.repeat)
+        like_ms, scanned = timed(lambda: like_scan(cur, text, args.limit), args.repeat)
+        print(f"{label:12} {text!r:16} fts {fts_ms:9.2f} ms ({len(found)} results)   "
+              f"like {like_ms:9.2f} ms ({len(scanned)} results)   {like_ms / fts_ms:7.1f}x")
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
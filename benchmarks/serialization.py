@@ -0,0 +1,94 @@
+"""
+JSON serialization benchmark for the list endpoints.
+
+Builds synthetic databases with 10k and 100k events in one module and serializes the whole timeline three ways:
+the previous path (a dict per row, then Flask's default `json`-based provider), the orjson provider on the same
+dicts, and JSON objects built by SQLite and joined as bytes. It then times `GET /timeline/<module_id>` through the
+test client with the response cache disabled, with `JSON_FAST_ENCODER` off and on.
+
+Usage:
+    python -m benchmarks.serialization --events 10000 100000 --repeat 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+
+def timed(function, repeat: int) -> float:
+    """
+    Returns the median milliseconds of `repeat` calls of `function`.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main(argv=None) -> int:
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000],
+                                 help="payload sizes in events")
+    argument_parser.add_argument("--repeat", type=int, default=5, help="timed runs per variant")
+    args = argument_parser.parse_args(argv)
+
+    from flask.json.provider import DefaultJSONProvider
+    from packages import create_app
+    from packages.backend import EVENT_FIELDS
+    from packages.serialization import SQLITE_JSON, FastJSONProvider, orjson
+    from benchmarks.synthetic import populate
+
+    print(f"orjson {'installed' if orjson is not None else 'missing'}, "
+          f"SQLite {sqlite3.sqlite_version} JSON functions {'available' if SQLITE_JSON else 'missing'}")
+    workdir = tempfile.mkdtemp(prefix="serialization-bench-")
+    for events in args.events:
+        database = os.path.join(workdir, f"events-{events}.db")
+        create_app({"DATABASE": database})
+        with sqlite3.connect(database) as db:
+            module_id = populate(db, modules=1, events_per_module=events, questions_per_module=0)["module_ids"][0]
+        db = sqlite3.connect(database)
+        where = " FROM event WHERE fk_module_id = ? ORDER BY event_date_key, event_id"
+        app = create_app({"DATABASE": database, "RESPONSE_CACHE_SIZE": 0})
+        stdlib = DefaultJSONProvider(app)
+        fast = FastJSONProvider(app)
+
+        def jsonify_dicts():
+            rows = db.execute(f"SELECT *{where}", (module_id,))
+            return stdlib.dumps([{"id": event[0], "module_id": event[1], "date": event[2], "title": event[3],
+                                  "image_url": event[4], "description": event[5]} for event in rows]).encode()
+
+        def orjson_dicts():
+            rows = db.execute(f"SELECT {EVENT_FIELDS.columns()}{where}", (module_id,))
+            return fast.dumpb([EVENT_FIELDS.to_json(row) for row in rows])
+
+        def sqlite_rows():
+            rows = db.execute(f"SELECT {EVENT_FIELDS.sql()}{where}", (module_id,))
+            return b"[" + ",".join(row[0] for row in rows).encode("utf-8") + b"]"
+
+        variants = [("dicts + json (previous)", jsonify_dicts)]
+        if orjson is not None:
+            variants.append(("dicts + orjson", orjson_dicts))
+        if SQLITE_JSON:
+            variants.append(("SQLite JSON rows", sqlite_rows))
+        baseline = None
+        print(f"\n{events} events, {len(jsonify_dicts()) / 1e6:.1f} MB")
+        for name, function in variants:
+            milliseconds = timed(function, args.repeat)
+            baseline = baseline or milliseconds
+            print(f"  {name:28} {milliseconds:9.1f} ms  {baseline / milliseconds:5.1f}x")
+        for enabled in (False, True):
+            client = create_app({"DATABASE": database, "RESPONSE_CACHE_SIZE": 0,
+                                 "JSON_FAST_ENCODER": enabled}).test_client()
+            milliseconds = timed(lambda: client.get(f"/timeline/{module_id}").get_data(), args.repeat)
+            print(f"  {'GET /timeline, fast ' + ('on' if enabled else 'off'):28} {milliseconds:9.1f} ms")
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
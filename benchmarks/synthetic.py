@@ -0,0 +1,86 @@
+import random
+import sqlite3
+
+from packages.dates import date_key
+
+# Words for event titles and descriptions. Drawn with falling weights, so some words are common and others rare.
+WORDS = ("battle", "treaty", "king", "queen", "siege", "coronation", "union", "uprising", "river", "castle",
+         "republic", "partition", "charter", "council", "duchy", "crusade", "plague", "harbour", "cathedral",
+         "university", "constitution", "rebellion", "dynasty", "alliance", "frontier", "fortress", "election",
+         "embassy", "famine", "comet")
+WORD_WEIGHTS = tuple(1 / rank for rank in range(1, len(WORDS) + 1))
+
+
+def random_text(rng: random.Random, words: int) -> str:
+    """
+    Returns `words` vocabulary words separated by spaces.
+    """
+    return " ".join(rng.choices(WORDS, WORD_WEIGHTS, k=words))
+
+
+def random_date(rng: random.Random) -> str:
+    """
+    Returns a random event date in one of the formats stored by the API ('YYYY', 'YYYY-MM' or 'YYYY-MM-DD').
+
+    Args:
+        rng (random.Random): The generator to draw from.
+
+    Returns:
+        str: A date string between year 1 and 2024.
+    """
+    year = rng.randint(1, 2024)
+    shape = rng.random()
+    if shape < 0.3:
+        return str(year)
+    if shape < 0.4:
+        return f"{year}-{rng.randint(1, 12):02d}"
+    return f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def populate(db: sqlite3.Connection, modules=10, events_per_module=1000, questions_per_module=100, seed=0) -> dict:
+    """
+    Fills a migrated database with synthetic modules, events and questions.
+
+    Args:
+        db (sqlite3.Connection): A connection to a database that already has the current schema.
+        modules (int): Number of modules to create.
+        events_per_module (int): Number of events per module.
+        questions_per_module (int): Number of questions per module.
+        seed (int): Seed for the random generator, so the same arguments always produce the same data.
+
+    Returns:
+        dict: The created 'module_ids' plus 'events' and 'questions' totals.
+
+    Usage:
+        Call `create_app({'DATABASE': path})` on an empty database file so `init_db()` creates the schema,
+        then call this function on a connection to that file.
+    """
+    rng = random.Random(seed)
+    cur = db.cursor()
+    module_ids = []
+    for module in range(modules):
+        cur.execute("INSERT INTO modules (module_title, module_image_url, module_description) VALUES (?, ?, ?)",
+                    (f"Module {module}", f"https://example.com/modules/{module}.png", f"Synthetic module {module}"))
+        module_ids.append(cur.lastrowid)
+    for module_id in module_ids:
+        events = []
+        for event in range(events_per_module):
+            event_date = random_date(rng)
+            events.append((module_id, event_date, f"{random_text(rng, 3)} {module_id}-{event}",
+                           f"https://example.com/events/{module_id}/{event}.png",
+                           f"Synthetic event {event} of module {module_id}: {random_text(rng, 12)}",
+                           date_key(event_date)))
+        cur.executemany("INSERT INTO event (fk_module_id, event_date, event_title, event_image_url, event_description, event_date_key) VALUES (?, ?, ?, ?, ?, ?)",
+                        events)
+        answer_rows = []
+        for question in range(questions_per_module):
+            cur.execute("INSERT INTO questions (fk_module_id, question) VALUES (?, ?)",
+                        (module_id, f"Question {module_id}-{question}?"))
+            correct = rng.randrange(4)
+            answer_rows += [(cur.lastrowid, answer, f"Answer {question}-{answer}", int(answer == correct))
+                            for answer in range(4)]
+        cur.executemany("INSERT INTO question_answers (fk_question_id, ordinal, answer, is_correct) VALUES (?, ?, ?, ?)",
+                        answer_rows)
+    db.commit()
+    return {"module_ids": module_ids, "events": modules * events_per_module,
+            "questions": modules * questions_per_module}
@@ -0,0 +1,38 @@
+CREATE VIRTUAL TABLE IF NOT EXISTS "event_fts" USING fts5(
+	"event_title",
+	"event_description",
+	content='event',
+	content_rowid='event_id',
+	tokenize='unicode61 remove_diacritics 2'
+);
+INSERT INTO "event_fts" ("event_fts", "rank") VALUES ('rank', 'bm25(10.0, 1.0)');
+CREATE TRIGGER IF NOT EXISTS "event_fts_insert" AFTER INSERT ON "event" BEGIN
+	INSERT INTO "event_fts" ("rowid", "event_title", "event_description")
+	VALUES (new."event_id", new."event_title", new."event_description");
+END;
+CREATE TRIGGER IF NOT EXISTS "event_fts_delete" AFTER DELETE ON "event" BEGIN
+	INSERT INTO "event_fts" ("event_fts", "rowid", "event_title", "event_description")
+	VALUES ('delete', old."event_id", old."event_title", old."event_description");
+END;
+CREATE TRIGGER IF NOT EXISTS "event_fts_update" AFTER UPDATE OF "event_title", "event_description" ON "event" BEGIN
+	INSERT INTO "event_fts" ("event_fts", "rowid", "event_title", "event_description")
+	VALUES ('delete', old."event_id", old."event_title", old."event_description");
+	INSERT INTO "event_fts" ("rowid", "event_title", "event_description")
+	VALUES (new."event_id", new."event_title", new."event_description");
+END;
+CREATE VIRTUAL TABLE IF NOT EXISTS "questions_fts" USING fts5(
+	"question",
+	content='questions',
+	content_rowid='question_id',
+	tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS "questions_fts_insert" AFTER INSERT ON "questions" BEGIN
+	INSERT INTO "questions_fts" ("rowid", "question") VALUES (new."question_id", new."question");
+END;
+CREATE TRIGGER IF NOT EXISTS "questions_fts_delete" AFTER DELETE ON "questions" BEGIN
+	INSERT INTO "questions_fts" ("questions_fts", "rowid", "question") VALUES ('delete', old."question_id", old."question");
+END;
+CREATE TRIGGER IF NOT EXISTS "questions_fts_update" AFTER UPDATE OF "question" ON "questions" BEGIN
+	INSERT INTO "questions_fts" ("questions_fts", "rowid", "question") VALUES ('delete', old."question_id", old."question");
+	INSERT INTO "questions_fts" ("rowid", "question") VALUES (new."question_id", new."question");
+END;
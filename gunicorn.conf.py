@@ -0,0 +1,42 @@
+"""
+Gunicorn settings for serving `wsgi:app`.
+
+Every setting can be overridden with an environment variable, for example WEB_CONCURRENCY=4 or GUNICORN_THREADS=2.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+# SQLite allows one writer at a time, so more processes than cores only add lock contention. Threads cover the
+# time requests spend waiting on I/O; keep DATABASE_POOL_SIZE at least as large as `threads`.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+# Import the app and apply migrations once in the master process. `create_app()` closes its database connection
+# before returning, so workers start without inherited SQLite handles.
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("GUNICORN_ACCESSLOG")
+
+
+def worker_exit(server, worker):
+    """
+    Writes the worker's buffered scores, then closes its pooled SQLite connections, once it has finished its in-flight
+    requests.
+    """
+    from wsgi import app
+
+    try:
+        app.extensions['scores'].flush()
+    except Exception:
+        app.logger.exception("Writing buffered scores on exit failed")
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close()
@@ -1,8 +1,136 @@
 from flask import Flask
 from flask_cors import CORS
+import os
 
-app = Flask(__name__, template_folder='../templates', static_folder='../static')
-cors = CORS(app)
-app.config['CORS_HEADERS'] = 'Content-Type'
+from packages.database import DEFAULT_PRAGMAS
+from packages.serialization import FastJSONProvider
 
-from packages import backend
\ No newline at end of file
+DEFAULT_CONFIG = {
+    'CORS_HEADERS': 'Content-Type',
+    'DATABASE': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'databases', 'app.db'),
+    'DATABASE_POOL_SIZE': 8,
+    'DATABASE_POOL_TIMEOUT': 30.0,
+    'DATABASE_BUSY_TIMEOUT': 5.0,
+    'DATABASE_PRAGMAS': DEFAULT_PRAGMAS,
+    'DATABASE_CACHED_STATEMENTS': 256,
+    'RESPONSE_CACHE_SIZE': 1024,
+    'RESPONSE_CACHE_TTL': 60.0,
+    'PAGE_SIZE': 100,
+    'PAGE_SIZE_MAX': 1000,
+    'BULK_CHUNK_SIZE': 1000,
+    'IDEMPOTENCY_KEY_TTL': 86400,
+    'SQL_INSTRUMENTATION': True,
+    'SLOW_QUERY_MS': 100.0,
+    'PROFILING_ENABLED': False,
+    'PROFILING_LIMIT': 50,
+    'GAME_EXECUTOR_THREADS': 8,
+    'GAME_QUEUE_LIMIT': 1024,
+    'ROUND_POOL_SIZE': 32,
+    'ROUND_POOL_LOW_WATER': 8,
+    'ROUND_POOL_TTL': 60.0,
+    'ROUND_POOL_MAX_KEYS': 1024,
+    'ROUND_POOL_MAX_EVENTS': 20,
+    'GAME_SESSION_MAX_ROUNDS': 100,
+    'GAME_SESSION_MAX_EVENTS': 50,
+    'SNAPSHOT_PATH': None,
+    'SNAPSHOT_CHECK_INTERVAL': 1.0,
+    'JSON_FAST_ENCODER': True,
+    'VERSION_FILE': None,
+    'VERSION_SLOTS': 4096,
+    'HTTP_CACHE_MAX_AGE': 0,
+    'THUMBNAIL_DIR': None,
+    'THUMBNAIL_CACHE_BYTES': 256 * 1024 * 1024,
+    'THUMBNAIL_MAX_AGE': 86400,
+    'THUMBNAIL_FETCH_TIMEOUT': 10.0,
+    'THUMBNAIL_MAX_SOURCE_BYTES': 20 * 1024 * 1024,
+    'IMAGE_FETCHER': None,
+    'SCORE_FLUSH_SIZE': 500,
+    'SCORE_FLUSH_INTERVAL': 1.0,
+    'SCORE_BUFFER_MAX': 10000,
+    'LEADERBOARD_SIZE': 10,
+    'LEADERBOARD_TTL': 10.0,
+    'LEADERBOARD_MAX_BOARDS': 1024,
+    'SCORING_ENABLED': False,
+    'ROUND_TOKEN_TTL': 3600.0,
+}
+
+
+def create_app(config=None) -> Flask:
+    """
+    Creates and configures the Flask application.
+
+    Note:
+        Settings are taken from `DEFAULT_CONFIG`, then from `FLASK_`-prefixed environment variables, then from
+        `config`. The database schema and migrations are applied here, once per process that calls the factory.
+        The connection used for that is closed again before returning, so a pre-forking server that loads the
+        app in its master process (gunicorn's `preload_app`) hands no open SQLite connection to its workers;
+        each worker opens its own connections on first use.
+
+    Args:
+        config (dict): Settings that override the defaults and the environment, for example {'DATABASE': path}.
+
+    Returns:
+        Flask: The application with every blueprint registered.
+
+    Usage:
+        `app = create_app()` in `wsgi.py`; `flask --app packages run` finds the factory by itself.
+    """
+    app = Flask(__name__, template_folder='../templates', static_folder='../static')
+    app.json = FastJSONProvider(app)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.from_prefixed_env()
+    if config is not None:
+        app.config.update(config)
+    CORS(app)
+
+    from packages import backend, bulk, conditional, docs, games, metrics, readonly, scores, search, status, thumbnails
+    from packages.cache import ResponseCache
+    from packages.rounds import RoundPool, RoundTokens
+    from packages.snapshot import SnapshotStore
+    from packages.versions import VersionCounters
+    app.register_blueprint(docs.api)
+    app.register_blueprint(backend.api)
+    app.register_blueprint(status.api)
+    app.register_blueprint(bulk.api)
+    app.register_blueprint(metrics.api)
+    app.register_blueprint(search.api)
+    app.register_blueprint(scores.api)
+    app.register_blueprint(thumbnails.api)
+    app.register_blueprint(conditional.api)
+    app.register_blueprint(readonly.api)
+    app.teardown_appcontext(backend.close_connection)
+    app.extensions['response_cache'] = ResponseCache(maxsize=app.config['RESPONSE_CACHE_SIZE'],
+                                                     ttl=app.config['RESPONSE_CACHE_TTL'])
+    app.extensions['metrics'] = metrics.Registry()
+    app.extensions['versions'] = VersionCounters(app.config['VERSION_FILE'] or app.config['DATABASE'] + '.versions',
+                                                 slots=app.config['VERSION_SLOTS'])
+    app.extensions['samplers'] = games.new_samplers(app.extensions['versions'])
+    thumbnail_dir = os.path.join(os.path.dirname(os.path.abspath(app.config['DATABASE'])), 'thumbnails')
+    app.extensions['thumbnails'] = thumbnails.ThumbnailCache(app.config['THUMBNAIL_DIR'] or thumbnail_dir,
+                                                             max_bytes=app.config['THUMBNAIL_CACHE_BYTES'])
+    if app.config['SNAPSHOT_PATH'] is not None:
+        # Snapshot draws need no database, and pooled rounds would outlive a snapshot swap.
+        app.extensions['snapshot'] = SnapshotStore(app.config['SNAPSHOT_PATH'],
+                                                   check_interval=app.config['SNAPSHOT_CHECK_INTERVAL'])
+        app.config['ROUND_POOL_SIZE'] = 0
+    elif app.config['SCORING_ENABLED']:
+        # Scored rounds leave their answers out, so they are only served where answers can be submitted.
+        if not app.config['SECRET_KEY']:
+            raise ValueError("SCORING_ENABLED needs a SECRET_KEY to sign round tokens with")
+        app.extensions['round_tokens'] = RoundTokens(app.config['SECRET_KEY'], ttl=app.config['ROUND_TOKEN_TTL'])
+    app.extensions['round_pool'] = RoundPool(app, capacity=app.config['ROUND_POOL_SIZE'],
+                                             low_water=app.config['ROUND_POOL_LOW_WATER'],
+                                             ttl=app.config['ROUND_POOL_TTL'],
+                                             max_keys=app.config['ROUND_POOL_MAX_KEYS'],
+                                             max_number=app.config['ROUND_POOL_MAX_EVENTS'])
+    app.extensions['scores'] = scores.ScoreBuffer(app, batch_size=app.config['SCORE_FLUSH_SIZE'],
+                                                  interval=app.config['SCORE_FLUSH_INTERVAL'],
+                                                  max_pending=app.config['SCORE_BUFFER_MAX'])
+    app.extensions['leaderboards'] = scores.Leaderboards(size=app.config['LEADERBOARD_SIZE'],
+                                                         ttl=app.config['LEADERBOARD_TTL'],
+                                                         max_boards=app.config['LEADERBOARD_MAX_BOARDS'])
+
+    with app.app_context():
+        backend.init_db()
+    app.extensions.pop('db_pool').close()
+    return app
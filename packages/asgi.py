@@ -0,0 +1,124 @@
+import asyncio
+import concurrent.futures
+import re
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask
+
+from packages import games
+from packages.backend import draw_round
+from packages.thumbnails import prefetch_links
+
+GAME_PATH = re.compile(r"^/game/(?P<game>[a-z-]+)/(?P<module_id>[^/]+)(?:/(?P<number>[^/]+))?$")
+GAME_ROUTES = {
+    "image-name": "/game/image-name/<module_id>/<int:number_of_events>",
+    "image-date": "/game/image-date/<module_id>/<int:number_of_events>",
+    "higher-lower": "/game/higher-lower/<module_id>",
+    "chronological": "/game/chronological/<module_id>/<int:number_of_events>",
+    "trivia": "/game/trivia/<module_id>",
+}
+
+
+class GameApp:
+    """
+    An ASGI application that serves the `/game/*` routes without tying up a thread per waiting client.
+
+    Note:
+        Game requests are parsed on the event loop. A round that is ready in the round pool is served right
+        there; otherwise the database work runs on a bounded thread pool of `GAME_EXECUTOR_THREADS` threads, each
+        borrowing a pooled connection for the duration of one draw. Clients waiting for a thread cost a coroutine,
+        not a thread, so one worker can hold thousands of open game connections. At most `GAME_QUEUE_LIMIT` draws
+        may be pending; above that the request is answered with 503 at once instead of queuing without bound. In
+        read-only mode, draws are answered with 503 until a snapshot has been published, as in the Flask app.
+        Every other request is passed on to the Flask app through `asgiref`'s WSGI adapter.
+
+    Args:
+        app (Flask): The application created by `create_app()`.
+
+    Usage:
+        `GameApp(create_app())`, served with `uvicorn asgi:app --workers 4`; see `asgi.py`.
+    """
+
+    def __init__(self, app: Flask):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+        self.executor = concurrent.futures.ThreadPoolExecutor(app.config['GAME_EXECUTOR_THREADS'],
+                                                              thread_name_prefix="game")
+        self.queue_limit = app.config['GAME_QUEUE_LIMIT']
+        self.rounds = app.extensions['round_pool']
+        self._pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] == "http" and scope["method"] == "GET":
+            match = GAME_PATH.match(scope["path"])
+            if match is not None and match["game"] in games.GAMES:
+                await self.game(match, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                pool = self.app.extensions.get('db_pool')
+                if pool is not None:
+                    pool.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def draw(self, game: str, module_id: str, number) -> bytes:
+        """
+        Runs one game draw on an executor thread and returns the serialized response body.
+        """
+        with self.app.app_context():
+            return draw_round(game, module_id, number)
+
+    async def game(self, match, send):
+        started = time.perf_counter()
+        game = match["game"]
+        takes_number = games.GAMES[game].size is None
+        status = 200
+        if takes_number != (match["number"] is not None) or (takes_number and not match["number"].isdigit()):
+            status, body = 404, {"response": 404, "error": "Not Found"}
+        elif takes_number and int(match["number"]) < 1:
+            status, body = 400, {"response": 400, "error": "The number of events must be a positive integer"}
+        else:
+            # Only the event loop thread touches the counter, so it needs no lock.
+            full = self._pending >= self.queue_limit
+            if full:
+                status, body = 503, {"response": 503, "error": "Too many pending game requests"}
+            else:
+                self._pending += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    number = int(match["number"]) if takes_number else None
+                    body = self.rounds.pop(game, match["module_id"], number)
+                    if body is None:
+                        body = await loop.run_in_executor(self.executor, self.draw, game, match["module_id"], number)
+                except FileNotFoundError:
+                    # Read-only mode before a snapshot has been published, as answered by `readonly`.
+                    status, body = 503, {"response": 503, "error": "No snapshot has been published"}
+                except Exception:
+                    self.app.logger.exception("Game request failed: %s", match.string)
+                    status, body = 500, {"response": 500, "error": "Internal Server Error"}
+                finally:
+                    self._pending -= 1
+        headers = [(b"content-type", b"application/json"), (b"access-control-allow-origin", b"*")]
+        if isinstance(body, bytes):
+            links = prefetch_links(self.rounds.next_thumbnails(game, match["module_id"], number))
+            if links:
+                headers.append((b"link", links.encode("ascii")))
+        else:
+            body = self.app.json.dumpb(body) + b"\n"
+        headers.append((b"content-length", str(len(body)).encode("ascii")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+        self.app.extensions['metrics'].observe_request(GAME_ROUTES[game], "GET", status, time.perf_counter() - started)
+
@@ -1,24 +1,78 @@
-from packages import app
-from flask import request, g, jsonify
+from packages import games, questions as question_store
+from packages.cache import ResponseCache
+from packages.database import ConnectionPool
+from packages.metrics import InstrumentedConnection
+from packages.dates import UNDATED_KEY, date_bounds, date_key
+from packages.migrations import migrate
+from packages.pagination import Keyset, stream_rows
+from packages.rounds import render_round
+from packages.serialization import SQLITE_JSON, RowEncoder
+from packages.snapshot import get_snapshot
+from packages.thumbnails import prefetch_links
+from packages.versions import EVENTS, MODULES, QUESTIONS, get_versions
+from flask import Blueprint, current_app, request, g, jsonify, Response, stream_with_context, url_for
 from flask_cors import cross_origin
-import markdown.extensions.fenced_code
-from pygments.formatters import HtmlFormatter
 import os
 import sqlite3
-from dateutil import parser
-import random
+import threading
 import time
 
 DATABASE_DIR = 'databases/'
-DATABASE_NAME = 'app.db'
 DATABASE_SCHEMA = 'app.sql'
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__)).replace("packages", "")
 
+_pool_lock = threading.Lock()
+MODULE_KEYSET = Keyset("module_id")
+EVENT_KEYSET = Keyset("event_id")
+QUESTION_KEYSET = Keyset("question_id")
+TIMELINE_KEYSET = Keyset("event_date_key", "event_id")
+BUCKET_YEARS = {"decade": 10, "century": 100}
+STREAM_MIMETYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+MODULE_FIELDS = RowEncoder(("id", "module_id"), ("title", "module_title"), ("image_url", "module_image_url"),
+                           ("description", "module_description"))
+EVENT_FIELDS = RowEncoder(("id", "event_id"), ("module_id", "fk_module_id"), ("date", "event_date"),
+                          ("title", "event_title"), ("image_url", "event_image_url"),
+                          ("description", "event_description"))
+EVENT_IDS = RowEncoder((None, "event_id"))
+QUESTION_IDS = RowEncoder((None, "question_id"))
+
+api = Blueprint("api", __name__)
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Retrieves the application's SQLite connection pool, creating it from the app config on first use.
+
+    Returns:
+        ConnectionPool: The pool stored in `app.extensions['db_pool']`.
+
+    Usage:
+        Use `get_db()` inside a request; use the pool directly only outside the request cycle.
+    """
+    pool = current_app.extensions.get('db_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = current_app.extensions.get('db_pool')
+            if pool is None:
+                pool = current_app.extensions['db_pool'] = ConnectionPool(
+                    current_app.config['DATABASE'],
+                    size=current_app.config['DATABASE_POOL_SIZE'],
+                    timeout=current_app.config['DATABASE_POOL_TIMEOUT'],
+                    busy_timeout=current_app.config['DATABASE_BUSY_TIMEOUT'],
+                    pragmas=current_app.config['DATABASE_PRAGMAS'],
+                    cached_statements=current_app.config['DATABASE_CACHED_STATEMENTS'],
+                    factory=InstrumentedConnection if current_app.config['SQL_INSTRUMENTATION'] else sqlite3.Connection)
+    return pool
+
 
 def get_db() -> sqlite3.Connection:
     """
     Retrieves the SQLite database connection.
 
+    Note:
+        The connection is borrowed from the pool returned by `get_pool()` once per application context
+        and given back by `close_connection()`.
+
     Returns:
         sqlite3.Connection: A connection object to the SQLite database.
 
@@ -30,8 +84,7 @@ def get_db() -> sqlite3.Connection:
     """
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(
-            f'{ROOT_DIR}{DATABASE_DIR}{DATABASE_NAME}')
+        db = g._database = get_pool().acquire()
     return db
 
 
@@ -52,12 +105,19 @@ def get_cursor() -> sqlite3.Cursor:
     return get_db().cursor()
 
 
+def get_response_cache() -> ResponseCache:
+    """
+    Returns the application's cache of serialized read responses.
+    """
+    return current_app.extensions['response_cache']
+
+
 def init_db():
     """
-    Initializes the database by running the SQL schema script if the database is empty or if changes were made to ksiazki.sql.
+    Initializes the database by running the SQL schema script and then applying pending migrations from `packages.migrations`.
 
     Note:
-        This function should be run only when necessary, such as when the database is empty or when changes have been made to the database schema.
+        This function runs once at startup. It should not be called from the request path, as it takes the database write lock.
 
     Raises:
         RuntimeError: If the application context is not available.
@@ -66,55 +126,371 @@ def init_db():
     Usage:
         Call this function to ensure the database is set up with the latest schema.
     """
-    with app.app_context():
-        db = get_db()
-        with app.open_resource(f'{ROOT_DIR}{DATABASE_DIR}{DATABASE_SCHEMA}', mode='r') as f:
-            db.cursor().executescript(f.read())
-        db.commit()
+    db = get_db()
+    with current_app.open_resource(f'{ROOT_DIR}{DATABASE_DIR}{DATABASE_SCHEMA}', mode='r') as f:
+        db.cursor().executescript(f.read())
+    db.commit()
+    migrate(db)
 
 
-@app.route('/')
-@cross_origin()
-def index():
+def question_json(question: question_store.Question) -> dict:
+    """
+    Formats a `questions.Question` as the question endpoint returns it.
+    """
+    return {"id": question.id, "module_id": question.module_id, "question": question.question,
+            "answers": list(question.answers), "correct_answer": question.correct_answer}
+
+
+def cached_json(key: tuple, build) -> Response:
+    """
+    Returns a JSON response whose serialized body is served from the response cache, see `get_response_cache()`.
+
+    Args:
+        key (tuple): The cache key, for example ('event', event_id).
+        build (callable): Called on a cache miss to produce the JSON-serializable payload.
+
+    Returns:
+        Response: A JSON response. Cache hits skip both the database and `jsonify`.
+
+    Usage:
+        Wrap the body of a read handler whose result only changes through the write handlers that invalidate `key`.
+    """
+    return cached_body(key, lambda: current_app.json.dumpb(build()) + b"\n")
+
+
+def cached_body(key: tuple, build) -> Response:
+    """
+    Like `cached_json()`, for a `build` function that returns the serialized body itself.
+
+    Note:
+        When the request has an entity tag (`g.etag`, see `conditional.check_etag()`), the body is cached with it
+        as its version. A body cached before a write in any worker process has an older tag, so it is replaced
+        instead of served, and each key holds at most one body.
+    """
+    body = get_response_cache().get_or_build(key, build, g.get("etag"))
+    return current_app.response_class(body, mimetype=current_app.json.mimetype)
+
+
+def row_encoding(encoder: RowEncoder) -> tuple:
+    """
+    Chooses how the rows of a listing are selected and serialized.
+
+    Note:
+        With `JSON_FAST_ENCODER` on and SQLite's JSON functions available, SQLite returns each row as JSON text
+        and the row is only UTF-8 encoded. Otherwise plain columns are selected and each row goes through
+        `encoder.to_json()` and the app's JSON provider.
+
+    Args:
+        encoder (RowEncoder): The columns and JSON keys of the listing.
+
+    Returns:
+        tuple: The SQL select list, a function turning one selected row into JSON bytes, and a function turning an
+        iterable of selected rows into a JSON array body.
+    """
+    if current_app.config['JSON_FAST_ENCODER'] and SQLITE_JSON:
+        def encode_rows(rows):
+            return b"[" + ",".join(row[0] for row in rows).encode("utf-8") + b"]\n"
+        return encoder.sql(), lambda row: row[0].encode("utf-8"), encode_rows
+    json = current_app.json
+    return (encoder.columns(), lambda row: json.dumpb(encoder.to_json(row)),
+            lambda rows: json.dumpb([encoder.to_json(row) for row in rows]) + b"\n")
+
+
+def list_response(cache_key: tuple, table: str, encoder: RowEncoder, conditions: list, params: list,
+                  keyset: Keyset) -> Response:
     """
-    Renders the index page with the content of the README.md file formatted as HTML.
+    Returns a listing of rows, either whole and cached, as a keyset-paginated page, or streamed from the cursor.
 
     Note:
-        This function initializes the database by calling `init_db()` and then reads the content of the README.md file.
-        It formats the content as Markdown using the `markdown` library with extensions 'fenced_code' and 'codehilite'.
-        Additionally, it applies syntax highlighting to code blocks using the 'emacs' style from the `HtmlFormatter` class in the `codehilite` extension.
+        Without query parameters the whole listing is returned through `cached_json()`.
+        '?limit=N' returns the first N rows and '?after=<cursor>' continues after a cursor; when more rows follow,
+        the response carries the next page's cursor in 'X-Next-Cursor' and a 'Link: <...>; rel="next"' header.
+        The cursor is found with an index-only query before the page is read, so it works for streamed pages too.
+        '?stream=json' or '?stream=ndjson' writes the rows incrementally from the SQLite cursor, so memory use
+        does not grow with the number of rows.
+
+    Args:
+        cache_key (tuple): The response cache key of the whole listing, or None if it must not be cached.
+        table (str): The table to list.
+        encoder (RowEncoder): The columns to select and their JSON keys, see `row_encoding()`.
+        conditions (list): SQL conditions combined with AND.
+        params (list): Parameters of `conditions`.
+        keyset (Keyset): The ordering and pagination columns.
+
+    Returns:
+        Response: A JSON array, or NDJSON when streaming with '?stream=ndjson'.
+    """
+    columns, encode, encode_rows = row_encoding(encoder)
+    if not request.args.keys() & {"after", "limit", "stream"}:
+        def build():
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            cur = get_cursor()
+            cur.execute(f"SELECT {columns} FROM {table}{where} ORDER BY {keyset.order_by()}", params)
+            return encode_rows(cur)
+        if cache_key is None:
+            return current_app.response_class(build(), mimetype=current_app.json.mimetype)
+        return cached_body(cache_key, build)
+    try:
+        after, limit, stream = page_args(keyset)
+    except ValueError as error:
+        return jsonify({"response": 400, "error": str(error)}), 400
+    conditions = list(conditions)
+    params = list(params)
+    if after is not None:
+        conditions.append(keyset.condition())
+        params += after
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    order_by = f" ORDER BY {keyset.order_by()}"
+    cur = get_cursor()
+    next_cursor = None
+    if limit is not None:
+        cur.execute(f"SELECT {keyset.order_by()} FROM {table}{where}{order_by} LIMIT 2 OFFSET ?", params + [limit - 1])
+        boundary = cur.fetchall()
+        if len(boundary) == 2:
+            next_cursor = keyset.cursor(boundary[0])
+        order_by += " LIMIT ?"
+        params.append(limit)
+    cur.execute(f"SELECT {columns} FROM {table}{where}{order_by}", params)
+    return page_response(cur, encode, encode_rows, limit, stream, next_cursor)
+
+
+def page_args(keyset: Keyset) -> tuple:
+    """
+    Reads the '?after=', '?limit=' and '?stream=' parameters of a listing, see `list_response()`.
+
+    Args:
+        keyset (Keyset): The ordering and pagination columns of the listing.
 
     Returns:
-        str: HTML content of the README.md file with syntax-highlighted code blocks.
+        tuple: The parsed cursor values or None, the page size (capped at `PAGE_SIZE_MAX`, None for an
+        unlimited stream) and the stream format or None.
 
     Raises:
-        FileNotFoundError: If the README.md file is not found.
-        IOError: If there is an issue reading the README.md file.
-        RuntimeError: If the application context is not available.
+        ValueError: If a parameter is invalid.
+    """
+    after = request.args.get("after")
+    limit = request.args.get("limit")
+    stream = request.args.get("stream")
+    if after is not None:
+        after = keyset.parse(after)
+    if limit is not None:
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError(f"Invalid limit: {limit}")
+        limit = min(limit, current_app.config['PAGE_SIZE_MAX'])
+    elif stream is None:
+        limit = current_app.config['PAGE_SIZE']
+    if stream is not None and stream not in STREAM_MIMETYPES:
+        raise ValueError(f"Invalid stream format: {stream!r}")
+    return after, limit, stream
+
+
+def page_response(rows, encode, encode_rows, limit: int, stream: str, next_cursor: str) -> Response:
+    """
+    Serializes one page of a listing, see `list_response()`.
 
-    Usage:
-        Navigate to the index page to view the formatted README.md content.
+    Args:
+        rows: A cursor or another iterator over the rows of the page.
+        encode (callable): Turns one row into its JSON bytes, for streaming.
+        encode_rows (callable): Turns the rows into a JSON array body.
+        limit (int): The page size, repeated in the link to the next page.
+        stream (str): 'json' or 'ndjson' to stream the rows, or None.
+        next_cursor (str): The cursor of the next page, or None if this is the last page.
+
+    Returns:
+        Response: A JSON array, or NDJSON when streaming with '?stream=ndjson'.
     """
-    init_db()
-    readme_file = open("README.md", "r", encoding="utf-8")
-    md_template_string = markdown.markdown(
-        readme_file.read(), extensions=["fenced_code", 'codehilite']
-    )
-    formatter = HtmlFormatter(style="emacs", full=True, cssclass="codehilite")
-    css_string = formatter.get_style_defs()
-    md_css_string = "<style>" + css_string + "</style>"
-    md_template = md_css_string + md_template_string
-    return md_template
+    if stream is not None:
+        response = current_app.response_class(stream_with_context(stream_rows(rows, encode, stream == "ndjson")),
+                                              mimetype=STREAM_MIMETYPES[stream])
+    else:
+        response = current_app.response_class(encode_rows(rows), mimetype=current_app.json.mimetype)
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args.update(after=next_cursor, limit=limit)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{url_for(request.endpoint, **request.view_args, **args)}>; rel="next"'
+    return response
 
 
-@app.route("/modules", methods=["GET", "POST"])
+def create_row(sql: str, params: tuple, insert_children=None) -> tuple:
+    """
+    Inserts a row and returns its ID, at most once per 'Idempotency-Key' request header.
+
+    Note:
+        The new ID comes from `cursor.lastrowid`, so no second query is needed to find the row.
+        When the request carries an 'Idempotency-Key' header, the key is stored in 'idempotency_keys' in the same
+        transaction as the row. A retried request with the same key and path returns the first row's ID instead of
+        inserting again, also when two retries race: the loser's upsert of the key changes nothing, so its insert
+        is rolled back. Keys expire after `IDEMPOTENCY_KEY_TTL` seconds and may then be reused.
+
+    Args:
+        sql (str): The INSERT statement.
+        params (tuple): Parameters of the statement.
+        insert_children (callable): Called with the cursor and the new row ID to insert dependent rows in the
+            same transaction, for example a question's answers.
+
+    Returns:
+        tuple: (row ID, True if the row was inserted by this call).
+
+    Raises:
+        sqlite3.Error: If there is an issue inserting the row or committing the changes to the database.
+    """
+    cur = get_cursor()
+    db = get_db()
+    key = request.headers.get("Idempotency-Key")
+    if key is None:
+        cur.execute(sql, params)
+        row_id = cur.lastrowid
+        if insert_children is not None:
+            insert_children(cur, row_id)
+        db.commit()
+        return row_id, True
+    now = int(time.time())
+    expired = now - current_app.config['IDEMPOTENCY_KEY_TTL']
+    lookup = ("SELECT resource_id FROM idempotency_keys WHERE endpoint = ? AND idempotency_key = ? AND created_at >= ?",
+              (request.path, key, expired))
+    cur.execute(*lookup)
+    existing = cur.fetchone()
+    if existing is not None:
+        return existing[0], False
+    cur.execute(sql, params)
+    row_id = cur.lastrowid
+    if insert_children is not None:
+        insert_children(cur, row_id)
+    cur.execute("INSERT INTO idempotency_keys (endpoint, idempotency_key, resource_id, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (endpoint, idempotency_key) DO UPDATE SET resource_id = excluded.resource_id, created_at = excluded.created_at "
+                "WHERE created_at < ?",
+                (request.path, key, row_id, now, expired))
+    if cur.rowcount == 0:
+        db.rollback()
+        cur.execute(*lookup)
+        return cur.fetchone()[0], False
+    db.commit()
+    return row_id, True
+
+
+def created_response(row_id: int, created: bool) -> Response:
+    """
+    Returns the response of a create handler.
+
+    Args:
+        row_id (int): The ID of the created row.
+        created (bool): False if the row was created by an earlier request with the same 'Idempotency-Key'.
+
+    Returns:
+        Response: JSON response containing the ID and a success message. Replayed requests carry an
+        'Idempotent-Replayed: true' header.
+    """
+    response = jsonify({"id": row_id, "response": 200})
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def game_response(game: str, module_id, number=None) -> Response:
+    """
+    Returns a game round, popped from the round pool when one is ready and drawn on the spot otherwise.
+
+    Args:
+        game (str): A key of `games.GAMES`, for example 'higher-lower'.
+        module_id (str): The ID of the module to draw from.
+        number (int): The number of events, for the games that take one. Must be at least 1.
+
+    Returns:
+        Response: A JSON response with the round, or 400 if `number` is below 1. With `SCORING_ENABLED`, scored
+        games return the round without its answer and with a 'round_token', see `games.format_round()`. When the
+        next round of the same queue is already drawn, a 'Link' header asks the browser to prefetch its
+        thumbnails, see `RoundPool.next_thumbnails()`.
+    """
+    if number is not None and number < 1:
+        return jsonify({"response": 400, "error": "The number of events must be a positive integer"}), 400
+    pool = current_app.extensions['round_pool']
+    body = pool.pop(game, module_id, number)
+    if body is None:
+        body = draw_round(game, module_id, number)
+    response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    links = prefetch_links(pool.next_thumbnails(game, module_id, number))
+    if links:
+        response.headers["Link"] = links
+    return response
+
+
+def game_source() -> tuple:
+    """
+    Returns the cursor and the samplers that game rounds are drawn with.
+
+    Returns:
+        tuple: (None, the snapshot's samplers) in read-only mode, else (a cursor, `app.extensions['samplers']`).
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return None, snapshot.samplers
+    return get_cursor(), current_app.extensions['samplers']
+
+
+def draw_round(game: str, module_id, number=None) -> bytes:
+    """
+    Draws and serializes one game round without the round pool, see `rounds.render_round()`.
+    """
+    cur, samplers = game_source()
+    return render_round(cur, samplers, current_app.json, game, module_id, number,
+                        current_app.extensions.get('round_tokens'))
+
+
+def invalidate_module(module_id):
+    """
+    Drops cached responses that contain a module's own fields and bumps the module's version.
+
+    Args:
+        module_id (str): The ID of the changed module.
+    """
+    versions = get_versions()
+    versions.bump(MODULES, versions.module_slot(module_id))
+    get_response_cache().invalidate(("modules",), ("module", str(module_id)))
+
+
+def invalidate_events(module_id, event_id=None):
+    """
+    Drops cached responses, sampled IDs and game rounds affected by a change to a module's events, and bumps the
+    module's version.
+
+    Args:
+        module_id (str): The ID of the module the event belongs to.
+        event_id (str): The ID of the changed event, if an existing event was updated or deleted.
+    """
+    versions = get_versions()
+    versions.bump(EVENTS, versions.module_slot(module_id))
+    current_app.extensions['samplers']['events'].invalidate(module_id)
+    current_app.extensions['round_pool'].invalidate(module_id)
+    get_response_cache().invalidate(("events", str(module_id)), ("timeline", str(module_id)), ("timeline", "1"),
+                                    ("event", str(event_id)),
+                                    *(("buckets", key, size) for key in (str(module_id), "1") for size in BUCKET_YEARS))
+
+
+def invalidate_questions(module_id, question_id=None):
+    """
+    Drops cached responses, parsed questions and game rounds affected by a change to a module's questions, and
+    bumps the module's version.
+
+    Args:
+        module_id (str): The ID of the module the question belongs to.
+        question_id (str): The ID of the changed question, if an existing question was updated or deleted.
+    """
+    versions = get_versions()
+    versions.bump(QUESTIONS, versions.module_slot(module_id))
+    current_app.extensions['samplers']['questions'].invalidate(module_id)
+    current_app.extensions['round_pool'].invalidate(module_id)
+    get_response_cache().invalidate(("questions", str(module_id)), ("question", str(question_id)))
+
+
+@api.route("/modules", methods=["GET", "POST"])
 @cross_origin()
 def modules():
     """
     Handles GET and POST requests for the '/modules' endpoint.
 
     Note:
-        This function retrieves a cursor from the database using `get_cursor()` and the database connection using `get_db()`.
         For POST requests, it expects JSON data containing 'title', 'image_url', and 'description'.
         It inserts the received data into the 'modules' table and returns the ID of the inserted module.
         For GET requests, it retrieves all modules from the 'modules' table and returns them as JSON objects.
@@ -129,28 +505,21 @@ def modules():
         - For POST requests, send JSON data with 'title', 'image_url', and 'description' to add a new module.
         - For GET requests, retrieve a list of all modules.
     """
-    cur = get_cursor()
-    db = get_db()
     if request.method == "POST":
         data = request.json
         title = data['title']
         image_url = data['image_url']
         description = data['description']
-        cur.execute("INSERT INTO modules (module_title, module_image_url, module_description) VALUES (?, ?, ?)",
-                    (title, image_url, description))
-        db.commit()
-        cur.execute('SELECT * FROM modules WHERE module_title = ?', (title,))
-        module = cur.fetchone()
-        return jsonify({"id": module[0], "response": 200})
+        module_id, created = create_row("INSERT INTO modules (module_title, module_image_url, module_description) VALUES (?, ?, ?)",
+                                        (title, image_url, description))
+        if created:
+            invalidate_module(module_id)
+        return created_response(module_id, created)
     elif request.method == "GET":
-        cur.execute("SELECT * FROM modules")
-        modules = cur.fetchall()
-        modules = [{"id": module[0], "title": module[1], "image_url": module[2],
-                    "description": module[3]} for module in modules]
-        return jsonify(modules)
+        return list_response(("modules",), "modules", MODULE_FIELDS, [], [], MODULE_KEYSET)
 
 
-@app.route("/modules/<module_id>", methods=["GET", "DELETE", "PUT"])
+@api.route("/modules/<module_id>", methods=["GET", "DELETE", "PUT"])
 @cross_origin()
 def get_module(module_id):
     """
@@ -175,14 +544,17 @@ def get_module(module_id):
     cur = get_cursor()
     db = get_db()
     if request.method == "GET":
-        cur.execute("SELECT * FROM modules WHERE module_id = ?", (module_id,))
-        module = cur.fetchone()
-        if module is None:
-            return jsonify({})
-        return jsonify({"id": module[0], "title": module[1], "image_url": module[2], "description": module[3]})
+        def build():
+            cur.execute("SELECT * FROM modules WHERE module_id = ?", (module_id,))
+            module = cur.fetchone()
+            if module is None:
+                return {}
+            return MODULE_FIELDS.to_json(module)
+        return cached_json(("module", module_id), build)
     elif request.method == "DELETE":
         cur.execute("DELETE FROM modules WHERE module_id = ?", (module_id,))
         db.commit()
+        invalidate_module(module_id)
         return jsonify({"response": 200})
     elif request.method == "PUT":
         data = request.json
@@ -192,10 +564,11 @@ def get_module(module_id):
         cur.execute("UPDATE modules SET module_title = ?, module_image_url = ?, module_description = ? WHERE module_id = ?",
                     (title, image_url, description, module_id))
         db.commit()
+        invalidate_module(module_id)
     return jsonify({"response": 200})
 
 
-@app.route("/events/<module_id>", methods=["GET", "POST"])
+@api.route("/events/<module_id>", methods=["GET", "POST"])
 @cross_origin()
 def events(module_id):
     """
@@ -214,8 +587,6 @@ def events(module_id):
         - For POST requests, add a new event associated with the specified module by providing JSON data with 'date', 'title', 'image_url', and 'description'.
         - For GET requests, retrieve a list of event IDs associated with the specified module.
     """
-    cur = get_cursor()
-    db = get_db()
     if request.method == "POST":
         data = request.json
         fk_module_id = int(module_id)
@@ -223,21 +594,21 @@ def events(module_id):
         event_title = data['title']
         event_image_url = data['image_url']
         event_description = data['description']
-        cur.execute("INSERT INTO event (fk_module_id, event_date, event_title, event_image_url, event_description) VALUES (?, ?, ?, ?, ?)",
-                    (fk_module_id, event_date, event_title, event_image_url, event_description))
-        db.commit()
-        cur.execute('SELECT * FROM event WHERE event_title = ?',
-                    (event_title,))
-        event = cur.fetchone()
-        return jsonify({"id": event[0], "response": 200})
+        try:
+            event_date_key = date_key(event_date)
+        except ValueError as error:
+            return jsonify({"response": 400, "error": str(error)}), 400
+        event_id, created = create_row("INSERT INTO event (fk_module_id, event_date, event_title, event_image_url, event_description, event_date_key) VALUES (?, ?, ?, ?, ?, ?)",
+                                       (fk_module_id, event_date, event_title, event_image_url, event_description, event_date_key))
+        if created:
+            invalidate_events(fk_module_id)
+        return created_response(event_id, created)
     elif request.method == "GET":
-        cur.execute(f"SELECT * FROM event WHERE fk_module_id = {module_id}")
-        events = cur.fetchall()
-        events = [event[0] for event in events]
-        return jsonify(events)
+        return list_response(("events", module_id), "event", EVENT_IDS, ["fk_module_id = ?"], [module_id],
+                             EVENT_KEYSET)
 
 
-@app.route("/event/<event_id>", methods=["GET", "DELETE", "PUT"])
+@api.route("/event/<event_id>", methods=["GET", "DELETE", "PUT"])
 @cross_origin()
 def get_event(event_id):
     """
@@ -262,14 +633,20 @@ def get_event(event_id):
     cur = get_cursor()
     db = get_db()
     if request.method == "GET":
-        cur.execute("SELECT * FROM event WHERE event_id = ?", (event_id,))
-        event = cur.fetchone()
-        if event is None:
-            return jsonify({})
-        return jsonify({"id": event[0], "module_id": event[1], "date": event[2], "title": event[3], "image_url": event[4], "description": event[5]})
-    elif request.method == "DELETE":
+        def build():
+            cur.execute("SELECT * FROM event WHERE event_id = ?", (event_id,))
+            event = cur.fetchone()
+            if event is None:
+                return {}
+            return EVENT_FIELDS.to_json(event)
+        return cached_json(("event", event_id), build)
+    cur.execute("SELECT fk_module_id FROM event WHERE event_id = ?", (event_id,))
+    event = cur.fetchone()
+    if request.method == "DELETE":
         cur.execute("DELETE FROM event WHERE event_id = ?", (event_id,))
         db.commit()
+        if event is not None:
+            invalidate_events(event[0], event_id)
         return jsonify({"response": 200})
     elif request.method == "PUT":
         data = request.json
@@ -277,73 +654,128 @@ def get_event(event_id):
         event_title = data['title']
         event_image_url = data['image_url']
         event_description = data['description']
-        cur.execute("UPDATE event SET event_date = ?, event_title = ?, event_image_url = ?, event_description = ? WHERE event_id = ?",
-                    (event_date, event_title, event_image_url, event_description, event_id))
+        try:
+            event_date_key = date_key(event_date)
+        except ValueError as error:
+            return jsonify({"response": 400, "error": str(error)}), 400
+        cur.execute("UPDATE event SET event_date = ?, event_title = ?, event_image_url = ?, event_description = ?, event_date_key = ? WHERE event_id = ?",
+                    (event_date, event_title, event_image_url, event_description, event_date_key, event_id))
         db.commit()
+        if event is not None:
+            invalidate_events(event[0], event_id)
         return jsonify({"response": 200})
 
 
-def convert_date(event):
+def timeline_filters() -> tuple:
     """
-    Converts a date string in ISO format (YYYY-MM-DD) to a datetime object.
+    Reads the '?from=', '?to=' and '?buckets=' parameters of a timeline request.
+
+    Returns:
+        tuple: The first and last date keys of the range, each None when not given, and the bucket name or None.
+        A range with only an end starts after `dates.UNDATED_KEY`, so undated events are never part of a range.
+
+    Raises:
+        ValueError: If a date or the bucket name is invalid.
+    """
+    date_from = request.args.get("from")
+    date_to = request.args.get("to")
+    buckets = request.args.get("buckets")
+    if buckets is not None and buckets not in BUCKET_YEARS:
+        raise ValueError(f"Invalid buckets: {buckets!r}")
+    first = date_bounds(date_from)[0] if date_from is not None else None
+    last = date_bounds(date_to)[1] if date_to is not None else None
+    if first is None and last is not None:
+        first = UNDATED_KEY + 1
+    return first, last, buckets
+
+
+def bucket_counts(cur: sqlite3.Cursor, conditions: list, params: list, years: int) -> list:
+    """
+    Counts events per bucket of `years` years, for example per decade or century.
+
+    Note:
+        The buckets are walked along the 'event_date_key' index: one query counts the events of a bucket and
+        another jumps to the first event after it, so empty buckets cost nothing and no statement has to group or
+        sort. Bucket years are floored, so the decade of 44 BC (year -43) starts in year -50. Undated events, see
+        `dates.UNDATED_KEY`, are not counted.
 
     Args:
-        event (tuple): A tuple representing an event with a date string at index 2.
+        cur (sqlite3.Cursor): The cursor to query with.
+        conditions (list): SQL conditions on the 'event' table combined with AND, at most on 'fk_module_id' and
+            'event_date_key'.
+        params (list): Parameters of `conditions`.
+        years (int): The bucket width in years.
 
     Returns:
-        datetime: A datetime object representing the converted date.
-
-    Usage:
-        Pass an event tuple containing a date string to convert it to a datetime object.
-    """
-    temp = event[2].split("-")
-    if len(temp) == 1:
-        temp[0] = "0" * (4 - len(temp[0])) + temp[0]
-        temp.append("01")
-        temp.append("01")
-    elif len(temp) == 2:
-        temp.append("01")
-    elif len(temp) == 3:
-        if len(temp[0]) < 4:
-            temp[0] = "0" * (4 - len(temp[0])) + temp[0]
-        if len(temp[1]) < 2:
-            temp[1] = "0" + temp[1]
-        if len(temp[2]) < 2:
-            temp[2] = "0" + temp[2]
-    temp = "-".join(temp)
-    return parser.parse(temp, yearfirst=True)
-
-
-@app.route("/timeline/<module_id>", methods=["GET"])
+        list: Dictionaries with 'start' and 'end' (inclusive) years and the 'count' of events, earliest first.
+            Buckets without events are left out.
+    """
+    where = " AND ".join(conditions + ["event_date_key >= ?"])
+    buckets = []
+    cur.execute(f"SELECT min(event_date_key) FROM event WHERE {where}", params + [UNDATED_KEY + 1])
+    first = cur.fetchone()[0]
+    while first is not None:
+        start = first // 10000 // years * years
+        cur.execute(f"SELECT count(*) FROM event WHERE {where} AND event_date_key < ?",
+                    params + [first, (start + years) * 10000])
+        buckets.append({"start": start, "end": start + years - 1, "count": cur.fetchone()[0]})
+        cur.execute(f"SELECT min(event_date_key) FROM event WHERE {where}", params + [(start + years) * 10000])
+        first = cur.fetchone()[0]
+    return buckets
+
+
+@api.route("/timeline", methods=["GET"], defaults={"module_id": None})
+@api.route("/timeline/<module_id>", methods=["GET"])
 @cross_origin()
 def event_timeline(module_id):
     """
     Retrieves events associated with a specific module ID and returns them sorted by date in ascending order.
 
+    Note:
+        Ordering is done by SQLite over the indexed 'event_date_key' column. '/timeline', and module ID 1, return
+        events from every module. '?from=' and '?to=' keep the events between two dates, both inclusive, with a
+        range scan over the same index; a year or month covers its whole period, so '?from=1500&to=1700' ends on
+        1700-12-31. '?buckets=decade' or '?buckets=century' returns event counts per period instead of events.
+
     Args:
-        module_id (str): The ID of the module to retrieve events for.
+        module_id (str): The ID of the module to retrieve events for, or None for every module.
 
     Returns:
         list: JSON response containing a list of dictionaries, each representing an event with 'id', 'module_id', 'date', 'title', 'image_url', and 'description' keys, sorted by date.
+            With '?buckets=', a list of dictionaries with 'start', 'end' and 'count' keys as returned by `bucket_counts()`.
 
     Usage:
-        Retrieve events associated with a module by providing its ID.
+        Retrieve events associated with a module by providing its ID, for example GET /timeline/2?from=1500&to=1700.
     """
-    cur = get_cursor()
     if module_id == "1":
-        cur.execute("SELECT * FROM event")
+        module_id = None
+    if module_id is None:
+        conditions, params = [], []
     else:
-        cur.execute(f"SELECT * FROM event WHERE fk_module_id = {module_id}")
-    events = cur.fetchall()
-    if events is None:
-        return jsonify({"events": []})
-    events = sorted(events, key=convert_date)
-    events = [{"id": event[0], "module_id": event[1], "date": event[2], "title": event[3],
-               "image_url": event[4], "description": event[5]} for event in events]
-    return jsonify(events)
-
-
-@app.route("/game/image-name/<module_id>/<number_of_events>", methods=["GET"])
+        conditions, params = ["fk_module_id = ?"], [module_id]
+    try:
+        first, last, buckets = timeline_filters()
+    except ValueError as error:
+        return jsonify({"response": 400, "error": str(error)}), 400
+    if first is not None:
+        conditions.append("event_date_key >= ?")
+        params.append(first)
+    if last is not None:
+        conditions.append("event_date_key <= ?")
+        params.append(last)
+    cache_key = module_id or "1"
+    ranged = first is not None or last is not None
+    if buckets is not None:
+        def build():
+            return bucket_counts(get_cursor(), conditions, params, BUCKET_YEARS[buckets])
+        if ranged:
+            return jsonify(build())
+        return cached_json(("buckets", cache_key, buckets), build)
+    return list_response(None if ranged else ("timeline", cache_key), "event", EVENT_FIELDS, conditions, params,
+                         TIMELINE_KEYSET)
+
+
+@api.route("/game/image-name/<module_id>/<int:number_of_events>", methods=["GET"])
 @cross_origin()
 def image_name_game(module_id, number_of_events):
     """
@@ -351,7 +783,7 @@ def image_name_game(module_id, number_of_events):
 
     Args:
         module_id (str): The ID of the module to retrieve events for.
-        number_of_events (str): The number of events to retrieve.
+        number_of_events (int): The number of events to retrieve, at least 1.
 
     Returns:
         list: JSON response containing a list of dictionaries, each representing an event with 'title' and 'image_url' keys.
@@ -359,17 +791,10 @@ def image_name_game(module_id, number_of_events):
     Usage:
         Retrieve a random selection of events' titles and image URLs associated with a module by providing its ID and the desired number of events.
     """
-    cur = get_cursor()
-    cur.execute(f"SELECT * FROM event WHERE fk_module_id = {module_id}")
-    events = cur.fetchall()
-    if events is None:
-        return jsonify({[]})
-    events = random.sample(events, int(number_of_events))
-    events = [{"event_id": event[0], "title": event[3], "image_url": event[4]} for event in events]
-    return jsonify(events)
+    return game_response("image-name", module_id, number_of_events)
 
 
-@app.route("/game/image-date/<module_id>/<number_of_events>", methods=["GET"])
+@api.route("/game/image-date/<module_id>/<int:number_of_events>", methods=["GET"])
 @cross_origin()
 def image_date_game(module_id, number_of_events):
     """
@@ -377,7 +802,7 @@ def image_date_game(module_id, number_of_events):
 
     Args:
         module_id (str): The ID of the module to retrieve events for.
-        number_of_events (str): The number of events to retrieve.
+        number_of_events (int): The number of events to retrieve, at least 1.
 
     Returns:
         list: JSON response containing a list of dictionaries, each representing an event with 'date' and 'image_url' keys.
@@ -385,17 +810,10 @@ def image_date_game(module_id, number_of_events):
     Usage:
         Retrieve a random selection of events' dates and image URLs associated with a module by providing its ID and the desired number of events.
     """
-    cur = get_cursor()
-    cur.execute(f"SELECT * FROM event WHERE fk_module_id = {module_id}")
-    events = cur.fetchall()
-    if events is None:
-        return jsonify({[]})
-    events = random.sample(events, int(number_of_events))
-    events = [{"date": event[2], "image_url": event[4], "id": event[0], "year": "0" * (4 - len(event[2].split('-')[0])) + event[2].split('-')[0]} for event in events]
-    return jsonify(events)
+    return game_response("image-date", module_id, number_of_events)
 
 
-@app.route("/game/higher-lower/<module_id>", methods=["GET"])
+@api.route("/game/higher-lower/<module_id>", methods=["GET"])
 @cross_origin()
 def higher_lower(module_id):
     """
@@ -410,20 +828,10 @@ def higher_lower(module_id):
     Usage:
         Retrieve two random events associated with a module for the higher-lower game by providing its ID.
     """
-    cur = get_cursor()
-    cur.execute(f"SELECT * FROM event WHERE fk_module_id = {module_id}")
-    events = cur.fetchall()
-    if events is None:
-        return jsonify([])
-    random.seed(time.time())
-    events = random.sample(events, 2)
-    events = sorted(events, key=convert_date)
-    events = [{"event_id": event[0], "date": event[2], "title": event[3],
-               "image_url": event[4]} for event in events]
-    return jsonify(events)
-
-
-@app.route("/game/chronological/<module_id>/<number_of_events>", methods=["GET"])
+    return game_response("higher-lower", module_id)
+
+
+@api.route("/game/chronological/<module_id>/<int:number_of_events>", methods=["GET"])
 @cross_origin()
 def chronological(module_id, number_of_events):
     """
@@ -431,7 +839,7 @@ def chronological(module_id, number_of_events):
 
     Args:
         module_id (str): The ID of the module to retrieve events for.
-        number_of_events (str): The number of events to retrieve.
+        number_of_events (int): The number of events to retrieve, at least 1.
 
     Returns:
         list: JSON response containing a list of dictionaries, each representing an event with 'date', 'title', and 'image_url' keys, sorted chronologically by date.
@@ -439,20 +847,10 @@ def chronological(module_id, number_of_events):
     Usage:
         Retrieve a random selection of events associated with a module and sorted chronologically by date by providing its ID and the desired number of events.
     """
-    cur = get_cursor()
-    cur.execute(f"SELECT * FROM event WHERE fk_module_id = {module_id}")
-    events = cur.fetchall()
-    if events is None:
-        return jsonify([])
-    random.seed(time.time())
-    events = random.sample(events, int(number_of_events))
-    events = sorted(events, key=convert_date)
-    events = [{"event_id": event[0], "date": event[2], "title": event[3],
-               "image_url": event[4]} for event in events]
-    return jsonify(events)
-
-
-@app.route("/game/trivia/<module_id>", methods=["GET"])
+    return game_response("chronological", module_id, number_of_events)
+
+
+@api.route("/game/trivia/<module_id>", methods=["GET"])
 @cross_origin()
 def trivia(module_id):
     """
@@ -467,23 +865,74 @@ def trivia(module_id):
     Usage:
         Retrieve a random trivia question associated with a module by providing its ID.
     """
-    cur = get_cursor()
-    cur.execute(f"SELECT * FROM questions WHERE fk_module_id = {module_id}")
-    questions = cur.fetchall()
-    if questions is None:
-        return jsonify([])
-    random.seed(time.time())
-    questions = random.sample(questions, 1)
-    if len(questions) < 1:
-        return jsonify({})
-    answers = questions[3].split("|")
-    answers = questions[0][3].split("|")
-    questions = {"question": questions[0][2], "answers": answers,
-                 "correct_answer": questions[0][4].strip()}
-    return jsonify(questions)
-
-
-@app.route("/questions/<module_id>", methods=["GET", "POST"])
+    return game_response("trivia", module_id)
+
+
+def session_arg(name: str, default: int, maximum: int) -> int:
+    """
+    Reads an integer parameter of a game session request, see `game_session()`.
+
+    Args:
+        name (str): The query parameter, 'rounds' or 'events'.
+        default (int): The value when the parameter is missing.
+        maximum (int): The largest allowed value.
+
+    Returns:
+        int: The value, between 1 and `maximum`.
+
+    Raises:
+        ValueError: If the parameter is not an integer between 1 and `maximum`.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or not 1 <= int(value) <= maximum:
+        raise ValueError(f"{name} must be an integer between 1 and {maximum}")
+    return int(value)
+
+
+@api.route("/game/session/<game>/<module_id>", methods=["GET"])
+@cross_origin()
+def game_session(game, module_id):
+    """
+    Retrieves several rounds of a game in one request.
+
+    Note:
+        No two rounds of a session use the same set of events or the same question, and all rows are read with
+        a single query. When the module has too few rows for that many distinct rounds, fewer are returned.
+        '?rounds=' sets the number of rounds (default 10, at most `GAME_SESSION_MAX_ROUNDS`); '?events=' the
+        number of events per round of 'image-name', 'image-date' and 'chronological' (default 4, at most
+        `GAME_SESSION_MAX_EVENTS`). A 'trivia' session is a multi-question quiz. A 'Link' header asks the
+        browser to prefetch the thumbnails of the rounds after the first.
+
+    Args:
+        game (str): One of 'image-name', 'image-date', 'higher-lower', 'chronological' and 'trivia'.
+        module_id (str): The ID of the module to draw from.
+
+    Returns:
+        dict: JSON response with 'game', 'module_id' and a list of 'rounds', each shaped like the response of the
+        single-round endpoint of that game.
+
+    Usage:
+        GET /game/session/higher-lower/2?rounds=20 for a 20-round higher-lower session.
+    """
+    if game not in games.GAMES:
+        return jsonify({"response": 404, "error": f"Unknown game: {game}"}), 404
+    try:
+        rounds = session_arg("rounds", 10, current_app.config['GAME_SESSION_MAX_ROUNDS'])
+        number = session_arg("events", 4, current_app.config['GAME_SESSION_MAX_EVENTS'])
+    except ValueError as error:
+        return jsonify({"response": 400, "error": str(error)}), 400
+    cur, samplers = game_source()
+    drawn = games.session(cur, samplers, game, module_id, rounds, number, current_app.extensions.get('round_tokens'))
+    response = jsonify({"game": game, "module_id": module_id, "rounds": drawn})
+    links = prefetch_links(path for game_round in drawn[1:] for path in games.thumbnails(game_round))
+    if links:
+        response.headers["Link"] = links
+    return response
+
+
+@api.route("/questions/<module_id>", methods=["GET", "POST"])
 @cross_origin()
 def questions(module_id):
     """
@@ -502,31 +951,24 @@ def questions(module_id):
         - For POST requests, add a new question associated with the specified module by providing JSON data with 'question', 'answers', and 'correct_answer'.
         - For GET requests, retrieve a list of question IDs associated with the specified module.
     """
-    cur = get_cursor()
-    db = get_db()
     if request.method == "POST":
         data = request.json
         fk_module_id = int(module_id)
         question = data['question']
         answers = data['answers']
-        answers = "|".join(answers)
         correct_answer = data['correct_answer']
-        cur.execute("INSERT INTO questions (fk_module_id, question, answers, correct_answer) VALUES (?, ?, ?, ?, ?)",
-                    (fk_module_id, question, answers, correct_answer))
-        db.commit()
-        cur.execute('SELECT * FROM questions WHERE question = ?',
-                    (question,))
-        onequestion = cur.fetchone()
-        return jsonify({"id": onequestion[0], "response": 200})
+        question_id, created = create_row(
+            "INSERT INTO questions (fk_module_id, question) VALUES (?, ?)", (fk_module_id, question),
+            lambda cur, question_id: question_store.write_answers(cur, question_id, answers, correct_answer))
+        if created:
+            invalidate_questions(fk_module_id)
+        return created_response(question_id, created)
     elif request.method == "GET":
-        cur.execute(
-            f"SELECT * FROM questions WHERE fk_module_id = {module_id}")
-        question_list = cur.fetchall()
-        question_list = [onequestion[0] for onequestion in question_list]
-        return jsonify(question_list)
+        return list_response(("questions", module_id), "questions", QUESTION_IDS, ["fk_module_id = ?"], [module_id],
+                             QUESTION_KEYSET)
 
 
-@app.route("/question/<question_id>", methods=["GET", "DELETE", "PUT"])
+@api.route("/question/<question_id>", methods=["GET", "DELETE", "PUT"])
 @cross_origin()
 def get_question(question_id):
     """
@@ -551,40 +993,49 @@ def get_question(question_id):
     cur = get_cursor()
     db = get_db()
     if request.method == "GET":
-        cur.execute(
-            "SELECT * FROM questions WHERE question_id = ?", (question_id,))
-        onequestion = cur.fetchone()
-        if onequestion is None:
-            return jsonify({})
-        return jsonify({"id": onequestion[0], "module_id": onequestion[1], "question": onequestion[2], "answers": onequestion[3], "correct_answer": onequestion[4]})
-    elif request.method == "DELETE":
+        def build():
+            found = question_store.read_questions(cur, "questions.question_id = ?", (question_id,))
+            if not found:
+                return {}
+            return question_json(found[0])
+        return cached_json(("question", question_id), build)
+    cur.execute("SELECT fk_module_id FROM questions WHERE question_id = ?", (question_id,))
+    onequestion = cur.fetchone()
+    if request.method == "DELETE":
+        cur.execute("DELETE FROM question_answers WHERE fk_question_id = ?", (question_id,))
         cur.execute("DELETE FROM questions WHERE question_id = ?",
                     (question_id,))
         db.commit()
+        if onequestion is not None:
+            invalidate_questions(onequestion[0], question_id)
         return jsonify({"response": 200})
     elif request.method == "PUT":
         data = request.json
         question = data['question']
         answers = data['answers']
+        if isinstance(answers, str):
+            answers = answers.split("|")
         correct_answer = data['correct_answer']
-        cur.execute("UPDATE questions SET question = ?, answers = ?, correct_answer = ? WHERE question_id = ?",
-                    (question, answers, correct_answer))
+        cur.execute("UPDATE questions SET question = ? WHERE question_id = ?", (question, question_id))
+        if onequestion is not None:
+            question_store.write_answers(cur, question_id, answers, correct_answer)
         db.commit()
+        if onequestion is not None:
+            invalidate_questions(onequestion[0], question_id)
         return jsonify({"response": 200})
 
 
-@app.teardown_appcontext
 def close_connection(exception):
     """
-    Closes the database connection when the application context is torn down.
+    Returns the database connection to the pool when the application context is torn down.
 
     Args:
         exception (Exception): An exception that might have occurred during the application context tear down.
 
     Usage:
         This function is automatically called by Flask when the application context is torn down.
-        It ensures that the database connection is properly closed to prevent resource leaks.
+        It ensures that the database connection is handed back to the pool, with any open transaction rolled back.
     """
-    db = getattr(g, '_database', None)
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        get_pool().release(db)
@@ -0,0 +1,329 @@
+import csv
+import io
+import json
+import sqlite3
+
+import click
+from flask import Blueprint, current_app, request, jsonify, stream_with_context
+from flask_cors import cross_origin
+
+from packages.backend import get_db, get_cursor, get_response_cache
+from packages.dates import date_key
+from packages.versions import get_versions
+from packages import questions
+
+RECORD_FIELDS = {
+    "module": ("title", "image_url", "description"),
+    "event": ("module_id", "date", "title", "image_url", "description"),
+    "question": ("module_id", "question", "answers", "correct_answer"),
+}
+# Fields that are not stored as text as they are.
+NON_TEXT_FIELDS = ("module_id", "answers")
+MAX_REPORTED_ERRORS = 1000
+
+api = Blueprint("bulk", __name__, cli_group=None)
+
+
+def read_ndjson(lines):
+    """
+    Parses newline-delimited JSON records.
+
+    Args:
+        lines (iterable): Lines of text, one JSON object per line. Blank lines are skipped.
+
+    Yields:
+        tuple: (line number, record dict) pairs, or (line number, ValueError) for lines that are not JSON objects.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError as error:
+            yield line_number, ValueError(f"Invalid JSON: {error}")
+            continue
+        yield line_number, record
+
+
+def read_csv(lines, record_type=None, module_id=None):
+    """
+    Parses CSV records that have a header row.
+
+    Args:
+        lines (iterable): Lines of CSV text.
+        record_type (str): Record type for files without a 'type' column.
+        module_id (str): Module ID for files without a 'module_id' column.
+
+    Yields:
+        tuple: (line number, record dict) pairs. A question's 'answers' column holds the answers separated by '|'.
+    """
+    reader = csv.DictReader(lines)
+    for record in reader:
+        if record_type is not None:
+            record.setdefault("type", record_type)
+        if module_id is not None:
+            record.setdefault("module_id", module_id)
+        if isinstance(record.get("answers"), str):
+            record["answers"] = record["answers"].split("|")
+        yield reader.line_num, record
+
+
+def validate(record: dict, module_ids: dict) -> tuple:
+    """
+    Checks one import record and converts it into the values to insert.
+
+    Args:
+        record (dict): The parsed record with a 'type' field.
+        module_ids (dict): Maps module IDs that may be referenced by events and questions to database IDs.
+
+    Returns:
+        tuple: (record type, tuple of column values) ready to be inserted.
+
+    Raises:
+        ValueError: If the record is incomplete or invalid.
+    """
+    record_type = record.get("type")
+    if record_type not in RECORD_FIELDS:
+        raise ValueError(f"Unknown record type: {record_type!r}")
+    missing = [field for field in RECORD_FIELDS[record_type] if record.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    not_text = [field for field in RECORD_FIELDS[record_type]
+                if field not in NON_TEXT_FIELDS and not isinstance(record[field], str)]
+    if not_text:
+        raise ValueError(f"Fields must be strings: {', '.join(not_text)}")
+    if record_type != "module" and not isinstance(record["module_id"], (str, int)):
+        raise ValueError("'module_id' must be a string or an integer")
+    if record_type == "module":
+        return record_type, (record["title"], record["image_url"], record["description"])
+    module_id = module_ids.get(str(record["module_id"]))
+    if module_id is None:
+        raise ValueError(f"Unknown module: {record['module_id']!r}")
+    if record_type == "event":
+        return record_type, (module_id, record["date"], record["title"], record["image_url"], record["description"],
+                             date_key(record["date"]))
+    answers = record["answers"]
+    if not isinstance(answers, list) or not all(isinstance(answer, str) for answer in answers):
+        raise ValueError("'answers' must be a list of strings")
+    return record_type, (module_id, record["question"], answers, record["correct_answer"])
+
+
+def import_records(db: sqlite3.Connection, records, chunk_size=1000) -> dict:
+    """
+    Inserts modules, events and questions in batches.
+
+    Note:
+        Events and questions are buffered and written per chunk: events and answers with `executemany`, questions
+        one by one because each answer row needs its question's ID. Every `chunk_size` records the transaction is
+        committed, so a large import neither holds the write lock for its whole duration nor commits once per row.
+        Module records are inserted one by one because their new ID is needed: a module
+        record with an 'id' field maps that ID to the new module, so an export can be re-imported as a whole.
+        Invalid records are skipped and reported; they do not abort the import.
+
+    Args:
+        db (sqlite3.Connection): The database connection to write to.
+        records (iterable): (line number, record dict or ValueError) pairs from `read_ndjson()` or `read_csv()`.
+        chunk_size (int): Number of records per transaction.
+
+    Returns:
+        dict: Counts of inserted 'modules', 'events' and 'questions' and a list of per-line 'errors'.
+    """
+    cur = db.cursor()
+    module_ids = {str(row[0]): row[0] for row in cur.execute("SELECT module_id FROM modules")}
+    report = {"modules": 0, "events": 0, "questions": 0, "errors": []}
+    batches = {"event": [], "question": []}
+    pending = 0
+
+    def flush():
+        if batches["event"]:
+            cur.executemany("INSERT INTO event (fk_module_id, event_date, event_title, event_image_url, event_description, event_date_key) VALUES (?, ?, ?, ?, ?, ?)",
+                            batches["event"])
+            report["events"] += len(batches["event"])
+        if batches["question"]:
+            answers = []
+            for module_id, question, question_answers, correct_answer in batches["question"]:
+                cur.execute("INSERT INTO questions (fk_module_id, question) VALUES (?, ?)", (module_id, question))
+                answers += questions.answer_rows(cur.lastrowid, question_answers, correct_answer)
+            cur.executemany("INSERT INTO question_answers (fk_question_id, ordinal, answer, is_correct) VALUES (?, ?, ?, ?)",
+                            answers)
+            report["questions"] += len(batches["question"])
+        db.commit()
+        batches["event"].clear()
+        batches["question"].clear()
+
+    for line_number, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            record_type, values = validate(record, module_ids)
+        except ValueError as error:
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_number, "error": str(error)})
+            continue
+        if record_type == "module":
+            cur.execute("INSERT INTO modules (module_title, module_image_url, module_description) VALUES (?, ?, ?)",
+                        values)
+            module_ids[str(cur.lastrowid)] = cur.lastrowid
+            if record.get("id") not in (None, ""):
+                module_ids[str(record["id"])] = cur.lastrowid
+            report["modules"] += 1
+        else:
+            batches[record_type].append(values)
+        pending += 1
+        if pending >= chunk_size:
+            flush()
+            pending = 0
+    flush()
+    return report
+
+
+def export_records(cur: sqlite3.Cursor, module_id=None):
+    """
+    Reads modules with their events and questions in a single pass.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to query with.
+        module_id (str): Export only this module. All modules are exported when omitted.
+
+    Yields:
+        dict: A module record followed by its event records, in date order, and its question records,
+        in the format accepted by `import_records()`.
+    """
+    if module_id is None:
+        modules = cur.execute("SELECT * FROM modules ORDER BY module_id").fetchall()
+    else:
+        modules = cur.execute("SELECT * FROM modules WHERE module_id = ?", (module_id,)).fetchall()
+    for module in modules:
+        yield {"type": "module", "id": module[0], "title": module[1], "image_url": module[2],
+               "description": module[3]}
+        cur.execute("SELECT * FROM event WHERE fk_module_id = ? ORDER BY event_date_key, event_id", (module[0],))
+        for event in cur:
+            yield {"type": "event", "id": event[0], "module_id": event[1], "date": event[2], "title": event[3],
+                   "image_url": event[4], "description": event[5]}
+        for question in questions.read_questions(cur, "questions.fk_module_id = ?", (module[0],)):
+            yield {"type": "question", "id": question.id, "module_id": question.module_id,
+                   "question": question.question, "answers": list(question.answers),
+                   "correct_answer": question.correct_answer}
+
+
+def invalidate_import(report: dict):
+    """
+    Drops cached responses, sampled IDs, parsed questions and game rounds after an import, and bumps every version.
+
+    Args:
+        report (dict): The report returned by `import_records()`.
+    """
+    if report["modules"] or report["events"] or report["questions"]:
+        get_versions().bump_all()
+        get_response_cache().clear()
+        for sampler in current_app.extensions['samplers'].values():
+            sampler.invalidate()
+        current_app.extensions['round_pool'].invalidate()
+
+
+def open_records(stream, file_format: str, record_type=None, module_id=None):
+    """
+    Wraps a binary stream in the parser for its format.
+
+    Args:
+        stream: A binary file-like object.
+        file_format (str): 'ndjson' or 'csv'.
+        record_type (str): Passed to `read_csv()`.
+        module_id (str): Passed to `read_csv()`.
+
+    Returns:
+        iterator: (line number, record) pairs.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if file_format == "ndjson":
+        return read_ndjson(text)
+    if file_format == "csv":
+        return read_csv(text, record_type, module_id)
+    raise ValueError(f"Unsupported format: {file_format!r}")
+
+
+@api.route("/bulk/import", methods=["POST"])
+@cross_origin()
+def bulk_import():
+    """
+    Imports modules, events and questions from an NDJSON or CSV request body.
+
+    Note:
+        The format is taken from '?format=' or the Content-Type ('text/csv' for CSV, NDJSON otherwise).
+        CSV bodies contain one record type, given by a 'type' column or '?type=', and may take the module
+        from '?module_id='. Rows are inserted in batches of '?chunk_size=' (default `BULK_CHUNK_SIZE`).
+
+    Returns:
+        dict: JSON response with the numbers of imported 'modules', 'events' and 'questions' and a list of
+        per-line 'errors' for the records that were skipped.
+
+    Usage:
+        curl -X POST --data-binary @dump.ndjson -H 'Content-Type: application/x-ndjson' /bulk/import
+    """
+    file_format = request.args.get("format")
+    if file_format is None:
+        file_format = "csv" if request.mimetype == "text/csv" else "ndjson"
+    try:
+        records = open_records(request.stream, file_format, request.args.get("type"), request.args.get("module_id"))
+        chunk_size = request.args.get("chunk_size", current_app.config['BULK_CHUNK_SIZE'], type=int)
+    except ValueError as error:
+        return jsonify({"response": 400, "error": str(error)}), 400
+    report = import_records(get_db(), records, chunk_size)
+    invalidate_import(report)
+    return jsonify({**report, "response": 200})
+
+
+@api.route("/bulk/export", methods=["GET"])
+@cross_origin()
+def bulk_export():
+    """
+    Exports modules with their events and questions as NDJSON.
+
+    Note:
+        The output is streamed and can be fed back into `/bulk/import` unchanged.
+
+    Returns:
+        Response: One JSON record per line, see `export_records()`.
+
+    Usage:
+        GET /bulk/export for everything, GET /bulk/export?module_id=2 for a single module.
+    """
+    cur = get_cursor()
+    records = export_records(cur, request.args.get("module_id"))
+    lines = (json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    return current_app.response_class(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+@api.cli.command("bulk-import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(["ndjson", "csv"]), default=None,
+              help="Input format, guessed from the file extension by default.")
+@click.option("--type", "record_type", type=click.Choice(list(RECORD_FIELDS)), default=None,
+              help="Record type of a CSV file without a 'type' column.")
+@click.option("--module-id", default=None, help="Module of a CSV file without a 'module_id' column.")
+@click.option("--chunk-size", type=int, default=None, help="Records per transaction.")
+def bulk_import_command(path, file_format, record_type, module_id, chunk_size):
+    """Import modules, events and questions from an NDJSON or CSV file."""
+    if file_format is None:
+        file_format = "csv" if path.lower().endswith(".csv") else "ndjson"
+    with open(path, "rb") as stream:
+        records = open_records(stream, file_format, record_type, module_id)
+        report = import_records(get_db(), records, chunk_size or current_app.config['BULK_CHUNK_SIZE'])
+    invalidate_import(report)
+    click.echo(f"Imported {report['modules']} modules, {report['events']} events, {report['questions']} questions")
+    for error in report["errors"]:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+
+
+@api.cli.command("bulk-export")
+@click.option("--module-id", default=None, help="Export only this module.")
+@click.option("--output", type=click.File("w", encoding="utf-8"), default="-", help="Output file, stdout by default.")
+def bulk_export_command(module_id, output):
+    """Export modules with their events and questions as NDJSON."""
+    for record in export_records(get_cursor(), module_id):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,138 @@
+import collections
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache with a time-to-live, meant for pre-serialized JSON response bodies.
+
+    Note:
+        Keys are tuples such as ('event', '12') or ('timeline', '3'). Entries are dropped when they are the least
+        recently used entry of a full cache, when they are older than `ttl` seconds, or when `invalidate()` is called
+        for them. Values built while an invalidation happens are not stored, so a slow reader cannot put back a body
+        that was computed from data that has just been changed. An entry may also be stored with a version, such
+        as an entity tag; a lookup with another version replaces it, so each key holds one version and a write in
+        another process, which cannot call `invalidate()` here, still retires the old value.
+
+    Args:
+        maxsize (int): Maximum number of entries.
+        ttl (float): Seconds an entry stays valid. 0 disables expiry.
+
+    Usage:
+        Use `get_or_build()` from read handlers and `invalidate()` from write handlers.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, version=None):
+        """
+        Returns a cached value, or None if the key is missing, has expired or holds another version.
+
+        Args:
+            key (tuple): The cache key.
+            version: The version the value must have been stored with.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires, entry_version = entry
+            if expires and expires < time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            if entry_version != version:
+                del self._entries[key]
+                self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, generation=None, version=None):
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (tuple): The cache key.
+            value: The value to store, typically `bytes`.
+            generation (int): The `generation()` observed before the value was built. The value is discarded
+                if an invalidation happened since then.
+            version: The version of the value, see `get()`.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl if self.ttl else 0, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def generation(self) -> int:
+        """
+        Returns a counter that changes on every invalidation.
+        """
+        return self._generation
+
+    def get_or_build(self, key, build, version=None):
+        """
+        Returns the cached value for a key, building and storing it on a miss.
+
+        Args:
+            key (tuple): The cache key.
+            build (callable): Called without arguments to produce the value on a miss.
+            version: The version the value must have, see `get()`.
+
+        Returns:
+            The cached or freshly built value.
+        """
+        value = self.get(key, version)
+        if value is None:
+            generation = self._generation
+            value = build()
+            self.set(key, value, generation, version)
+        return value
+
+    def invalidate(self, *keys):
+        """
+        Removes entries from the cache.
+
+        Args:
+            *keys (tuple): The keys to remove. Missing keys are ignored.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        """
+        Returns a snapshot of the cache's counters.
+
+        Returns:
+            dict: 'size' and 'maxsize' gauges plus cumulative 'hits', 'misses', 'evictions', 'expirations'
+            and 'invalidations' counters.
+        """
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, **self._stats}
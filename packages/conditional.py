@@ -0,0 +1,92 @@
+import hashlib
+
+from flask import Blueprint, current_app, request, g
+
+from packages.snapshot import get_snapshot
+from packages.versions import EVENTS, MODULES, QUESTIONS, get_versions
+
+CONDITIONAL_METHODS = ("GET", "HEAD")
+
+api = Blueprint("conditional", __name__)
+
+
+def timeline_slot(versions, module_id=None):
+    if module_id is None or module_id == "1":
+        return EVENTS
+    return versions.module_slot(module_id)
+
+
+# Endpoint -> function of the version counters and the view arguments, returning the counter slot the response
+# depends on. Single events and questions are looked up by their own ID, so they depend on every module's rows.
+SLOTS = {
+    "api.modules": lambda versions: MODULES,
+    "api.get_module": lambda versions, module_id: versions.module_slot(module_id),
+    "api.events": lambda versions, module_id: versions.module_slot(module_id),
+    "api.get_event": lambda versions, event_id: EVENTS,
+    "api.event_timeline": timeline_slot,
+    "api.questions": lambda versions, module_id: versions.module_slot(module_id),
+    "api.get_question": lambda versions, question_id: QUESTIONS,
+}
+
+
+def current_etag(endpoint: str, view_args: dict) -> str:
+    """
+    Returns the entity tag of the current content of an endpoint in `SLOTS`, without quotes.
+
+    Note:
+        The tag is the epoch and current value of the endpoint's version counter, or in read-only mode a digest
+        of the snapshot file's identity. It is the same for every URL of the endpoint, including pages and
+        streams: the URL itself tells clients and caches which representation the tag belongs to.
+
+    Raises:
+        FileNotFoundError: In read-only mode, if no snapshot has been published yet.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return "s" + hashlib.blake2b(repr(snapshot.identity()).encode(), digest_size=8).hexdigest()
+    versions = get_versions()
+    slot = SLOTS[endpoint](versions, **view_args)
+    return f"{versions.epoch:x}.{versions.version(slot)}"
+
+
+@api.before_app_request
+def check_etag():
+    """
+    Answers a conditional read of a content endpoint with 304 when the client's copy is current.
+
+    Note:
+        The check reads one counter from shared memory, so a 304 never touches SQLite or serializes anything.
+        The tag is read before the handler runs and stored as `g.etag`. A write that lands while the response is
+        built therefore leaves the response with an older tag than its data, never a newer one, and the next
+        conditional request fetches it again. `backend.cached_body()` stores the tag as the version of the cached
+        body, so a write handled by any worker process retires every worker's cached copy at once.
+
+    Returns:
+        Response: An empty 304 response, or None to handle the request normally.
+    """
+    if request.method not in CONDITIONAL_METHODS or request.endpoint not in SLOTS:
+        return None
+    try:
+        g.etag = current_etag(request.endpoint, request.view_args)
+    except FileNotFoundError:
+        return None
+    if request.if_none_match.contains_weak(g.etag):
+        return current_app.response_class(status=304)
+    return None
+
+
+@api.after_app_request
+def add_cache_headers(response):
+    """
+    Adds the 'ETag' and 'Cache-Control' headers to successful responses of the content endpoints.
+
+    Note:
+        'Cache-Control' lets browsers and shared caches keep a response for `HTTP_CACHE_MAX_AGE` seconds, then
+        revalidate it with 'If-None-Match' before using it again.
+    """
+    etag = g.get("etag")
+    if etag is None or response.status_code not in (200, 304):
+        return response
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={current_app.config['HTTP_CACHE_MAX_AGE']}, must-revalidate"
+    return response
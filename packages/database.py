@@ -0,0 +1,155 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 268435456,
+    "cache_size": -16000,
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of reusable SQLite connections.
+
+    Note:
+        Connections are created lazily up to `size` and handed out to one thread at a time, so they are opened
+        with `check_same_thread=False`. Every new connection has the configured pragmas applied once, and SQLite's
+        per-connection statement cache (`cached_statements`) keeps prepared statements alive across requests.
+        The pool remembers the process that created it and drops inherited connections after a fork.
+
+    Args:
+        path (str): Path to the SQLite database file.
+        size (int): Maximum number of open connections.
+        timeout (float): Seconds to wait for a free connection before raising.
+        busy_timeout (float): Seconds SQLite waits on a locked database before raising "database is locked".
+        pragmas (dict): Pragmas applied to every new connection. Defaults to `DEFAULT_PRAGMAS`.
+        cached_statements (int): Size of SQLite's prepared-statement cache per connection.
+        factory (type): The `sqlite3.Connection` subclass used to open connections.
+
+    Usage:
+        Use `acquire()` to borrow a connection and `release()` to return it once the request is finished.
+    """
+
+    def __init__(self, path, size=8, timeout=30.0, busy_timeout=5.0, pragmas=None, cached_statements=256,
+                 factory=sqlite3.Connection):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.cached_statements = cached_statements
+        self.factory = factory
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._stats = {"acquired": 0, "released": 0, "timeouts": 0, "discarded": 0, "wait_seconds": 0.0}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False,
+                                     cached_statements=self.cached_statements, factory=self.factory)
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Borrows a connection from the pool, opening a new one if the pool is not yet full.
+
+        Returns:
+            sqlite3.Connection: A connection reserved for the caller until `release()` is called.
+
+        Raises:
+            sqlite3.OperationalError: If no connection becomes available within `timeout` seconds.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        started = time.perf_counter()
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    connection = self._connect()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise sqlite3.OperationalError(
+                        f"Timed out after {self.timeout}s waiting for a database connection")
+        with self._lock:
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds"] += time.perf_counter() - started
+        return connection
+
+    def release(self, connection: sqlite3.Connection):
+        """
+        Returns a connection to the pool, rolling back any transaction the caller left open.
+
+        Args:
+            connection (sqlite3.Connection): A connection obtained from `acquire()`.
+        """
+        if self._pid != os.getpid():
+            return
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            connection.close()
+            with self._lock:
+                self._created -= 1
+                self._stats["discarded"] += 1
+            return
+        with self._lock:
+            self._stats["released"] += 1
+        self._idle.put(connection)
+
+    def close(self):
+        """
+        Closes every idle connection. The pool opens new connections on demand afterwards.
+
+        Usage:
+            Call on shutdown, or in a pre-fork server's master process before workers are started.
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._created -= 1
+
+    def metrics(self) -> dict:
+        """
+        Returns a snapshot of the pool's counters.
+
+        Returns:
+            dict: 'size', 'open', 'idle' and 'in_use' gauges plus cumulative 'acquired', 'released', 'timeouts',
+            'discarded' and 'wait_seconds' counters.
+        """
+        with self._lock:
+            idle = self._idle.qsize()
+            return {"size": self.size, "open": self._created, "idle": idle, "in_use": self._created - idle,
+                    **self._stats}
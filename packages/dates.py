@@ -0,0 +1,144 @@
+import re
+
+DATE_PATTERN = re.compile(
+    r'^\s*(-?)(\d{1,6})(?:-(\d{1,2}))?(?:-(\d{1,2}))?\s*(BCE|BC|CE|AD)?\s*$', re.IGNORECASE)
+LOOSE_PART = re.compile(r'\d+|[a-z]+', re.IGNORECASE)
+# Date key of events whose stored date has no recognisable year. It sorts before every real date key, so such events
+# open the timeline, and it is left out of date ranges and era buckets.
+UNDATED_KEY = -10 ** 10
+MONTH_NAMES = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+
+
+def parse_date(date: str) -> tuple:
+    """
+    Splits an event date string into its year, month and day components.
+
+    Args:
+        date (str): A date in the form 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD'. Years may have fewer than four digits,
+            may be negative (astronomical year numbering, '-0043' is 44 BC) or carry a 'BC'/'BCE' suffix.
+
+    Returns:
+        tuple: A (year, month, day) tuple of ints using astronomical year numbering. Missing parts default to 1.
+
+    Raises:
+        ValueError: If the string is not a date in one of the supported forms.
+
+    Usage:
+        Use this function wherever the parts of an event date are needed without going through `dateutil`.
+    """
+    match = DATE_PATTERN.match(date or "")
+    if match is None:
+        raise ValueError(f"Invalid event date: {date!r}")
+    sign, year, month, day, era = match.groups()
+    year = int(year)
+    if sign:
+        year = -year
+    if era is not None and era.upper() in ("BC", "BCE"):
+        if year <= 0:
+            raise ValueError(f"Invalid event date: {date!r}")
+        year = 1 - year
+    month = int(month) if month else 1
+    day = int(day) if day else 1
+    if not 1 <= month <= 12 or not 1 <= day <= 31:
+        raise ValueError(f"Invalid event date: {date!r}")
+    return year, month, day
+
+
+def date_key(date: str) -> int:
+    """
+    Converts an event date string into a signed integer that sorts in chronological order.
+
+    Note:
+        The key packs the date as year * 10000 + month * 100 + day, so '960' becomes 9600101 and
+        '1025-12-25' becomes 10251225. Years before year 0 produce negative keys that still sort correctly,
+        and the year can be recovered in SQL with a floor division by 10000.
+
+    Args:
+        date (str): A date string accepted by `parse_date()`.
+
+    Returns:
+        int: The sortable date key.
+
+    Raises:
+        ValueError: If the string is not a valid event date.
+
+    Usage:
+        Compute the key once when an event is inserted or updated and store it in the 'event_date_key' column.
+    """
+    year, month, day = parse_date(date)
+    return year * 10000 + month * 100 + day
+
+
+def date_bounds(date: str) -> tuple:
+    """
+    Returns the first and last date keys of the period an event date string names.
+
+    Note:
+        A year covers its whole year and a month its whole month, so '1700' gives (17000101, 17001231) and
+        '1700-05' gives (17000501, 17000531). A full date gives the same key twice. Day 31 is used for every month;
+        no event can fall between the real last day and it.
+
+    Args:
+        date (str): A date string accepted by `parse_date()`.
+
+    Returns:
+        tuple: The (first, last) date keys, both inclusive.
+
+    Raises:
+        ValueError: If the string is not a valid event date.
+
+    Usage:
+        Turn the 'from' and 'to' query parameters of a range query into an inclusive 'event_date_key' range.
+    """
+    year, month, day = parse_date(date)
+    _, _, given_month, given_day, _ = DATE_PATTERN.match(date).groups()
+    first = year * 10000 + month * 100 + day
+    if given_day:
+        return first, first
+    if given_month:
+        return first, year * 10000 + month * 100 + 31
+    return first, year * 10000 + 1231
+
+
+def legacy_date_key(date: str):
+    """
+    Returns the date key of an event date string, reading dates `parse_date()` rejects as best it can.
+
+    Note:
+        Events stored before dates were validated may hold strings such as '1410-July-15' or '15 July 1410'.
+        The first number above 31 is taken as the year, a month name or the first other number from 1 to 12 as
+        the month and the next number from 1 to 31 as the day, so both examples give 14100715. A leading '-' or a
+        'BC'/'BCE' suffix makes the year negative, as in `parse_date()`. Missing parts default to 1.
+
+    Args:
+        date (str): The stored event date.
+
+    Returns:
+        int: The sortable date key, see `date_key()`, or None if the string contains no year.
+
+    Usage:
+        Backfill keys of existing rows, storing `UNDATED_KEY` when None is returned; new and updated events are
+        validated with `date_key()` instead.
+    """
+    try:
+        return date_key(date)
+    except ValueError:
+        pass
+    parts = LOOSE_PART.findall(date or "")
+    numbers = [int(part) for part in parts if part.isdigit()]
+    names = [part[:3].lower() for part in parts if not part.isdigit()]
+    year = next((number for number in numbers if number > 31), None)
+    if year is None or year > 999999:
+        return None
+    numbers.remove(year)
+    if date.lstrip().startswith("-"):
+        year = -year
+    elif {"bc", "bce"} & set(names):
+        year = 1 - year
+    month = next((MONTH_NAMES.index(name) + 1 for name in names if name in MONTH_NAMES), None)
+    if month is None:
+        month = next((number for number in numbers if 1 <= number <= 12), 1)
+        if month in numbers:
+            numbers.remove(month)
+    day = next((number for number in numbers if 1 <= number <= 31), 1)
+    return year * 10000 + month * 100 + day
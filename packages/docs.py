@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import os
+
+from flask import Blueprint, request, Response
+from flask_cors import cross_origin
+
+README_FILE = 'README.md'
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_index_page = {}
+
+api = Blueprint("docs", __name__)
+
+
+def get_index_page() -> dict:
+    """
+    Returns the rendered index page, re-rendering README.md only when its modification time changes.
+
+    Returns:
+        dict: Cached page with 'mtime', 'html', 'gzip' (gzip-compressed html) and 'etag' keys.
+
+    Raises:
+        FileNotFoundError: If the README.md file is not found.
+        IOError: If there is an issue reading the README.md file.
+
+    Note:
+        Markdown and Pygments are imported here rather than at module level. Together with the lexers that
+        'codehilite' loads, they take a few hundred milliseconds to import, which every worker would otherwise
+        pay at startup for a page that is rarely requested.
+
+    Usage:
+        Called by `index()`; the first request renders the page.
+    """
+    global _index_page
+    readme_path = os.path.join(ROOT_DIR, README_FILE)
+    mtime = os.stat(readme_path).st_mtime_ns
+    if _index_page.get('mtime') == mtime:
+        return _index_page
+    import markdown
+    from pygments.formatters import HtmlFormatter
+
+    with open(readme_path, "r", encoding="utf-8") as readme_file:
+        md_template_string = markdown.markdown(
+            readme_file.read(), extensions=["fenced_code", 'codehilite']
+        )
+    formatter = HtmlFormatter(style="emacs", full=True, cssclass="codehilite")
+    css_string = formatter.get_style_defs()
+    md_css_string = "<style>" + css_string + "</style>"
+    html = (md_css_string + md_template_string).encode("utf-8")
+    _index_page = {"mtime": mtime, "html": html, "gzip": gzip.compress(html),
+                   "etag": hashlib.sha1(html).hexdigest()}
+    return _index_page
+
+
+@api.route('/')
+@cross_origin()
+def index():
+    """
+    Renders the index page with the content of the README.md file formatted as HTML.
+
+    Note:
+        The page is rendered on the first request by `get_index_page()` and cached until README.md changes.
+        It formats the content as Markdown using the `markdown` library with extensions 'fenced_code' and 'codehilite'.
+        Additionally, it applies syntax highlighting to code blocks using the 'emacs' style from the `HtmlFormatter` class in the `codehilite` extension.
+        The response carries an ETag (answered with 304 on a matching If-None-Match) and is gzip-compressed when the client accepts it.
+
+    Returns:
+        Response: HTML content of the README.md file with syntax-highlighted code blocks.
+
+    Raises:
+        FileNotFoundError: If the README.md file is not found.
+        IOError: If there is an issue reading the README.md file.
+
+    Usage:
+        Navigate to the index page to view the formatted README.md content.
+    """
+    page = get_index_page()
+    use_gzip = "gzip" in request.accept_encodings
+    etag = page["etag"] + "-gzip" if use_gzip else page["etag"]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(page["gzip"] if use_gzip else page["html"], mimetype="text/html")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    return response
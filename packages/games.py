@@ -0,0 +1,391 @@
+import collections
+import itertools
+import math
+import sqlite3
+
+from packages import questions, sampling
+from packages.thumbnails import thumbnail_path
+
+# Above this many possible draws, distinct draws are found by rejection sampling instead of enumeration.
+ENUMERATION_LIMIT = 10000
+
+# `format_scored` formats a round for scoring, with its round token and without the answer; None if not scored.
+Game = collections.namedtuple("Game", ["source", "format_round", "size", "format_scored"])
+Check = collections.namedtuple("Check", ["source", "ids", "is_correct"])
+
+
+def padded_year(date: str) -> str:
+    """
+    Returns the year of a 'YYYY-MM-DD' date, zero-padded to four digits.
+    """
+    year = date.split('-')[0]
+    return "0" * (4 - len(year)) + year
+
+
+def image_name_round(events: list) -> list:
+    """
+    Formats the events of an image-name round.
+
+    Returns:
+        list: Dictionaries with 'event_id', 'title', 'image_url' and 'thumbnail_url' keys.
+    """
+    return [{"event_id": event[0], "title": event[3], "image_url": event[4],
+             "thumbnail_url": thumbnail_path("event", event[0])} for event in events]
+
+
+def image_date_round(events: list) -> list:
+    """
+    Formats the events of an image-date round.
+
+    Returns:
+        list: Dictionaries with 'date', 'image_url', 'thumbnail_url', 'id' and 'year' keys. 'year' is zero-padded to
+        four digits.
+    """
+    return [{"date": event[2], "image_url": event[4], "thumbnail_url": thumbnail_path("event", event[0]),
+             "id": event[0], "year": padded_year(event[2])} for event in events]
+
+
+def image_date_scored_round(events: list, token: str) -> dict:
+    """
+    Formats the events of a scored image-date round: the images in the order they were drawn and, separately,
+    their years in ascending order, so the payload does not pair an image with its year.
+
+    Returns:
+        dict: 'round_token', 'events', dictionaries with 'id', 'image_url' and 'thumbnail_url' keys, and 'years'.
+    """
+    return {"round_token": token,
+            "events": [{"id": event[0], "image_url": event[4], "thumbnail_url": thumbnail_path("event", event[0])}
+                       for event in events],
+            "years": sorted(padded_year(event[2]) for event in events)}
+
+
+def chronological_round(events: list) -> list:
+    """
+    Sorts the events of a chronological or higher-lower round by date and formats them.
+
+    Returns:
+        list: Dictionaries with 'event_id', 'date', 'title', 'image_url' and 'thumbnail_url' keys, earliest event
+        first.
+    """
+    events = sorted(events, key=lambda event: event[6])
+    return [{"event_id": event[0], "date": event[2], "title": event[3], "image_url": event[4],
+             "thumbnail_url": thumbnail_path("event", event[0])} for event in events]
+
+
+def events_scored_round(events: list, token: str) -> dict:
+    """
+    Formats the events of a scored higher-lower or chronological round without their dates, in the order they
+    were drawn rather than by date.
+
+    Returns:
+        dict: 'round_token' and 'events', dictionaries with 'event_id', 'title', 'image_url' and 'thumbnail_url'
+        keys.
+    """
+    return {"round_token": token,
+            "events": [{"event_id": event[0], "title": event[3], "image_url": event[4],
+                        "thumbnail_url": thumbnail_path("event", event[0])} for event in events]}
+
+
+def trivia_round(drawn: list) -> dict:
+    """
+    Formats the question of a trivia round.
+
+    Returns:
+        dict: 'question_id', 'question', 'answers' and 'correct_answer' keys, or an empty dictionary if there is no
+        question.
+    """
+    if len(drawn) < 1:
+        return {}
+    question = drawn[0]
+    return {"question_id": question.id, "question": question.question, "answers": list(question.answers),
+            "correct_answer": question.correct_answer}
+
+
+def trivia_scored_round(drawn: list, token: str) -> dict:
+    """
+    Formats the question of a scored trivia round without its correct answer.
+
+    Returns:
+        dict: 'round_token', 'question_id', 'question' and 'answers' keys, or an empty dictionary if there is no
+        question.
+    """
+    if len(drawn) < 1:
+        return {}
+    question = drawn[0]
+    return {"round_token": token, "question_id": question.id, "question": question.question,
+            "answers": list(question.answers)}
+
+
+def new_samplers(versions=None) -> dict:
+    """
+    Creates the samplers that game rounds are drawn with, by source name.
+
+    Note:
+        Each application gets its own, see `create_app()`. A read-only snapshot provides the same keys, see
+        `snapshot.Snapshot.samplers`.
+
+    Args:
+        versions (versions.VersionCounters): The app's version counters, which the samplers check their cached
+            rows against so that writes in other workers reach them.
+
+    Returns:
+        dict: An 'events' `sampling.IdSampler` and a 'questions' `questions.QuestionCache`.
+    """
+    return {"events": sampling.IdSampler("event", "event_id", versions), "questions": questions.QuestionCache(versions)}
+
+# Game name in the URL -> Game. A size of None means the number of events is taken from the URL.
+GAMES = {
+    "image-name": Game("events", image_name_round, None, None),
+    "image-date": Game("events", image_date_round, None, image_date_scored_round),
+    "higher-lower": Game("events", chronological_round, 2, events_scored_round),
+    "chronological": Game("events", chronological_round, None, events_scored_round),
+    "trivia": Game("questions", trivia_round, 1, trivia_scored_round),
+}
+
+
+def trivia_ids(answer: dict, drawn: list) -> list:
+    """
+    Returns the question ID of a trivia answer, {'round_token': ..., 'answer': 'Paris'}.
+    """
+    if not isinstance(answer.get("answer"), str):
+        raise ValueError("'answer' must be a string")
+    return drawn
+
+
+def higher_lower_ids(answer: dict, drawn: list) -> list:
+    """
+    Returns the event IDs of a higher-lower answer, {'round_token': ..., 'answer': 'higher'}, in the order shown.
+    """
+    if answer.get("answer") not in ("higher", "lower"):
+        raise ValueError("'answer' must be 'higher' or 'lower'")
+    if len(drawn) != 2:
+        raise ValueError("The round does not have two events")
+    return drawn
+
+
+def chronological_ids(answer: dict, drawn: list) -> list:
+    """
+    Returns the event IDs of a chronological answer, {'round_token': ..., 'event_ids': [7, 3, 9]}, in the player's
+    order.
+    """
+    event_ids = answer.get("event_ids")
+    if len(drawn) < 2:
+        raise ValueError("The round does not have two events")
+    if (not isinstance(event_ids, list) or len(event_ids) != len(drawn)
+            or not all(isinstance(event_id, int) and not isinstance(event_id, bool) for event_id in event_ids)
+            or set(event_ids) != set(drawn)):
+        raise ValueError("'event_ids' must list each event of the round once")
+    return event_ids
+
+
+def image_date_ids(answer: dict, drawn: list) -> list:
+    """
+    Returns the event IDs of an image-date answer, {'round_token': ..., 'years': ['1410', '1683']}, which gives
+    the player's year for each image in the order shown.
+    """
+    years = answer.get("years")
+    if not drawn:
+        raise ValueError("The round has no events")
+    if (not isinstance(years, list) or len(years) != len(drawn)
+            or not all(isinstance(year, str) for year in years)):
+        raise ValueError("'years' must give a year for each event of the round")
+    return drawn
+
+
+def trivia_correct(rows: list, answer: dict) -> bool:
+    """
+    Checks that the answer is the question's correct answer, ignoring surrounding whitespace.
+    """
+    return rows[0].correct_answer is not None and answer["answer"].strip() == rows[0].correct_answer
+
+
+def higher_lower_correct(rows: list, answer: dict) -> bool:
+    """
+    Checks whether the second event is 'higher' (later) or 'lower' (earlier) than the first. Events on the same date
+    count as both.
+    """
+    first, second = rows[0][6], rows[1][6]
+    return second >= first if answer["answer"] == "higher" else second <= first
+
+
+def chronological_correct(rows: list, answer: dict) -> bool:
+    """
+    Checks that the events are in date order, earliest first. Events on the same date may be in either order.
+    """
+    return all(earlier[6] <= later[6] for earlier, later in zip(rows, rows[1:]))
+
+
+def image_date_correct(rows: list, answer: dict) -> bool:
+    """
+    Checks that every image was given its own year. Images from the same year may be given in either order.
+    """
+    return all(padded_year(row[2]) == year.strip() for row, year in zip(rows, answer["years"]))
+
+
+# Game name in the URL -> Check, for the games whose answers are checked by the server.
+CHECKS = {
+    "image-date": Check("events", image_date_ids, image_date_correct),
+    "higher-lower": Check("events", higher_lower_ids, higher_lower_correct),
+    "chronological": Check("events", chronological_ids, chronological_correct),
+    "trivia": Check("questions", trivia_ids, trivia_correct),
+}
+
+
+def check_answers(cur: sqlite3.Cursor, samplers: dict, game: str, module_id, answers: list, drawn: list) -> list:
+    """
+    Checks the answers to rounds of a game against the database.
+
+    Note:
+        The rows of each round are the ones its round token names, see `rounds.RoundTokens`, so the server looks
+        the dates and correct answers up itself and never trusts the client with them. The rows of every answer
+        are read with a single `WHERE id IN (...)` query.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to query with.
+        samplers (dict): The samplers by source name, see `new_samplers()`.
+        game (str): A key of `CHECKS`.
+        module_id (str): The ID of the module the rounds were drawn from.
+        answers (list): Answer dictionaries, see `trivia_ids()`, `higher_lower_ids()`, `chronological_ids()` and
+            `image_date_ids()`.
+        drawn (list): The row IDs of each answer's round, in the order they were shown, from its token.
+
+    Returns:
+        list: True or False per answer, in order.
+
+    Raises:
+        ValueError: If an answer is malformed or names a row that no longer exists.
+    """
+    spec = CHECKS[game]
+    rounds = []
+    for number, (answer, ids) in enumerate(zip(answers, drawn), start=1):
+        if not isinstance(answer, dict):
+            raise ValueError(f"Answer {number} must be an object")
+        try:
+            rounds.append(spec.ids(answer, ids))
+        except ValueError as error:
+            raise ValueError(f"Answer {number}: {error}") from None
+    wanted = list({row_id for ids in rounds for row_id in ids})
+    rows = {row[0]: row for row in samplers[spec.source].fetch(cur, wanted)}
+    results = []
+    for number, (ids, answer) in enumerate(zip(rounds, answers), start=1):
+        if not all(row_id in rows and str(rows[row_id][1]) == str(module_id) for row_id in ids):
+            raise ValueError(f"Answer {number} names a row that is not in module {module_id}")
+        results.append(spec.is_correct([rows[row_id] for row_id in ids], answer))
+    return results
+
+
+def thumbnails(game_round) -> list:
+    """
+    Returns the 'thumbnail_url's of a formatted round, in order. Trivia rounds have none.
+    """
+    if isinstance(game_round, dict):
+        game_round = game_round.get("events", [])
+    return [event["thumbnail_url"] for event in game_round]
+
+
+def format_round(game: str, module_id, rows: list, tokens=None):
+    """
+    Formats the drawn rows of a round, for scoring when round tokens are issued and the game is scored.
+
+    Args:
+        game (str): A key of `GAMES`.
+        module_id (str): The ID of the module the rows were drawn from.
+        rows (list): The drawn rows, in the order they are shown.
+        tokens (rounds.RoundTokens): Issues the round's token, or None when scoring is disabled. A round without
+            rows gets no token.
+
+    Returns:
+        The round as returned by the game's `format_scored` function, or else by its `format_round` function.
+    """
+    spec = GAMES[game]
+    if tokens is None or spec.format_scored is None:
+        return spec.format_round(rows)
+    token = tokens.issue(game, module_id, [row[0] for row in rows]) if rows else None
+    return spec.format_scored(rows, token)
+
+
+def draw(cur: sqlite3.Cursor, samplers: dict, game: str, module_id, number=None, tokens=None):
+    """
+    Draws one round of a game.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to query with.
+        samplers (dict): The samplers by source name, see `new_samplers()`.
+        game (str): A key of `GAMES`.
+        module_id (str): The ID of the module to draw from.
+        number (int): The number of events, for the games whose size is taken from the URL.
+        tokens (rounds.RoundTokens): Issues round tokens when scoring is enabled, see `format_round()`.
+
+    Returns:
+        The formatted round, see `format_round()`.
+    """
+    spec = GAMES[game]
+    return format_round(game, module_id, samplers[spec.source].sample_rows(cur, module_id, spec.size or number),
+                        tokens)
+
+
+def distinct_draws(ids: list, k: int, rounds: int) -> list:
+    """
+    Draws up to `rounds` different sets of k IDs.
+
+    Note:
+        No two draws contain the same set of IDs, so a session never repeats a pair or a question. When fewer
+        distinct sets exist than rounds were asked for, every set is returned once.
+
+    Args:
+        ids (list): The IDs to draw from.
+        k (int): IDs per draw. Capped at the number of IDs.
+        rounds (int): The number of draws.
+
+    Returns:
+        list: Lists of IDs, each in random order.
+    """
+    k = min(k, len(ids))
+    if k == 0:
+        return []
+    possible = math.comb(len(ids), k)
+    rounds = min(rounds, possible)
+    if possible <= ENUMERATION_LIMIT:
+        draws = [list(combination) for combination in
+                 sampling.rng.sample(list(itertools.combinations(ids, k)), rounds)]
+        for ids_of_round in draws:
+            sampling.rng.shuffle(ids_of_round)
+        return draws
+    seen = set()
+    draws = []
+    while len(draws) < rounds:
+        ids_of_round = sampling.rng.sample(ids, k)
+        key = frozenset(ids_of_round)
+        if key not in seen:
+            seen.add(key)
+            draws.append(ids_of_round)
+    return draws
+
+
+def session(cur: sqlite3.Cursor, samplers: dict, game: str, module_id, rounds: int, number=None,
+            tokens=None) -> list:
+    """
+    Draws several rounds of a game with a single query.
+
+    Note:
+        The IDs of every round are drawn first with `distinct_draws()`, then all rows they need are read with one
+        `WHERE id IN (...)` query and shared between the rounds.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to query with.
+        samplers (dict): The samplers by source name, see `new_samplers()`.
+        game (str): A key of `GAMES`.
+        module_id (str): The ID of the module to draw from.
+        rounds (int): The number of rounds.
+        number (int): The number of events per round, for the games whose size is taken from the URL.
+        tokens (rounds.RoundTokens): Issues round tokens when scoring is enabled, see `format_round()`.
+
+    Returns:
+        list: Up to `rounds` rounds, fewer if the module does not have enough rows for distinct rounds.
+    """
+    spec = GAMES[game]
+    sampler = samplers[spec.source]
+    draws = distinct_draws(sampler.ids(cur, module_id), spec.size or number, rounds)
+    rows = {row[0]: row for row in sampler.fetch(cur, list({row_id for ids in draws for row_id in ids}))}
+    return [format_round(game, module_id, [rows[row_id] for row_id in ids if row_id in rows], tokens)
+            for ids in draws]
@@ -0,0 +1,309 @@
+import bisect
+import io
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from flask import Blueprint, current_app, request, g, has_app_context
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+WHITESPACE = re.compile(r"\s+")
+
+logger = logging.getLogger(__name__)
+
+api = Blueprint("metrics", __name__)
+
+
+class Histogram:
+    """
+    A cumulative histogram in the Prometheus sense: per-bucket counts, a sum and a count.
+
+    Args:
+        buckets (tuple): Sorted upper bounds of the buckets, in seconds. '+Inf' is implied.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Collects per-route request latencies and per-statement SQL timings.
+
+    Note:
+        Requests are keyed by (route rule, method, status code); statements by their SQL text with whitespace
+        collapsed. Because the handlers use placeholders, the number of distinct statements stays small.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['metrics']`, see `get_registry()`. `render()` produces the
+        Prometheus text format served by '/metrics'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.queries = {}
+        self.query_rows = {}
+        self.fetch_seconds = {}
+        self.slow_queries = 0
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float):
+        with self._lock:
+            key = (route, method, str(status))
+            histogram = self.requests.get(key)
+            if histogram is None:
+                histogram = self.requests[key] = Histogram(REQUEST_BUCKETS)
+            histogram.observe(seconds)
+
+    def observe_query(self, statement: str, seconds: float, rows: int):
+        with self._lock:
+            histogram = self.queries.get(statement)
+            if histogram is None:
+                histogram = self.queries[statement] = Histogram(QUERY_BUCKETS)
+            histogram.observe(seconds)
+            self.query_rows[statement] = self.query_rows.get(statement, 0) + rows
+
+    def observe_fetch(self, statement: str, seconds: float, rows: int):
+        with self._lock:
+            self.fetch_seconds[statement] = self.fetch_seconds.get(statement, 0.0) + seconds
+            self.query_rows[statement] = self.query_rows.get(statement, 0) + rows
+
+    def render(self, gauges: dict) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format.
+
+        Args:
+            gauges (dict): Extra values by metric name, for example the connection pool and cache counters.
+
+        Returns:
+            str: The '/metrics' response body.
+        """
+        lines = []
+        with self._lock:
+            lines += render_histograms("http_request_duration_seconds", "Request latency by route.",
+                                       ("route", "method", "status"), self.requests)
+            lines += render_histograms("sqlite_query_duration_seconds", "Time spent executing a statement.",
+                                       ("statement",), {(key,): value for key, value in self.queries.items()})
+            lines += render_counters("sqlite_query_fetch_seconds_total", "Time spent fetching rows of a statement.",
+                                     "statement", self.fetch_seconds)
+            lines += render_counters("sqlite_query_rows_total", "Rows returned or changed by a statement.",
+                                     "statement", self.query_rows)
+            lines += ["# HELP sqlite_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+                      "# TYPE sqlite_slow_queries_total counter",
+                      f"sqlite_slow_queries_total {self.slow_queries}"]
+        for name, value in gauges.items():
+            lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+def render_histograms(name: str, help_text: str, label_names: tuple, histograms: dict) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for label_values, histogram in sorted(histograms.items()):
+        labels = render_labels(label_names, label_values)
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def render_counters(name: str, help_text: str, label_name: str, counters: dict) -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for label_value, value in sorted(counters.items()):
+        lines.append(f'{name}{{{label_name}="{escape(label_value)}"}} {value}')
+    return lines
+
+
+def get_registry():
+    """
+    Returns the application's metrics registry, or None outside an application context.
+    """
+    return current_app.extensions['metrics'] if has_app_context() else None
+
+
+def record_query(statement: str, seconds: float, rows: int):
+    """
+    Records one executed statement in the registry, the current request's SQL time and the slow-query log.
+
+    Note:
+        Statements run outside an application context have no registry; they are only checked against the
+        slow-query threshold.
+    """
+    registry = get_registry()
+    if registry is not None:
+        registry.observe_query(statement, seconds, rows)
+        g.sql_seconds = g.get("sql_seconds", 0.0) + seconds
+        g.sql_queries = g.get("sql_queries", 0) + 1
+        threshold = current_app.config['SLOW_QUERY_MS']
+    else:
+        threshold = 100.0
+    if seconds * 1000 >= threshold:
+        if registry is not None:
+            with registry._lock:
+                registry.slow_queries += 1
+        logger.warning("Slow query (%.1f ms): %s", seconds * 1000, statement)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    A cursor that times every statement and counts the rows it returns or changes.
+
+    Note:
+        `execute()` time covers preparing the statement and stepping to its first row; the time spent in
+        `fetch*()` and iteration is recorded separately as fetch time of the same statement.
+    """
+
+    statement = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.statement = WHITESPACE.sub(" ", sql).strip()
+            record_query(self.statement, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.statement = WHITESPACE.sub(" ", sql).strip()
+            record_query(self.statement, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def _fetched(self, started: float, rows: int):
+        if self.statement is not None:
+            seconds = time.perf_counter() - started
+            registry = get_registry()
+            if registry is not None:
+                registry.observe_fetch(self.statement, seconds, rows)
+                g.sql_seconds = g.get("sql_seconds", 0.0) + seconds
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._fetched(started, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A connection whose cursors are `InstrumentedCursor`s, including the ones created by `execute()`.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+@api.before_app_request
+def start_request_timer():
+    """
+    Starts the request timer and, when profiling is enabled and requested with '?profile=1', the profiler.
+    """
+    g.request_started = time.perf_counter()
+    if current_app.config['PROFILING_ENABLED'] and request.args.get("profile") == "1":
+        import cProfile
+
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@api.after_app_request
+def record_request(response):
+    """
+    Records the request latency by route and adds a 'Server-Timing' header that splits SQLite time from the rest.
+
+    Note:
+        A profiled request returns the profiler's statistics, sorted by cumulative time, instead of its response.
+    """
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        import pstats
+
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(current_app.config['PROFILING_LIMIT'])
+        response = current_app.response_class(output.getvalue(), mimetype="text/plain")
+    started = g.get("request_started")
+    if started is None:
+        return response
+    seconds = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    get_registry().observe_request(route, request.method, response.status_code, seconds)
+    sql_seconds = g.get("sql_seconds", 0.0)
+    response.headers["Server-Timing"] = (f"sql;desc=\"{g.get('sql_queries', 0)} queries\";dur={sql_seconds * 1000:.2f}, "
+                                         f"app;dur={(seconds - sql_seconds) * 1000:.2f}")
+    return response
+
+
+@api.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """
+    Returns request, SQL, connection pool, response cache, game round pool, score buffer and leaderboard metrics in
+    the Prometheus text format.
+
+    Returns:
+        Response: 'text/plain; version=0.0.4' metrics.
+
+    Usage:
+        Point a Prometheus scrape job at this endpoint.
+    """
+    from packages.backend import get_pool, get_response_cache
+
+    gauges = {f"db_pool_{name}": value for name, value in get_pool().metrics().items()}
+    gauges.update({f"response_cache_{name}": value for name, value in get_response_cache().metrics().items()})
+    gauges.update({f"game_rounds_{name}": value
+                   for name, value in current_app.extensions['round_pool'].metrics().items()})
+    gauges.update({f"scores_{name}": value for name, value in current_app.extensions['scores'].metrics().items()})
+    gauges.update({f"leaderboards_{name}": value
+                   for name, value in current_app.extensions['leaderboards'].metrics().items()})
+    return current_app.response_class(get_registry().render(gauges), mimetype="text/plain; version=0.0.4")
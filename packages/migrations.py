@@ -0,0 +1,275 @@
+import logging
+import os
+import sqlite3
+
+from packages.dates import UNDATED_KEY, legacy_date_key
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "databases", "search.sql")
+
+
+def add_event_date_key(db: sqlite3.Connection):
+    """
+    Adds the indexed 'event_date_key' column to the 'event' table and backfills it for rows that lack a key.
+
+    Note:
+        Existing rows may hold dates that new events would be refused with, so keys are read with
+        `legacy_date_key()`. A date without a recognisable year is logged with its event ID and gets
+        `UNDATED_KEY`, so the event opens the timeline until its date is fixed.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Usage:
+        Migration 1. Also safe on databases that already have the column, only rows with a NULL key are recomputed.
+    """
+    cur = db.cursor()
+    columns = [column[1] for column in cur.execute("PRAGMA table_info(event)")]
+    if "event_date_key" not in columns:
+        cur.execute("ALTER TABLE event ADD COLUMN event_date_key INTEGER")
+    cur.execute("SELECT event_id, event_date FROM event WHERE event_date_key IS NULL")
+    keys = []
+    for event_id, event_date in cur.fetchall():
+        key = legacy_date_key(event_date)
+        if key is None:
+            logger.warning("Event %s has an unreadable date %r, sorting it before every dated event",
+                           event_id, event_date)
+            key = UNDATED_KEY
+        keys.append((key, event_id))
+    cur.executemany("UPDATE event SET event_date_key = ? WHERE event_id = ?", keys)
+    cur.execute("CREATE INDEX IF NOT EXISTS event_module_date_key_idx ON event (fk_module_id, event_date_key)")
+    cur.execute("CREATE INDEX IF NOT EXISTS event_date_key_idx ON event (event_date_key)")
+
+
+def add_lookup_indexes(db: sqlite3.Connection):
+    """
+    Indexes the columns used to look rows up by module and by title.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Usage:
+        Migration 2. 'event.fk_module_id' is already covered by the leading column of 'event_module_date_key_idx'.
+    """
+    cur = db.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS questions_module_idx ON questions (fk_module_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS modules_title_idx ON modules (module_title)")
+    cur.execute("CREATE INDEX IF NOT EXISTS event_title_idx ON event (event_title)")
+    cur.execute("CREATE INDEX IF NOT EXISTS questions_question_idx ON questions (question)")
+
+
+def add_event_module_index(db: sqlite3.Connection):
+    """
+    Indexes 'event.fk_module_id' on its own so a module's events can be walked in 'event_id' order.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Usage:
+        Migration 3. Used by the keyset pagination of '/events/<module_id>'.
+    """
+    db.execute("CREATE INDEX IF NOT EXISTS event_module_idx ON event (fk_module_id)")
+
+
+def add_idempotency_keys(db: sqlite3.Connection):
+    """
+    Creates the 'idempotency_keys' table that remembers which row a keyed create request produced.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Usage:
+        Migration 4. Used by `backend.create_row()`.
+    """
+    db.execute("""CREATE TABLE IF NOT EXISTS "idempotency_keys" (
+        "endpoint"          TEXT NOT NULL,
+        "idempotency_key"   TEXT NOT NULL,
+        "resource_id"       INTEGER NOT NULL,
+        "created_at"        INTEGER NOT NULL,
+        PRIMARY KEY("endpoint", "idempotency_key")
+    )""")
+
+
+def add_question_answers(db: sqlite3.Connection):
+    """
+    Moves the answers of every question from the pipe-joined 'answers' and 'correct_answer' columns into the
+    'question_answers' table, one row per answer with its ordinal and an 'is_correct' flag, then drops both columns.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Note:
+        Answers are stripped of surrounding whitespace. If no answer equals 'correct_answer', it is appended as the
+        last answer. The conversion is written out here rather than shared with `packages.questions`, so later
+        changes to how the API stores answers do not change what this migration does.
+
+    Usage:
+        Migration 5. Existing rows are converted with a single `executemany`. Dropping columns needs SQLite 3.35+.
+    """
+    cur = db.cursor()
+    cur.execute("""CREATE TABLE IF NOT EXISTS "question_answers" (
+        "fk_question_id"    INTEGER NOT NULL,
+        "ordinal"           INTEGER NOT NULL,
+        "answer"            TEXT NOT NULL,
+        "is_correct"        INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY("fk_question_id", "ordinal"),
+        FOREIGN KEY("fk_question_id") REFERENCES "questions"("question_id")
+    ) WITHOUT ROWID""")
+    columns = [column[1] for column in cur.execute("PRAGMA table_info(questions)")]
+    if "answers" not in columns:
+        return
+    cur.execute("SELECT question_id, answers, correct_answer FROM questions")
+    rows = []
+    for question_id, answers, correct_answer in cur.fetchall():
+        answers = [answer.strip() for answer in answers.split("|")]
+        correct_answer = correct_answer.strip()
+        if correct_answer not in answers:
+            answers.append(correct_answer)
+        correct = answers.index(correct_answer)
+        rows += [(question_id, ordinal, answer, int(ordinal == correct)) for ordinal, answer in enumerate(answers)]
+    cur.executemany("INSERT OR IGNORE INTO question_answers (fk_question_id, ordinal, answer, is_correct) VALUES (?, ?, ?, ?)",
+                    rows)
+    cur.execute("ALTER TABLE questions DROP COLUMN answers")
+    cur.execute("ALTER TABLE questions DROP COLUMN correct_answer")
+
+
+def script_statements(script: str) -> list:
+    """
+    Splits an SQL script into complete statements, keeping trigger bodies in one piece.
+
+    Note:
+        `executescript()` commits the open transaction first, so migrations run scripts statement by statement.
+    """
+    statements = []
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ""
+    return statements
+
+
+def add_search_index(db: sqlite3.Connection):
+    """
+    Creates the FTS5 indexes over event titles, event descriptions and questions from `databases/search.sql`,
+    together with the triggers that keep them in sync, and fills them from the existing rows.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Usage:
+        Migration 6. Used by `/search`.
+    """
+    with open(SEARCH_SCHEMA, encoding="utf-8") as schema:
+        for statement in script_statements(schema.read()):
+            db.execute(statement)
+    db.execute("INSERT INTO event_fts (event_fts) VALUES ('rebuild')")
+    db.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+
+
+def add_scores(db: sqlite3.Connection):
+    """
+    Creates the 'scores' table of submitted game scores, indexed in leaderboard order per module and game.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Usage:
+        Migration 7. Written in batches by `scores.ScoreBuffer` and read by `scores.Leaderboards`.
+    """
+    db.execute("""CREATE TABLE IF NOT EXISTS "scores" (
+        "score_id"          INTEGER NOT NULL,
+        "fk_module_id"      INTEGER NOT NULL,
+        "game"              TEXT NOT NULL,
+        "player"            TEXT NOT NULL,
+        "score"             INTEGER NOT NULL,
+        "rounds"            INTEGER NOT NULL,
+        "created_at"        REAL NOT NULL,
+        PRIMARY KEY("score_id"),
+        FOREIGN KEY("fk_module_id") REFERENCES "modules"("module_id")
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS scores_leaderboard_idx "
+               "ON scores (fk_module_id, game, score DESC, created_at)")
+
+
+
+def add_round_tokens(db: sqlite3.Connection):
+    """
+    Creates the 'round_tokens' table of redeemed round tokens, indexed by expiry for pruning.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate.
+
+    Usage:
+        Migration 8. Written and pruned by `rounds.RoundTokens.redeem()`.
+    """
+    db.execute("""CREATE TABLE IF NOT EXISTS "round_tokens" (
+        "nonce"             TEXT NOT NULL,
+        "expires_at"        REAL NOT NULL,
+        PRIMARY KEY("nonce")
+    ) WITHOUT ROWID""")
+    db.execute("CREATE INDEX IF NOT EXISTS round_tokens_expiry_idx ON round_tokens (expires_at)")
+
+
+MIGRATIONS = [
+    (1, "event date key", add_event_date_key),
+    (2, "lookup indexes", add_lookup_indexes),
+    (3, "event module index", add_event_module_index),
+    (4, "idempotency keys", add_idempotency_keys),
+    (5, "question answers", add_question_answers),
+    (6, "search index", add_search_index),
+    (7, "scores", add_scores),
+    (8, "round tokens", add_round_tokens),
+]
+
+
+def schema_version(db: sqlite3.Connection) -> int:
+    """
+    Returns the schema version recorded in the database header.
+
+    Args:
+        db (sqlite3.Connection): The database connection to inspect.
+
+    Returns:
+        int: The value of `PRAGMA user_version`; 0 for a database that only has the base `app.sql` schema.
+    """
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db: sqlite3.Connection) -> int:
+    """
+    Applies every migration newer than the database's schema version.
+
+    Note:
+        Each migration runs in its own transaction together with the `PRAGMA user_version` bump,
+        so a failed migration leaves the database at the previous version.
+
+    Args:
+        db (sqlite3.Connection): The database connection to migrate. The base `app.sql` schema must already exist.
+
+    Returns:
+        int: The schema version after migrating.
+
+    Raises:
+        sqlite3.Error: If a migration fails. The failed migration is rolled back.
+
+    Usage:
+        Called by `init_db()` after the base schema script. New migrations are appended to `MIGRATIONS`
+        with the next version number; released migrations are never edited.
+    """
+    version = schema_version(db)
+    for migration_version, name, migration in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        db.execute("BEGIN")
+        try:
+            migration(db)
+            db.execute(f"PRAGMA user_version = {migration_version}")
+        except Exception:
+            db.rollback()
+            raise
+        db.commit()
+        version = migration_version
+    return version
@@ -0,0 +1,93 @@
+import itertools
+
+
+class Keyset:
+    """
+    Describes the ordering columns used to paginate a listing by key instead of by offset.
+
+    Note:
+        The cursor of a row is its ordering values joined with ':', for example '10251225:3' for an event dated
+        1025-12-25 with ID 3. The next page starts strictly after that cursor, so rows inserted or deleted
+        elsewhere in the listing never shift pages the way OFFSET would.
+
+    Args:
+        *columns (str): The ordering columns, most significant first. All of them must be integers and the last one
+            must be unique, typically the primary key.
+
+    Usage:
+        Pass an instance to `backend.list_response()`.
+    """
+
+    def __init__(self, *columns):
+        self.columns = columns
+
+    def parse(self, after: str) -> list:
+        """
+        Splits a cursor into the values of the ordering columns.
+
+        Args:
+            after (str): A cursor produced by `cursor()`.
+
+        Returns:
+            list: One int per ordering column.
+
+        Raises:
+            ValueError: If the cursor does not match the keyset.
+        """
+        values = after.split(":")
+        if len(values) != len(self.columns):
+            raise ValueError(f"Invalid cursor: {after!r}")
+        return [int(value) for value in values]
+
+    def condition(self) -> str:
+        """
+        Returns the SQL condition selecting rows after a cursor, with one placeholder per column.
+        """
+        placeholders = ", ".join("?" * len(self.columns))
+        return f"({', '.join(self.columns)}) > ({placeholders})"
+
+    def order_by(self) -> str:
+        """
+        Returns the SQL ORDER BY expression of the keyset.
+        """
+        return ", ".join(self.columns)
+
+    def cursor(self, values) -> str:
+        """
+        Builds the cursor of a row from its ordering values.
+
+        Args:
+            values (tuple): The row's values of the ordering columns, in keyset order.
+        """
+        return ":".join(str(value) for value in values)
+
+
+def stream_rows(cur, encode, ndjson: bool, batch_size=500):
+    """
+    Yields a JSON array, or newline-delimited JSON, built incrementally from a cursor.
+
+    Args:
+        cur (sqlite3.Cursor): A cursor with an executed query, or any other iterator of rows.
+        encode (callable): Turns one row into its serialized JSON bytes.
+        ndjson (bool): Whether to emit one document per line instead of a single array.
+        batch_size (int): Rows fetched from SQLite per step.
+
+    Yields:
+        bytes: Chunks of the response body. Memory use is bounded by `batch_size`, not by the number of rows.
+    """
+    separator = b"\n" if ndjson else b","
+    first = True
+    if not ndjson:
+        yield b"["
+    while True:
+        rows = list(itertools.islice(cur, batch_size))
+        if not rows:
+            break
+        chunk = separator.join(encode(row) for row in rows)
+        if ndjson:
+            yield chunk + b"\n"
+        else:
+            yield chunk if first else b"," + chunk
+        first = False
+    if not ndjson:
+        yield b"]\n"
@@ -0,0 +1,179 @@
+import collections
+import sqlite3
+import threading
+
+from packages.sampling import module_version, rng
+
+Question = collections.namedtuple("Question", ["id", "module_id", "question", "answers", "correct_answer"])
+
+SELECT_QUESTIONS = ("SELECT questions.question_id, questions.fk_module_id, questions.question, "
+                    "question_answers.answer, question_answers.is_correct FROM questions "
+                    "LEFT JOIN question_answers ON question_answers.fk_question_id = questions.question_id")
+
+
+def read_questions(cur: sqlite3.Cursor, condition: str, params: tuple) -> list:
+    """
+    Reads questions together with their answers in one query.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to query with.
+        condition (str): SQL condition on the 'questions' table, for example 'questions.question_id = ?'.
+        params (tuple): Parameters of the condition.
+
+    Returns:
+        list: `Question`s ordered by ID, each with its answers in their original order.
+    """
+    cur.execute(f"{SELECT_QUESTIONS} WHERE {condition} "
+                "ORDER BY questions.question_id, question_answers.ordinal", params)
+    questions = []
+    answers = []
+    correct_answer = None
+    current = None
+    for question_id, module_id, question, answer, is_correct in cur:
+        if current is None or current[0] != question_id:
+            if current is not None:
+                questions.append(Question(*current, tuple(answers), correct_answer))
+            current = (question_id, module_id, question)
+            answers = []
+            correct_answer = None
+        if answer is not None:
+            answers.append(answer)
+            if is_correct:
+                correct_answer = answer
+    if current is not None:
+        questions.append(Question(*current, tuple(answers), correct_answer))
+    return questions
+
+
+def answer_rows(question_id: int, answers: list, correct_answer: str) -> list:
+    """
+    Turns a question's answers into 'question_answers' rows.
+
+    Note:
+        Answers are stripped of surrounding whitespace. The answer equal to `correct_answer` is flagged as correct;
+        if none is, `correct_answer` is appended as the last answer, so the correct answer is never lost.
+
+    Args:
+        question_id (int): The ID of the question.
+        answers (list): The answers, in display order.
+        correct_answer (str): The correct answer.
+
+    Returns:
+        list: (question ID, ordinal, answer, is_correct) tuples.
+    """
+    answers = [answer.strip() for answer in answers]
+    correct_answer = correct_answer.strip()
+    if correct_answer not in answers:
+        answers.append(correct_answer)
+    correct = answers.index(correct_answer)
+    return [(question_id, ordinal, answer, int(ordinal == correct)) for ordinal, answer in enumerate(answers)]
+
+
+def write_answers(cur: sqlite3.Cursor, question_id: int, answers: list, correct_answer: str):
+    """
+    Replaces the answers of a question. The caller commits.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to write with.
+        question_id (int): The ID of the question.
+        answers (list): The answers, in display order.
+        correct_answer (str): The correct answer.
+    """
+    cur.execute("DELETE FROM question_answers WHERE fk_question_id = ?", (question_id,))
+    cur.executemany("INSERT INTO question_answers (fk_question_id, ordinal, answer, is_correct) VALUES (?, ?, ?, ?)",
+                    answer_rows(question_id, answers, correct_answer))
+
+
+class QuestionCache:
+    """
+    Keeps the parsed questions of each module in memory for trivia.
+
+    Note:
+        A module's questions are read with one join the first time they are needed and then served as `Question`
+        structs, so drawing a trivia round does no query and no string processing. The interface matches
+        `sampling.IdSampler`, so the games can draw from either. Write handlers must call `invalidate()` for the
+        module whenever one of its questions or answers changes. As in `sampling.IdSampler`, a module's questions
+        are reloaded once its version counter has changed, so writes in other workers reach the cache too.
+
+    Args:
+        versions (versions.VersionCounters): The app's version counters, or None to rely on `invalidate()` alone.
+
+    Usage:
+        One per application, created by `games.new_samplers()`; see `backend.game_source()`.
+    """
+
+    def __init__(self, versions=None):
+        self.versions = versions
+        self._modules = {}
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def module(self, cur: sqlite3.Cursor, module_id) -> dict:
+        """
+        Returns the questions of a module by ID, loading them on first use.
+
+        Args:
+            cur (sqlite3.Cursor): A cursor used if the questions are not cached yet.
+            module_id (str): The ID of the module.
+
+        Returns:
+            dict: `Question`s by question ID.
+        """
+        key = str(module_id)
+        version = module_version(self.versions, module_id)
+        cached = self._modules.get(key)
+        if cached is not None and cached[1] == version:
+            return cached[0]
+        generation = (self._epoch, self._generations.get(key, 0))
+        questions = {question.id: question
+                     for question in read_questions(cur, "questions.fk_module_id = ?", (module_id,))}
+        with self._lock:
+            if (self._epoch, self._generations.get(key, 0)) == generation:
+                self._modules[key] = (questions, version)
+        return questions
+
+    def ids(self, cur: sqlite3.Cursor, module_id) -> list:
+        return list(self.module(cur, module_id))
+
+    def fetch(self, cur: sqlite3.Cursor, ids: list) -> list:
+        """
+        Reads the questions with the given IDs with one query.
+
+        Returns:
+            list: `Question`s in the same order as `ids`. IDs deleted in the meantime are skipped.
+        """
+        if not ids:
+            return []
+        placeholders = ", ".join("?" * len(ids))
+        questions = {question.id: question
+                     for question in read_questions(cur, f"questions.question_id IN ({placeholders})", ids)}
+        return [questions[question_id] for question_id in ids if question_id in questions]
+
+    def sample_rows(self, cur: sqlite3.Cursor, module_id, k: int) -> list:
+        """
+        Draws up to k random questions of a module.
+        """
+        questions = self.module(cur, module_id)
+        return [questions[question_id] for question_id in rng.sample(list(questions), max(0, min(k, len(questions))))]
+
+    def known(self, module_id) -> bool:
+        """
+        Tells whether questions of a module are cached and there is at least one, without querying.
+        """
+        cached = self._modules.get(str(module_id))
+        return cached is not None and len(cached[0]) > 0
+
+    def invalidate(self, module_id=None):
+        """
+        Drops the cached questions of one module, or of every module when no module ID is given.
+        """
+        with self._lock:
+            if module_id is None:
+                self._modules.clear()
+                self._epoch += 1
+            else:
+                key = str(module_id)
+                self._modules.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
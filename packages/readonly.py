@@ -0,0 +1,183 @@
+import bisect
+
+import click
+from flask import Blueprint, current_app, request, jsonify
+
+from packages.backend import (BUCKET_YEARS, EVENT_FIELDS, EVENT_IDS, EVENT_KEYSET, MODULE_FIELDS, MODULE_KEYSET,
+                              QUESTION_IDS, QUESTION_KEYSET, TIMELINE_KEYSET, cached_json, get_db, page_args,
+                              page_response, question_json, timeline_filters)
+from packages.dates import UNDATED_KEY
+from packages.snapshot import compile_snapshot, get_snapshot
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+api = Blueprint("readonly", __name__, cli_group=None)
+
+
+def listing(snapshot, cache_key: tuple, positions, key, row, keyset, encoder):
+    """
+    Returns a listing from the snapshot with the parameters and response shapes of `backend.list_response()`.
+
+    Args:
+        snapshot (Snapshot): The snapshot the positions belong to.
+        cache_key (tuple): The response cache key of the whole listing, or None if it must not be cached.
+        positions: The positions of the listed rows, in keyset order.
+        key (callable): Returns the keyset values of the row at a position, as a tuple.
+        row (callable): Returns the row at a position, as a tuple.
+        keyset (Keyset): The ordering and pagination columns.
+        encoder (RowEncoder): Turns a row into its JSON representation.
+    """
+    if not request.args.keys() & {"after", "limit", "stream"}:
+        def build():
+            return [encoder.to_json(row(position)) for position in positions]
+        if cache_key is None:
+            return jsonify(build())
+        return cached_json(("snapshot",) + cache_key, build)
+    try:
+        after, limit, stream = page_args(keyset)
+    except ValueError as error:
+        return jsonify({"response": 400, "error": str(error)}), 400
+    start = 0 if after is None else bisect.bisect_right(positions, tuple(after), key=key)
+    stop = len(positions)
+    next_cursor = None
+    if limit is not None and start + limit < stop:
+        stop = start + limit
+        next_cursor = keyset.cursor(key(positions[stop - 1]))
+    json = current_app.json
+    return page_response((row(positions[index]) for index in range(start, stop)),
+                         lambda row: json.dumpb(encoder.to_json(row)),
+                         lambda rows: json.dumpb([encoder.to_json(row) for row in rows]) + b"\n", limit, stream,
+                         next_cursor)
+
+
+def modules(snapshot):
+    return listing(snapshot, ("modules",), range(len(snapshot.module_ids)),
+                   lambda position: (snapshot.module_ids[position],), snapshot.module_row, MODULE_KEYSET, MODULE_FIELDS)
+
+
+def get_module(snapshot, module_id):
+    index = snapshot.module_index(module_id)
+    return jsonify({} if index is None else MODULE_FIELDS.to_json(snapshot.module_row(index)))
+
+
+def events(snapshot, module_id):
+    return listing(snapshot, ("events", module_id), snapshot.module_events_by_id(module_id),
+                   lambda position: (snapshot.event_ids[position],), lambda position: (snapshot.event_ids[position],),
+                   EVENT_KEYSET, EVENT_IDS)
+
+
+def get_event(snapshot, event_id):
+    index = snapshot.event_index(event_id)
+    return jsonify({} if index is None else EVENT_FIELDS.to_json(snapshot.event_row(index)))
+
+
+def event_timeline(snapshot, module_id):
+    """
+    Serves `backend.event_timeline()`: '?from=' and '?to=' narrow the date-sorted positions with a binary search.
+    """
+    try:
+        first, last, buckets = timeline_filters()
+    except ValueError as error:
+        return jsonify({"response": 400, "error": str(error)}), 400
+    if module_id is None or module_id == "1":
+        module_id = "1"
+        positions = snapshot.timeline()
+    else:
+        positions = snapshot.module_events(module_id)
+
+    def key(position):
+        return snapshot.date_keys[position], snapshot.event_ids[position]
+    ranged = first is not None or last is not None
+    if ranged:
+        positions = positions[bisect.bisect_left(positions, (first,), key=key) if first is not None else 0:
+                              bisect.bisect_left(positions, (last + 1,), key=key) if last is not None else None]
+    if buckets is not None:
+        def build():
+            return bucket_counts(snapshot, positions, BUCKET_YEARS[buckets])
+        if ranged:
+            return jsonify(build())
+        return cached_json(("snapshot", "buckets", module_id, buckets), build)
+    return listing(snapshot, None if ranged else ("timeline", module_id), positions, key, snapshot.event_row,
+                   TIMELINE_KEYSET, EVENT_FIELDS)
+
+
+def bucket_counts(snapshot, positions, years: int) -> list:
+    """
+    Counts the events at date-sorted `positions` per bucket of `years` years, like `backend.bucket_counts()`.
+    """
+    buckets = []
+    start = bisect.bisect_right(positions, UNDATED_KEY, key=lambda position: snapshot.date_keys[position])
+    while start < len(positions):
+        year = snapshot.date_keys[positions[start]] // 10000 // years * years
+        stop = bisect.bisect_left(positions, (year + years) * 10000, lo=start,
+                                  key=lambda position: snapshot.date_keys[position])
+        buckets.append({"start": year, "end": year + years - 1, "count": stop - start})
+        start = stop
+    return buckets
+
+
+def questions(snapshot, module_id):
+    return listing(snapshot, ("questions", module_id), snapshot.module_questions(module_id),
+                   lambda position: (snapshot.question_ids[position],),
+                   lambda position: (snapshot.question_ids[position],), QUESTION_KEYSET, QUESTION_IDS)
+
+
+def get_question(snapshot, question_id):
+    index = snapshot.question_index(question_id)
+    return jsonify({} if index is None else question_json(snapshot.question_row(index)))
+
+
+# Endpoint -> view reading the snapshot instead of SQLite. Game endpoints draw from the snapshot by themselves,
+# see `backend.game_source()`.
+VIEWS = {
+    "api.modules": modules,
+    "api.get_module": get_module,
+    "api.events": events,
+    "api.get_event": get_event,
+    "api.event_timeline": event_timeline,
+    "api.questions": questions,
+    "api.get_question": get_question,
+}
+GAME_ENDPOINTS = {"api.image_name_game", "api.image_date_game", "api.higher_lower", "api.chronological", "api.trivia",
+                  "api.game_session"}
+
+
+@api.before_app_request
+def serve_snapshot():
+    """
+    In read-only mode, answers reads of the content endpoints from the snapshot and refuses every write.
+
+    Note:
+        Read-only mode is on when `SNAPSHOT_PATH` is set. Endpoints without a snapshot view, such as '/search',
+        keep reading SQLite. Returns None, so Flask dispatches the request normally, when the request is not
+        handled here.
+
+    Returns:
+        Response: The snapshot response, 405 for a write, or 503 if no snapshot has been published.
+    """
+    if current_app.config['SNAPSHOT_PATH'] is None:
+        return None
+    if request.method not in READ_METHODS:
+        return jsonify({"response": 405, "error": "The API is in read-only mode"}), 405
+    if request.method == "OPTIONS" or (request.endpoint not in VIEWS and request.endpoint not in GAME_ENDPOINTS):
+        return None
+    try:
+        snapshot = get_snapshot()
+    except FileNotFoundError:
+        return jsonify({"response": 503, "error": "No snapshot has been published"}), 503
+    view = VIEWS.get(request.endpoint)
+    return view(snapshot, **request.view_args) if view is not None else None
+
+
+@api.cli.command("snapshot-compile")
+@click.option("--output", default=None, help="Snapshot file to write, `SNAPSHOT_PATH` by default.")
+def compile_command(output):
+    """
+    Compiles the database into a read-only snapshot file, replacing the previous one atomically.
+    """
+    output = output or current_app.config['SNAPSHOT_PATH']
+    if output is None:
+        raise click.UsageError("Pass --output or set FLASK_SNAPSHOT_PATH")
+    counts = compile_snapshot(get_db(), output)
+    click.echo(f"Compiled {counts['modules']} modules, {counts['events']} events, {counts['questions']} questions "
+               f"into {output}")
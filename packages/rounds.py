@@ -0,0 +1,310 @@
+import collections
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask import Flask
+from itsdangerous import BadData, URLSafeTimedSerializer
+
+from packages import games
+from packages.sampling import module_version
+
+
+def render_round(cur: sqlite3.Cursor, samplers: dict, json, game: str, module_id: str, number=None,
+                 tokens=None) -> bytes:
+    """
+    Draws one game round and serializes it the way `jsonify()` would.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to query with.
+        samplers (dict): The samplers by source name, see `games.draw()`.
+        json (FastJSONProvider): The application's JSON provider (`app.json`).
+        game (str): A key of `games.GAMES`, for example 'higher-lower'.
+        module_id (str): The ID of the module to draw from.
+        number (int): The number of events, for the games that take one.
+        tokens (RoundTokens): Issues the round's token when scoring is enabled, see `games.draw()`.
+
+    Returns:
+        bytes: The response body.
+    """
+    return json.dumpb(games.draw(cur, samplers, game, module_id, number, tokens)) + b"\n"
+
+
+class RoundTokens:
+    """
+    Issues and redeems the tokens that tie an answer to a round the server drew.
+
+    Note:
+        A token holds the round's game, module ID and row IDs, in the order they were shown, and a random nonce. It
+        is signed with the app's `SECRET_KEY` and timestamped by `itsdangerous`, so issuing one needs no database
+        access and drawing rounds, pooled or not, stays read-only. A token is accepted for `ttl` seconds and only
+        once: `redeem()` records the nonces of a whole submission in 'round_tokens' in one transaction and refuses
+        the submission if one of them is already there. Recorded nonces are deleted once their token has expired.
+
+    Args:
+        secret (str): The signing key.
+        ttl (float): Seconds a token is accepted.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['round_tokens']` when `SCORING_ENABLED` is set.
+    """
+
+    def __init__(self, secret, ttl=3600.0):
+        self.ttl = ttl
+        self._serializer = URLSafeTimedSerializer(secret, salt="round-token")
+
+    def issue(self, game: str, module_id, ids: list) -> str:
+        """
+        Returns a new token for a drawn round.
+
+        Args:
+            game (str): A key of `games.CHECKS`.
+            module_id (str): The ID of the module the round was drawn from.
+            ids (list): The row IDs of the round, in the order they are shown.
+        """
+        return self._serializer.dumps([game, str(module_id), ids, secrets.token_hex(8)])
+
+    def load(self, token, game: str, module_id) -> tuple:
+        """
+        Reads a token of a round of `game` in a module.
+
+        Returns:
+            tuple: (row IDs, nonce, Unix time the token expires at).
+
+        Raises:
+            ValueError: If the token is not a string, was not issued by this app, has expired or belongs to another
+                game or module.
+        """
+        if not isinstance(token, str):
+            raise ValueError("'round_token' must be a string")
+        try:
+            (token_game, token_module_id, ids, nonce), issued = self._serializer.loads(token, max_age=self.ttl,
+                                                                                       return_timestamp=True)
+        except (BadData, TypeError, ValueError):
+            raise ValueError("'round_token' is invalid or has expired") from None
+        if token_game != game or token_module_id != str(module_id):
+            raise ValueError(f"'round_token' is not a round of {game} in module {module_id}")
+        return ids, nonce, issued.timestamp() + self.ttl
+
+    def redeem(self, db: sqlite3.Connection, redeemed: list) -> bool:
+        """
+        Marks tokens as used, all or none.
+
+        Args:
+            db (sqlite3.Connection): The database connection to write to.
+            redeemed (list): (nonce, expiry) pairs from `load()`.
+
+        Returns:
+            bool: False, and nothing is recorded, if one of the tokens was used before.
+
+        Raises:
+            sqlite3.Error: If the write fails.
+        """
+        cur = db.cursor()
+        try:
+            cur.execute("DELETE FROM round_tokens WHERE expires_at < ?", (time.time(),))
+            for nonce, expires_at in redeemed:
+                cur.execute("INSERT OR IGNORE INTO round_tokens (nonce, expires_at) VALUES (?, ?)",
+                            (nonce, expires_at))
+                if cur.rowcount == 0:
+                    db.rollback()
+                    return False
+        except sqlite3.Error:
+            db.rollback()
+            raise
+        db.commit()
+        return True
+
+
+class RoundPool:
+    """
+    Keeps bounded queues of ready-to-serve, pre-serialized game rounds per (game, module ID, number of events).
+
+    Note:
+        A request pops a round from its queue. When a queue drops below `low_water` rounds, its key is handed to a
+        background producer thread that draws rounds with `games.draw()`, like the uncached path, until the
+        queue holds `capacity` rounds again. An empty queue is a miss: the caller draws the round itself.
+        `invalidate()` drops a module's queues and discards rounds that were being produced from the old data.
+        `invalidate()` only reaches the process it runs in, so each round also remembers the module's version
+        counter (`sampling.module_version()`) from before it was drawn, and `pop()` skips rounds whose module has
+        been written to since by any worker. Rounds older than `ttl` seconds are skipped as well, a backstop for
+        writes that bypass the version counters. At most `max_keys` queues are kept, dropping the least recently used one, and games
+        asking for fewer than 1 or more than `max_number` events are not pooled. Queues are only filled for modules
+        whose sampler has returned rows (`known()`), so requests for modules that do not exist, or that have no
+        rows, cannot make the producer draw empty rounds or push real queues out. The producer thread is started
+        on first use in each process, so a pre-forking server starts one per worker.
+
+    Args:
+        app (Flask): The application whose database and JSON provider the producer uses.
+        capacity (int): Rounds kept per queue. 0 disables the pool.
+        low_water (int): Queue length below which a refill is scheduled.
+        ttl (float): Seconds a round stays servable. 0 disables expiry.
+        max_keys (int): Maximum number of queues.
+        max_number (int): Largest number of events for which rounds are pooled.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['round_pool']`. Call `pop()` from the game handlers and
+        `invalidate()` from the write handlers.
+    """
+
+    def __init__(self, app: Flask, capacity=32, low_water=8, ttl=60.0, max_keys=1024, max_number=20):
+        self.app = app
+        self.capacity = capacity
+        self.low_water = low_water
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.max_number = max_number
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._rounds = collections.OrderedDict()
+        self._scheduled = set()
+        self._wanted = queue.Queue()
+        self._generations = {}
+        self._epoch = 0
+        self._thread = None
+        self._stats = {"hits": 0, "misses": 0, "produced": 0, "discarded": 0, "expired": 0}
+
+    def _generation(self, module_id: str) -> tuple:
+        return self._epoch, self._generations.get(module_id, 0)
+
+    def _schedule(self, key: tuple):
+        # Called with the lock held.
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._wanted.put(key)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="round-producer", daemon=True)
+            self._thread.start()
+
+    def pop(self, game: str, module_id, number=None):
+        """
+        Takes a ready round from the queue and schedules a refill when the queue runs low.
+
+        Args:
+            game (str): A key of `games.GAMES`.
+            module_id (str): The ID of the module.
+            number (int): The number of events, for the games that take one.
+
+        Returns:
+            bytes: A serialized round, or None if none is ready or `number` is out of range; the caller then draws
+            one itself.
+        """
+        if self.capacity <= 0 or (number is not None and not 1 <= number <= self.max_number):
+            return None
+        if self._pid != os.getpid():
+            self._reset()
+        key = (game, str(module_id), number)
+        now = time.monotonic()
+        version = module_version(self.app.extensions['versions'], key[1])
+        with self._lock:
+            rounds = self._rounds.get(key)
+            body = None
+            if rounds is not None:
+                self._rounds.move_to_end(key)
+                while rounds and body is None:
+                    expires, drawn_version, body = rounds.popleft()
+                    if drawn_version != version:
+                        body = None
+                        self._stats["discarded"] += 1
+                    elif expires and expires < now:
+                        body = None
+                        self._stats["expired"] += 1
+            self._stats["hits" if body is not None else "misses"] += 1
+            sampler = self.app.extensions['samplers'][games.GAMES[game].source]
+            if (rounds is None or len(rounds) < self.low_water) and sampler.known(module_id):
+                self._schedule(key)
+        return body
+
+    def next_thumbnails(self, game: str, module_id, number=None) -> list:
+        """
+        Returns the thumbnail paths of the round that the next `pop()` of the same queue would take.
+
+        Note:
+            Used for prefetch hints, which are best effort: another client may take that round first. The
+            thumbnails are small and cached by the browser, so a hint that misses costs little, while one that
+            hits lets the next round render without waiting for its images.
+
+        Returns:
+            list: The round's 'thumbnail_url's, empty when no round is queued or the game has no images.
+        """
+        if self._pid != os.getpid():
+            return []
+        with self._lock:
+            rounds = self._rounds.get((game, str(module_id), number))
+            body = rounds[0][2] if rounds else None
+        if body is None:
+            return []
+        return games.thumbnails(self.app.json.loads(body))
+
+    def invalidate(self, module_id=None):
+        """
+        Drops the queued rounds of one module, or of every module when no module ID is given.
+
+        Args:
+            module_id (str): The ID of the module whose events or questions changed.
+        """
+        with self._lock:
+            if module_id is None:
+                self._rounds.clear()
+                self._epoch += 1
+            else:
+                module_id = str(module_id)
+                for key in [key for key in self._rounds if key[1] == module_id]:
+                    del self._rounds[key]
+                self._generations[module_id] = self._generations.get(module_id, 0) + 1
+
+    def _run(self):
+        while True:
+            key = self._wanted.get()
+            try:
+                self._fill(key)
+            except Exception:
+                self.app.logger.exception("Producing game rounds for %s failed", key)
+            finally:
+                with self._lock:
+                    self._scheduled.discard(key)
+
+    def _fill(self, key: tuple):
+        from packages.backend import get_cursor
+
+        game, module_id, number = key
+        with self.app.app_context():
+            cur = get_cursor()
+            while True:
+                with self._lock:
+                    generation = self._generation(module_id)
+                    rounds = self._rounds.get(key)
+                    if rounds is not None and len(rounds) >= self.capacity:
+                        return
+                version = module_version(self.app.extensions['versions'], module_id)
+                body = render_round(cur, self.app.extensions['samplers'], self.app.json, game, module_id, number,
+                                    self.app.extensions.get('round_tokens'))
+                with self._lock:
+                    if self._generation(module_id) != generation:
+                        self._stats["discarded"] += 1
+                        continue
+                    rounds = self._rounds.get(key)
+                    if rounds is None:
+                        rounds = self._rounds[key] = collections.deque()
+                        while len(self._rounds) > self.max_keys:
+                            self._rounds.popitem(last=False)
+                    rounds.append((time.monotonic() + self.ttl if self.ttl else 0, version, body))
+                    self._stats["produced"] += 1
+
+    def metrics(self) -> dict:
+        """
+        Returns a snapshot of the pool's counters.
+
+        Returns:
+            dict: 'queues' and 'rounds' gauges plus cumulative 'hits', 'misses', 'produced', 'discarded' and
+            'expired' counters.
+        """
+        with self._lock:
+            return {"queues": len(self._rounds), "rounds": sum(len(rounds) for rounds in self._rounds.values()),
+                    **self._stats}
@@ -0,0 +1,148 @@
+import os
+import random
+import sqlite3
+import threading
+
+rng = random.Random()
+os.register_at_fork(after_in_child=rng.seed)
+
+
+def module_version(versions, module_id):
+    """
+    Returns the version of a module's slot that cached rows of the module are checked against.
+
+    Args:
+        versions (versions.VersionCounters): The app's version counters, or None.
+        module_id (str): The ID of the module.
+
+    Returns:
+        tuple: (epoch, slot version), or None without version counters.
+    """
+    if versions is None:
+        return None
+    return versions.epoch, versions.version(versions.module_slot(module_id))
+
+
+class IdSampler:
+    """
+    Draws random rows of one module without reading the whole module.
+
+    Note:
+        The IDs of each module's rows are loaded once with an index-only query and kept in memory. A draw picks
+        k IDs from that array and `fetch()` reads just those rows with a single `WHERE id IN (...)` query.
+        Write handlers must call `invalidate()` for the module whenever rows are added to it or removed from it.
+        `invalidate()` only reaches the process it runs in, so with `versions` the cached IDs also remember the
+        module's version counter and are reloaded once a write in any worker has bumped it.
+
+    Args:
+        table (str): The table to sample from.
+        id_column (str): The table's primary key column.
+        versions (versions.VersionCounters): The app's version counters, or None to rely on `invalidate()` alone.
+
+    Usage:
+        One per application, created by `games.new_samplers()`; see `backend.game_source()`.
+    """
+
+    def __init__(self, table, id_column, versions=None):
+        self.table = table
+        self.id_column = id_column
+        self.versions = versions
+        self._ids = {}
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def ids(self, cur: sqlite3.Cursor, module_id) -> list:
+        """
+        Returns the IDs of every row in a module, loading them on first use.
+
+        Args:
+            cur (sqlite3.Cursor): A cursor used if the IDs are not cached yet.
+            module_id (str): The ID of the module.
+
+        Returns:
+            list: The row IDs of the module.
+        """
+        key = str(module_id)
+        version = module_version(self.versions, module_id)
+        cached = self._ids.get(key)
+        if cached is not None and cached[1] == version:
+            return cached[0]
+        generation = (self._epoch, self._generations.get(key, 0))
+        cur.execute(f"SELECT {self.id_column} FROM {self.table} WHERE fk_module_id = ?", (module_id,))
+        ids = [row[0] for row in cur]
+        with self._lock:
+            if (self._epoch, self._generations.get(key, 0)) == generation:
+                self._ids[key] = (ids, version)
+        return ids
+
+    def sample(self, cur: sqlite3.Cursor, module_id, k: int) -> list:
+        """
+        Draws up to k distinct row IDs of a module.
+
+        Args:
+            cur (sqlite3.Cursor): A cursor used if the IDs are not cached yet.
+            module_id (str): The ID of the module.
+            k (int): The number of IDs to draw. Capped at the number of rows in the module; below 0 counts as 0.
+
+        Returns:
+            list: The drawn IDs in random order.
+        """
+        ids = self.ids(cur, module_id)
+        return rng.sample(ids, max(0, min(k, len(ids))))
+
+    def fetch(self, cur: sqlite3.Cursor, ids: list) -> list:
+        """
+        Reads full rows for a list of IDs with one query.
+
+        Args:
+            cur (sqlite3.Cursor): The cursor to query with.
+            ids (list): Row IDs, for example from `sample()`.
+
+        Returns:
+            list: The rows in the same order as `ids`. IDs deleted in the meantime are skipped.
+        """
+        if not ids:
+            return []
+        placeholders = ", ".join("?" * len(ids))
+        cur.execute(f"SELECT * FROM {self.table} WHERE {self.id_column} IN ({placeholders})", ids)
+        rows = {row[0]: row for row in cur}
+        return [rows[row_id] for row_id in ids if row_id in rows]
+
+    def sample_rows(self, cur: sqlite3.Cursor, module_id, k: int) -> list:
+        """
+        Draws up to k random rows of a module.
+
+        Args:
+            cur (sqlite3.Cursor): The cursor to query with.
+            module_id (str): The ID of the module.
+            k (int): The number of rows to draw.
+
+        Returns:
+            list: The drawn rows in random order.
+        """
+        return self.fetch(cur, self.sample(cur, module_id, k))
+
+    def known(self, module_id) -> bool:
+        """
+        Tells whether IDs of a module are cached and there is at least one, without querying.
+        """
+        cached = self._ids.get(str(module_id))
+        return cached is not None and len(cached[0]) > 0
+
+    def invalidate(self, module_id=None):
+        """
+        Drops the cached IDs of one module, or of every module when no module ID is given.
+
+        Args:
+            module_id (str): The ID of the module whose rows changed.
+        """
+        with self._lock:
+            if module_id is None:
+                self._ids.clear()
+                self._epoch += 1
+            else:
+                key = str(module_id)
+                self._ids.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
@@ -0,0 +1,413 @@
+import atexit
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Blueprint, Flask, current_app, request, jsonify
+from flask_cors import cross_origin
+
+from packages import games
+from packages.backend import game_source, get_cursor, get_db
+
+PLAYER_MAX_LENGTH = 32
+INSERT_SCORE = ("INSERT INTO scores (fk_module_id, game, player, score, rounds, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)")
+SELECT_TOP = ("SELECT fk_module_id, game, player, score, rounds, created_at FROM scores "
+              "WHERE fk_module_id = ? AND game = ? ORDER BY score DESC, created_at LIMIT ?")
+
+# A submitted score, in the column order of `INSERT_SCORE`.
+Score = collections.namedtuple("Score", ["module_id", "game", "player", "score", "rounds", "created_at"])
+
+api = Blueprint("scores", __name__)
+
+
+def rank_key(score: Score) -> tuple:
+    """
+    Orders scores the way leaderboards list them: highest first, earlier submissions first among equal scores.
+    """
+    return -score.score, score.created_at
+
+
+class ScoreBuffer:
+    """
+    Collects submitted scores in memory and writes them to the 'scores' table in batches.
+
+    Note:
+        A submission only appends to a list, so it never waits for the SQLite write lock. A background thread
+        inserts the collected scores with one `executemany` per transaction, every `interval` seconds or as soon as
+        `batch_size` scores are waiting. When a flush fails, for example because the database is locked, its scores
+        are kept and written with the next one. Once `max_pending` scores are waiting, `add()` flushes in the
+        submitting request itself, so a database that stays unavailable makes submissions fail instead of growing
+        the buffer without bound. Scores still waiting when the process exits are flushed by an `atexit` handler
+        and by gunicorn's `worker_exit` hook; a crash loses at most the unflushed ones. The thread is started on
+        first use in each process, so a pre-forking server starts one per worker.
+
+    Args:
+        app (Flask): The application whose database the scores are written to.
+        batch_size (int): Waiting scores that trigger a flush before the interval is over.
+        interval (float): Seconds between flushes.
+        max_pending (int): Waiting scores above which submissions flush by themselves.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['scores']`. Call `add()` from the submission handler.
+    """
+
+    def __init__(self, app: Flask, batch_size=500, interval=1.0, max_pending=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._flushing = []
+        self._thread = None
+        self._stats = {"submitted": 0, "written": 0, "batches": 0, "failures": 0}
+
+    def add(self, score: Score):
+        """
+        Queues a score for the next batch.
+
+        Raises:
+            sqlite3.Error: If `max_pending` scores are waiting and flushing them fails.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        if len(self._pending) >= self.max_pending:
+            self.flush()
+        with self._lock:
+            self._pending.append(score)
+            self._stats["submitted"] += 1
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+                self._thread.start()
+
+    def pending(self) -> list:
+        """
+        Returns the scores that are not committed yet, including those of a flush in progress.
+        """
+        if self._pid != os.getpid():
+            return []
+        with self._lock:
+            return self._flushing + self._pending
+
+    def flush(self) -> int:
+        """
+        Writes every waiting score in one transaction.
+
+        Returns:
+            int: The number of scores written.
+
+        Raises:
+            sqlite3.Error: If the insert fails. The scores stay queued.
+        """
+        if self._pid != os.getpid():
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                scores = self._flushing = self._pending
+                self._pending = []
+            if not scores:
+                return 0
+            try:
+                with self.app.app_context():
+                    db = get_db()
+                    db.executemany(INSERT_SCORE, scores)
+                    db.commit()
+            except sqlite3.Error:
+                with self._lock:
+                    self._pending[:0] = scores
+                    self._flushing = []
+                    self._stats["failures"] += 1
+                raise
+            with self._lock:
+                self._flushing = []
+                self._stats["written"] += len(scores)
+                self._stats["batches"] += 1
+            return len(scores)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Writing %d scores failed, retrying", len(self._pending))
+
+    def metrics(self) -> dict:
+        """
+        Returns a snapshot of the buffer's counters.
+
+        Returns:
+            dict: A 'pending' gauge plus cumulative 'submitted', 'written', 'batches' and 'failures' counters.
+        """
+        with self._lock:
+            return {"pending": len(self._pending) + len(self._flushing), **self._stats}
+
+
+class Leaderboards:
+    """
+    Keeps the top scores of each (game, module) in memory, updated as scores are submitted.
+
+    Note:
+        A board is read once from 'scores' with an index walk that stops after `size` rows, never with an aggregate
+        query, and merged with the scores still waiting in the `ScoreBuffer`. After that every submission is
+        inserted into its board with `record()`, and reads return the board as it is. Each worker only sees its
+        own submissions, so a board is read again once it is older than `ttl` seconds; that bounds how long a
+        score submitted to another worker is missing. At most `max_boards` boards are kept, dropping the least
+        recently used one. The lock is not held while a board is read from the database, so a slow read does not
+        stall other boards. Scores recorded while a board is being read are kept aside and merged into it, together
+        with the previous board, so a submission cannot be lost between the read of a board and its replacement.
+
+    Args:
+        size (int): Scores kept per board.
+        ttl (float): Seconds before a board is read again. 0 keeps boards until they are evicted.
+        max_boards (int): Maximum number of boards.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['leaderboards']`.
+    """
+
+    def __init__(self, size=10, ttl=10.0, max_boards=1024):
+        self.size = size
+        self.ttl = ttl
+        self.max_boards = max_boards
+        self._lock = threading.Lock()
+        self._boards = collections.OrderedDict()
+        self._loading = {}
+        self._stats = {"hits": 0, "loads": 0, "recorded": 0}
+
+    def top(self, cur: sqlite3.Cursor, game: str, module_id, pending=()) -> list:
+        """
+        Returns the board of a game and module, reading it first if it is not loaded or has expired.
+
+        Args:
+            cur (sqlite3.Cursor): A cursor used if the board has to be read.
+            game (str): A key of `games.CHECKS`.
+            module_id (str): The ID of the module.
+            pending (list): The scores not committed yet, see `ScoreBuffer.pending()`.
+
+        Returns:
+            list: Up to `size` `Score`s, best first.
+        """
+        key = (game, str(module_id))
+        with self._lock:
+            board = self._boards.get(key)
+            if board is not None and (not self.ttl or board[0] > time.monotonic()):
+                self._boards.move_to_end(key)
+                self._stats["hits"] += 1
+                return list(board[1])
+            recorded = self._loading.setdefault(key, [])
+        scores = {Score(*row) for row in cur.execute(SELECT_TOP, (module_id, game, self.size))}
+        with self._lock:
+            if self._loading.get(key) is recorded:
+                del self._loading[key]
+            board = self._boards.get(key)
+            if board is not None:
+                scores.update(board[1])
+            scores.update(recorded)
+            scores.update(score for score in pending if (score.game, str(score.module_id)) == key)
+            scores = sorted(scores, key=rank_key)[:self.size]
+            self._boards[key] = (time.monotonic() + self.ttl, scores)
+            self._boards.move_to_end(key)
+            while len(self._boards) > self.max_boards:
+                self._boards.popitem(last=False)
+            self._stats["loads"] += 1
+            return list(scores)
+
+    def record(self, score: Score):
+        """
+        Inserts a new score into its board, if the board is loaded and the score makes it.
+
+        Returns:
+            int: The score's 1-based rank on the board, or None if it did not make the board.
+        """
+        with self._lock:
+            key = (score.game, str(score.module_id))
+            if key in self._loading:
+                self._loading[key].append(score)
+            board = self._boards.get(key)
+            if board is None:
+                return None
+            scores = board[1]
+            if score not in scores:
+                scores.append(score)
+                scores.sort(key=rank_key)
+                del scores[self.size:]
+                self._stats["recorded"] += 1
+            return scores.index(score) + 1 if score in scores else None
+
+    def metrics(self) -> dict:
+        """
+        Returns a snapshot of the leaderboards' counters.
+
+        Returns:
+            dict: A 'boards' gauge plus cumulative 'hits', 'loads' and 'recorded' counters.
+        """
+        with self._lock:
+            return {"boards": len(self._boards), **self._stats}
+
+
+def score_json(rank: int, score: Score) -> dict:
+    return {"rank": rank, "player": score.player, "score": score.score, "rounds": score.rounds,
+            "created_at": score.created_at}
+
+
+def checked_answers(game: str, module_id, answers: list):
+    """
+    Redeems the round tokens of answers and checks the answers with `games.check_answers()`.
+
+    Note:
+        Every answer must carry the 'round_token' its round was served with. The tokens are only redeemed once
+        all answers are well formed, and then all together, so a round is scored at most once, and checking a
+        round with '/game/check' uses it up as well.
+
+    Returns:
+        tuple: (list of True or False per answer, None), or (None, an error response): 404 when scoring is disabled
+        or the game is not scored, 400 for invalid answers or tokens, 409 if a round has been answered before, and
+        503 if the tokens cannot be recorded.
+    """
+    tokens = current_app.extensions.get('round_tokens')
+    if tokens is None:
+        return None, (jsonify({"response": 404, "error": "Scoring is not enabled"}), 404)
+    if game not in games.CHECKS:
+        return None, (jsonify({"response": 404, "error": f"Answers of {game} are not checked"}), 404)
+    if not isinstance(answers, list) or not 1 <= len(answers) <= current_app.config['GAME_SESSION_MAX_ROUNDS']:
+        error = f"answers must list between 1 and {current_app.config['GAME_SESSION_MAX_ROUNDS']} answers"
+        return None, (jsonify({"response": 400, "error": error}), 400)
+    drawn = []
+    redeemed = {}
+    try:
+        for number, answer in enumerate(answers, start=1):
+            if not isinstance(answer, dict):
+                raise ValueError(f"Answer {number} must be an object")
+            try:
+                ids, nonce, expires_at = tokens.load(answer.get("round_token"), game, module_id)
+            except ValueError as error:
+                raise ValueError(f"Answer {number}: {error}") from None
+            if nonce in redeemed:
+                raise ValueError(f"Answer {number} repeats an earlier round")
+            drawn.append(ids)
+            redeemed[nonce] = expires_at
+        cur, samplers = game_source()
+        results = games.check_answers(cur, samplers, game, module_id, answers, drawn)
+    except ValueError as error:
+        return None, (jsonify({"response": 400, "error": str(error)}), 400)
+    try:
+        if not tokens.redeem(get_db(), list(redeemed.items())):
+            return None, (jsonify({"response": 409, "error": "A round has already been answered"}), 409)
+    except sqlite3.Error:
+        return None, (jsonify({"response": 503, "error": "Answers cannot be checked right now"}), 503)
+    return results, None
+
+
+@api.route("/game/check/<game>/<module_id>", methods=["POST"])
+@cross_origin()
+def check_answer(game, module_id):
+    """
+    Checks the answer to one round of a game.
+
+    Note:
+        Redeems the round's token, so the round cannot be checked or scored again, see `checked_answers()`.
+
+    Args:
+        game (str): One of 'image-date', 'higher-lower', 'chronological' and 'trivia'.
+        module_id (str): The ID of the module the round was drawn from.
+
+    Returns:
+        dict: JSON response with 'correct', True or False.
+
+    Usage:
+        POST /game/check/higher-lower/2 with {"round_token": "...", "answer": "higher"}.
+    """
+    data = request.get_json(silent=True)
+    results, error = checked_answers(game, module_id, [data])
+    if error is not None:
+        return error
+    return jsonify({"correct": results[0]})
+
+
+@api.route("/scores/<game>/<module_id>", methods=["POST"])
+@cross_origin()
+def submit_score(game, module_id):
+    """
+    Checks the answers of a played game and records its score.
+
+    Note:
+        The score is the number of correct answers, counted by the server. It is queued in the `ScoreBuffer`
+        and written to the database within `SCORE_FLUSH_INTERVAL` seconds, and it is on this worker's leaderboard
+        at once.
+
+    Args:
+        game (str): One of 'image-date', 'higher-lower', 'chronological' and 'trivia'.
+        module_id (str): The ID of the module the rounds were drawn from.
+
+    Returns:
+        dict: JSON response with the 'score', the number of 'rounds', 'correct' (True or False per answer) and the
+        'rank' on the leaderboard, or null if the score did not make it.
+
+    Usage:
+        POST /scores/trivia/2 with {"player": "ana", "answers": [{"round_token": "...", "answer": "Paris"}, ...]}.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"response": 400, "error": "Expected a JSON object"}), 400
+    player = data.get("player")
+    if not isinstance(player, str) or not 1 <= len(player.strip()) <= PLAYER_MAX_LENGTH:
+        return jsonify({"response": 400, "error": f"player must be 1 to {PLAYER_MAX_LENGTH} characters"}), 400
+    results, error = checked_answers(game, module_id, data.get("answers"))
+    if error is not None:
+        return error
+    buffer = current_app.extensions['scores']
+    leaderboards = current_app.extensions['leaderboards']
+    leaderboards.top(get_cursor(), game, module_id, buffer.pending())
+    score = Score(int(module_id), game, player.strip(), sum(results), len(results), time.time())
+    try:
+        buffer.add(score)
+    except sqlite3.Error:
+        return jsonify({"response": 503, "error": "Scores cannot be saved right now"}), 503
+    return jsonify({"response": 200, "score": score.score, "rounds": score.rounds, "correct": results,
+                    "rank": leaderboards.record(score)})
+
+
+@api.route("/leaderboard/<game>/<module_id>", methods=["GET"])
+@cross_origin()
+def leaderboard(game, module_id):
+    """
+    Retrieves the best scores of a game in a module.
+
+    Note:
+        Served from memory; see `Leaderboards`. '?limit=' caps the number of scores (default and maximum
+        `LEADERBOARD_SIZE`).
+
+    Args:
+        game (str): One of 'image-date', 'higher-lower', 'chronological' and 'trivia'.
+        module_id (str): The ID of the module.
+
+    Returns:
+        dict: JSON response with 'game', 'module_id' and a list of 'scores', each with 'rank', 'player', 'score',
+        'rounds' and 'created_at' (Unix time) keys, best first.
+
+    Usage:
+        GET /leaderboard/trivia/2?limit=5
+    """
+    if game not in games.CHECKS:
+        return jsonify({"response": 404, "error": f"No leaderboard for {game}"}), 404
+    leaderboards = current_app.extensions['leaderboards']
+    limit = request.args.get("limit", leaderboards.size, type=int)
+    if not 1 <= limit <= leaderboards.size:
+        return jsonify({"response": 400, "error": f"limit must be between 1 and {leaderboards.size}"}), 400
+    scores = leaderboards.top(get_cursor(), game, module_id, current_app.extensions['scores'].pending())
+    return jsonify({"game": game, "module_id": module_id,
+                    "scores": [score_json(rank, score) for rank, score in enumerate(scores[:limit], start=1)]})
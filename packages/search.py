@@ -0,0 +1,122 @@
+import heapq
+import re
+
+from flask import Blueprint, current_app, request, jsonify, url_for
+from flask_cors import cross_origin
+
+from packages.backend import get_cursor
+
+TOKEN = re.compile(r"\w+")
+SNIPPET_TOKENS = 12
+SEARCHES = {
+    "event": ("SELECT 'event', event.event_id, event.fk_module_id, event.event_title, event.event_date, "
+              "snippet(event_fts, -1, '<mark>', '</mark>', '…', ?), event_fts.rank "
+              "FROM event_fts JOIN event ON event.event_id = event_fts.rowid WHERE event_fts MATCH ?"),
+    "question": ("SELECT 'question', questions.question_id, questions.fk_module_id, questions.question, NULL, "
+                 "snippet(questions_fts, 0, '<mark>', '</mark>', '…', ?), questions_fts.rank "
+                 "FROM questions_fts JOIN questions ON questions.question_id = questions_fts.rowid "
+                 "WHERE questions_fts MATCH ?"),
+}
+MODULE_CONDITIONS = {"event": " AND event.fk_module_id = ?", "question": " AND questions.fk_module_id = ?"}
+
+api = Blueprint("search", __name__)
+
+
+def match_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query that matches rows containing every word.
+
+    Note:
+        Each word is quoted, so FTS5 operators and punctuation in the input are taken literally and never cause a
+        syntax error. The last word is matched as a prefix, so results appear while the user is still typing.
+
+    Args:
+        text (str): The search text, for example 'battle of grun'.
+
+    Returns:
+        str: The FTS5 query, for example '"battle" "of" "grun"*'.
+
+    Raises:
+        ValueError: If the text contains no word.
+    """
+    words = TOKEN.findall(text)
+    if not words:
+        raise ValueError("The search text must contain at least one word")
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+def search(cur, text: str, module_id=None, types=("event", "question"), limit=20, offset=0) -> list:
+    """
+    Searches event titles, event descriptions and questions, best match first.
+
+    Note:
+        Every type is queried separately in FTS5's own rank order (bm25, with event titles weighted ten times
+        their descriptions), and the sorted results are merged, so no query has to sort its matches itself.
+        Module 1 (Global History) searches every module, like '/timeline/1'.
+
+    Args:
+        cur (sqlite3.Cursor): The cursor to query with.
+        text (str): The search text, see `match_query()`.
+        module_id (str): Search only this module.
+        types (tuple): 'event' and/or 'question'.
+        limit (int): Maximum number of results.
+        offset (int): Number of results to skip.
+
+    Returns:
+        list: Result dictionaries with 'type', 'id', 'module_id', 'title' (the question for questions), 'date'
+        (None for questions), 'snippet' (matches wrapped in '<mark>') and 'rank' (lower is better) keys.
+
+    Raises:
+        ValueError: If the text contains no word.
+    """
+    query = match_query(text)
+    results = []
+    for result_type in types:
+        sql = SEARCHES[result_type]
+        params = [SNIPPET_TOKENS, query]
+        if module_id is not None and str(module_id) != "1":
+            sql += MODULE_CONDITIONS[result_type]
+            params.append(module_id)
+        cur.execute(f"{sql} ORDER BY rank LIMIT ?", params + [offset + limit])
+        results.append(cur.fetchall())
+    merged = list(heapq.merge(*results, key=lambda row: row[6]))[offset:offset + limit]
+    return [{"type": row[0], "id": row[1], "module_id": row[2], "title": row[3], "date": row[4], "snippet": row[5],
+             "rank": row[6]} for row in merged]
+
+
+@api.route("/search", methods=["GET"])
+@cross_origin()
+def search_route():
+    """
+    Searches events and questions with the SQLite FTS5 indexes.
+
+    Note:
+        '?q=' is the search text; every word must match and the last one may be a prefix. '?module_id=' limits the
+        search to one module and '?type=event' or '?type=question' to one kind of result. Results are ranked with
+        bm25 and paginated with '?limit=' (default 20, at most `PAGE_SIZE_MAX`) and '?offset='; when more results
+        follow, the response carries a 'Link: <...>; rel="next"' header.
+
+    Returns:
+        list: JSON response with the results of `search()`.
+
+    Usage:
+        GET /search?q=grunwald&module_id=2
+    """
+    types = request.args.get("type")
+    try:
+        limit = request.args.get("limit", 20, type=int)
+        offset = request.args.get("offset", 0, type=int)
+        if not 1 <= limit <= current_app.config['PAGE_SIZE_MAX'] or offset < 0:
+            raise ValueError("Invalid limit or offset")
+        if types not in (None, "event", "question"):
+            raise ValueError(f"Invalid type: {types!r}")
+        results = search(get_cursor(), request.args.get("q", ""), request.args.get("module_id"),
+                         ("event", "question") if types is None else (types,), limit + 1, offset)
+    except ValueError as error:
+        return jsonify({"response": 400, "error": str(error)}), 400
+    response = jsonify(results[:limit])
+    if len(results) > limit:
+        args = request.args.to_dict()
+        args.update(offset=offset + limit, limit=limit)
+        response.headers["Link"] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
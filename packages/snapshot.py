@@ -0,0 +1,374 @@
+import array
+import bisect
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+
+from flask import current_app
+
+from packages import questions as question_store
+from packages.questions import Question
+from packages.sampling import rng
+
+MAGIC = b"BNBSNAP\0"
+FORMAT_VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+HEADER = struct.Struct("=8sIII")
+SECTION = struct.Struct("=31scQQ")
+ALIGNMENT = 8
+
+# String columns: one 'I' section of n + 1 offsets into the shared 'heap' section per column.
+MODULE_STRINGS = ("modules.title", "modules.image_url", "modules.description")
+EVENT_STRINGS = ("events.date", "events.title", "events.image_url", "events.description")
+
+
+class SnapshotWriter:
+    """
+    Collects the sections of a snapshot file and writes them out atomically.
+    """
+
+    def __init__(self):
+        self.sections = {}
+        self.heap = bytearray()
+
+    def column(self, name: str, typecode: str, values):
+        self.sections[name] = array.array(typecode, values)
+
+    def strings(self, name: str, values):
+        offsets = array.array("I", [len(self.heap)])
+        for value in values:
+            self.heap += value.encode("utf-8")
+            offsets.append(len(self.heap))
+        self.sections[name] = offsets
+
+    def write(self, path: str):
+        """
+        Writes the snapshot to a temporary file next to `path`, then renames it over `path`.
+
+        Note:
+            The rename is atomic, so a reader sees either the previous snapshot or the complete new one. Processes
+            that still map the previous file keep reading it until they switch.
+        """
+        if len(self.heap) >= 2 ** 32:
+            raise ValueError("The snapshot's strings exceed 4 GiB")
+        sections = dict(self.sections, heap=array.array("B", self.heap))
+        offset = HEADER.size + SECTION.size * len(sections)
+        directory = []
+        for name, values in sections.items():
+            offset += -offset % ALIGNMENT
+            directory.append((name, values, offset))
+            offset += len(values) * values.itemsize
+        fd, temporary = tempfile.mkstemp(prefix=".snapshot-", dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK, len(sections)))
+                for name, values, start in directory:
+                    f.write(SECTION.pack(name.encode("ascii"), values.typecode.encode("ascii"), start,
+                                         len(values) * values.itemsize))
+                for name, values, start in directory:
+                    f.write(b"\0" * (start - f.tell()))
+                    values.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+
+def compile_snapshot(db: sqlite3.Connection, path: str) -> dict:
+    """
+    Exports modules, events and questions into a compact, read-only snapshot file.
+
+    Note:
+        The file is columnar: every field is one packed array, and strings are offsets into a shared UTF-8 heap.
+        Events are stored grouped by module and sorted by date key, so a module's timeline is a contiguous slice;
+        questions are grouped by module and sorted by ID. Permutation arrays sorted by ID, by ID within each
+        module, and by date key across modules serve the remaining lookups with a binary search. The arrays use
+        the native byte order of the machine that compiles the file.
+
+    Args:
+        db (sqlite3.Connection): The database to export.
+        path (str): The snapshot file to create or replace.
+
+    Returns:
+        dict: The number of 'modules', 'events' and 'questions' written.
+
+    Usage:
+        Run `flask --app packages snapshot-compile` after publishing content, see `readonly.compile_command()`.
+    """
+    cur = db.cursor()
+    writer = SnapshotWriter()
+    cur.execute("SELECT module_id, module_title, module_image_url, module_description FROM modules "
+                "ORDER BY module_id")
+    modules = cur.fetchall()
+    writer.column("modules.id", "q", [module[0] for module in modules])
+    for index, name in enumerate(MODULE_STRINGS, start=1):
+        writer.strings(name, [module[index] or "" for module in modules])
+
+    cur.execute("SELECT event_id, fk_module_id, event_date, event_title, event_image_url, event_description, "
+                "event_date_key FROM event ORDER BY fk_module_id, event_date_key, event_id")
+    events = cur.fetchall()
+    writer.column("events.id", "q", [event[0] for event in events])
+    writer.column("events.module_id", "q", [event[1] for event in events])
+    writer.column("events.date_key", "q", [event[6] for event in events])
+    for index, name in enumerate(EVENT_STRINGS, start=2):
+        writer.strings(name, [event[index] or "" for event in events])
+    positions = range(len(events))
+    writer.column("events.by_id", "I", sorted(positions, key=lambda position: events[position][0]))
+    writer.column("events.module_by_id", "I", sorted(positions, key=lambda position: (events[position][1],
+                                                                                      events[position][0])))
+    writer.column("events.timeline", "I", sorted(positions, key=lambda position: (events[position][6],
+                                                                                  events[position][0])))
+
+    questions = sorted(question_store.read_questions(cur, "1", ()), key=lambda question: (question.module_id,
+                                                                                        question.id))
+    writer.column("questions.id", "q", [question.id for question in questions])
+    writer.column("questions.module_id", "q", [question.module_id for question in questions])
+    writer.strings("questions.text", [question.question for question in questions])
+    answer_starts = [0]
+    for question in questions:
+        answer_starts.append(answer_starts[-1] + len(question.answers))
+    writer.column("questions.answers", "I", answer_starts)
+    writer.column("questions.correct", "i", [question.answers.index(question.correct_answer)
+                                             if question.correct_answer in question.answers else -1
+                                             for question in questions])
+    writer.column("questions.by_id", "I", sorted(range(len(questions)), key=lambda position: questions[position].id))
+    writer.strings("answers.text", [answer for question in questions for answer in question.answers])
+    writer.write(path)
+    return {"modules": len(modules), "events": len(events), "questions": len(questions)}
+
+
+class Snapshot:
+    """
+    A read-only, memory-mapped view of a snapshot file written by `compile_snapshot()`.
+
+    Note:
+        Nothing is copied when the file is opened: every section is a typed `memoryview` over one shared mapping,
+        so worker processes that map the same file share its pages through the OS page cache. Rows are decoded
+        only when a response needs them, in the same shapes the SQL queries return.
+
+    Args:
+        path (str): The snapshot file.
+
+    Raises:
+        ValueError: If the file is not a snapshot, or was written by another format version or byte order.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, byte_order, count = HEADER.unpack_from(view)
+        if magic != MAGIC or version != FORMAT_VERSION or byte_order != BYTE_ORDER_MARK:
+            raise ValueError(f"Not a compatible snapshot file: {path}")
+        self._sections = {}
+        for index in range(count):
+            name, typecode, offset, length = SECTION.unpack_from(view, HEADER.size + SECTION.size * index)
+            self._sections[name.rstrip(b"\0").decode("ascii")] = view[offset:offset + length].cast(typecode.decode())
+        self.heap = self._sections["heap"]
+        self.module_ids = self._sections["modules.id"]
+        self.event_ids = self._sections["events.id"]
+        self.event_modules = self._sections["events.module_id"]
+        self.date_keys = self._sections["events.date_key"]
+        self.question_ids = self._sections["questions.id"]
+        self.question_modules = self._sections["questions.module_id"]
+        self.samplers = {"events": SnapshotSampler(self, "events"), "questions": SnapshotSampler(self, "questions")}
+
+    def identity(self) -> tuple:
+        """
+        Returns the (device, inode, modification time, size) of the mapped file.
+        """
+        return self.stat.st_dev, self.stat.st_ino, self.stat.st_mtime_ns, self.stat.st_size
+
+    def string(self, column: str, index: int) -> str:
+        offsets = self._sections[column]
+        return str(self.heap[offsets[index]:offsets[index + 1]], "utf-8")
+
+    def module_row(self, index: int) -> tuple:
+        """
+        Returns a module as (module_id, title, image_url, description), like 'SELECT * FROM modules'.
+        """
+        return (self.module_ids[index],) + tuple(self.string(name, index) for name in MODULE_STRINGS)
+
+    def event_row(self, index: int) -> tuple:
+        """
+        Returns an event in the column order of 'SELECT * FROM event', date key last.
+        """
+        return ((self.event_ids[index], self.event_modules[index])
+                + tuple(self.string(name, index) for name in EVENT_STRINGS) + (self.date_keys[index],))
+
+    def question_row(self, index: int) -> Question:
+        """
+        Returns a question as a `questions.Question`.
+        """
+        starts = self._sections["questions.answers"]
+        answers = tuple(self.string("answers.text", answer) for answer in range(starts[index], starts[index + 1]))
+        correct = self._sections["questions.correct"][index]
+        return Question(self.question_ids[index], self.question_modules[index],
+                        self.string("questions.text", index), answers, answers[correct] if correct >= 0 else None)
+
+    def module_index(self, module_id) -> int:
+        """
+        Returns the position of a module, or None if it does not exist.
+        """
+        return self._find(range(len(self.module_ids)), self.module_ids, module_id)
+
+    def event_index(self, event_id) -> int:
+        """
+        Returns the position of an event, or None if it does not exist.
+        """
+        return self._find(self._sections["events.by_id"], self.event_ids, event_id)
+
+    def question_index(self, question_id) -> int:
+        """
+        Returns the position of a question, or None if it does not exist.
+        """
+        return self._find(self._sections["questions.by_id"], self.question_ids, question_id)
+
+    def module_events(self, module_id) -> range:
+        """
+        Returns the positions of a module's events, which are sorted by date key.
+        """
+        return self._module_range(self.event_modules, module_id)
+
+    def module_questions(self, module_id) -> range:
+        """
+        Returns the positions of a module's questions, which are sorted by ID.
+        """
+        return self._module_range(self.question_modules, module_id)
+
+    def timeline(self):
+        """
+        Returns the positions of every event sorted by date key, then ID.
+        """
+        return self._sections["events.timeline"]
+
+    def module_events_by_id(self, module_id):
+        """
+        Returns the positions of a module's events sorted by ID.
+        """
+        positions = self.module_events(module_id)
+        return self._sections["events.module_by_id"][positions.start:positions.stop]
+
+    @staticmethod
+    def _module_range(modules, module_id) -> range:
+        try:
+            module_id = int(module_id)
+        except (TypeError, ValueError):
+            return range(0)
+        return range(bisect.bisect_left(modules, module_id), bisect.bisect_right(modules, module_id))
+
+    @staticmethod
+    def _find(positions, ids, row_id) -> int:
+        try:
+            row_id = int(row_id)
+        except (TypeError, ValueError):
+            return None
+        index = bisect.bisect_left(positions, row_id, key=lambda position: ids[position])
+        if index < len(positions) and ids[positions[index]] == row_id:
+            return positions[index]
+        return None
+
+
+class SnapshotSampler:
+    """
+    Draws the rows of game rounds from a snapshot, with the interface of `sampling.IdSampler`.
+
+    Note:
+        The cursor arguments are ignored; a module's rows are a contiguous range of the snapshot, so a draw is a
+        random sample of positions and needs no ID cache.
+
+    Args:
+        snapshot (Snapshot): The snapshot to draw from.
+        source (str): 'events' or 'questions', see `games.new_samplers()`.
+    """
+
+    def __init__(self, snapshot: Snapshot, source: str):
+        self.snapshot = snapshot
+        if source == "events":
+            self._positions, self._index, self._row = (snapshot.module_events, snapshot.event_index,
+                                                       snapshot.event_row)
+            self._ids = snapshot.event_ids
+        else:
+            self._positions, self._index, self._row = (snapshot.module_questions, snapshot.question_index,
+                                                       snapshot.question_row)
+            self._ids = snapshot.question_ids
+
+    def ids(self, cur, module_id) -> list:
+        positions = self._positions(module_id)
+        return list(self._ids[positions.start:positions.stop])
+
+    def fetch(self, cur, ids: list) -> list:
+        indexes = [self._index(row_id) for row_id in ids]
+        return [self._row(index) for index in indexes if index is not None]
+
+    def sample_rows(self, cur, module_id, k: int) -> list:
+        positions = self._positions(module_id)
+        return [self._row(index) for index in rng.sample(positions, min(k, len(positions)))]
+
+
+class SnapshotStore:
+    """
+    Holds the current snapshot of a process and swaps in a newly published file.
+
+    Note:
+        At most every `check_interval` seconds, `get()` compares the file at `path` with the mapped one. After
+        `compile_snapshot()` has renamed a new file into place, the next check maps it and later requests use
+        it; requests that already hold the previous snapshot finish on it, and its mapping is released once no
+        request references it.
+
+    Args:
+        path (str): The snapshot file.
+        check_interval (float): Seconds between checks for a new file. 0 checks on every call.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['snapshot']` when `SNAPSHOT_PATH` is set; use `get_snapshot()`.
+    """
+
+    def __init__(self, path: str, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Snapshot:
+        """
+        Returns the current snapshot, mapping the published file if it changed.
+
+        Raises:
+            FileNotFoundError: If no snapshot has been published yet.
+        """
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked < self.check_interval:
+            return snapshot
+        with self._lock:
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self._snapshot is None:
+                    raise
+                return self._snapshot
+            identity = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._snapshot is None or self._snapshot.identity() != identity:
+                self._snapshot = Snapshot(self.path)
+            return self._snapshot
+
+
+def get_snapshot() -> Snapshot:
+    """
+    Returns the application's current snapshot, or None when the API is not in read-only mode.
+
+    Raises:
+        FileNotFoundError: In read-only mode, if no snapshot has been published yet.
+    """
+    store = current_app.extensions.get('snapshot')
+    return store.get() if store is not None else None
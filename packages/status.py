@@ -0,0 +1,61 @@
+import sqlite3
+
+from flask import Blueprint, jsonify
+from flask_cors import cross_origin
+
+from packages.backend import get_db, get_pool, get_response_cache
+
+api = Blueprint("status", __name__)
+
+
+@api.route("/ready", methods=["GET"])
+@cross_origin()
+def ready():
+    """
+    Reports whether this worker can serve requests.
+
+    Note:
+        The check borrows a pooled connection and runs `SELECT 1`. It reads no table and never runs `init_db()` or
+        migrations, so load balancers can poll it cheaply while a deploy is in progress.
+
+    Returns:
+        dict: JSON response with status 200 when a database connection is available, 503 otherwise.
+
+    Usage:
+        Use as the readiness probe of the load balancer or orchestrator.
+    """
+    try:
+        get_db().execute("SELECT 1").fetchone()
+    except sqlite3.Error as error:
+        return jsonify({"response": 503, "error": str(error)}), 503
+    return jsonify({"response": 200, "status": "ready"})
+
+
+@api.route("/pool", methods=["GET"])
+@cross_origin()
+def pool_metrics():
+    """
+    Returns the connection pool's gauges and counters.
+
+    Returns:
+        dict: JSON response with the output of `ConnectionPool.metrics()`.
+
+    Usage:
+        Poll this endpoint to watch pool saturation ('in_use' close to 'size', growing 'timeouts').
+    """
+    return jsonify(get_pool().metrics())
+
+
+@api.route("/cache", methods=["GET"])
+@cross_origin()
+def cache_metrics():
+    """
+    Returns the response cache's gauges and counters.
+
+    Returns:
+        dict: JSON response with the output of `ResponseCache.metrics()`.
+
+    Usage:
+        Poll this endpoint to check the cache hit ratio.
+    """
+    return jsonify(get_response_cache().metrics())
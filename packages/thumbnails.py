@@ -0,0 +1,436 @@
+import collections
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+import zlib
+
+from flask import Blueprint, current_app, request, jsonify, redirect, url_for
+from flask_cors import cross_origin
+
+from packages.snapshot import get_snapshot
+
+# Longest side of a thumbnail in pixels. Other sizes are redirected to the next larger one.
+SIZES = (160, 320, 640)
+GAME_SIZE = 320
+# Most images hinted in one 'Link' header, which keeps the header well below common 8 KiB limits.
+PREFETCH_LIMIT = 16
+# Part of every cache key, so a change to the encoding never serves thumbnails made the old way.
+ENCODER_VERSION = 1
+QUALITY = 80
+CONTENT_TYPES = {"webp": "image/webp", "jpg": "image/jpeg", "png": "image/png", "gif": "image/gif"}
+SIGNATURES = ((b"\x89PNG\r\n\x1a\n", "png"), (b"\xff\xd8\xff", "jpg"), (b"GIF87a", "gif"), (b"GIF89a", "gif"))
+
+api = Blueprint("thumbnails", __name__)
+
+
+class UnsupportedImage(ValueError):
+    """
+    Raised for a source that is not a PNG, JPEG, GIF or WebP image, or when no encoder is installed.
+    """
+
+
+class ThumbnailCache:
+    """
+    A size-bounded directory of encoded thumbnails, evicted least recently used first.
+
+    Note:
+        Each entry is one file named by `key()`, a SHA-256 digest of the source URL, the thumbnail size and
+        `ENCODER_VERSION`, which together determine its content, followed by the image format as extension. The
+        digest doubles as the entry's entity tag. Files are written under a temporary name and renamed into place,
+        so readers never see a partial thumbnail and the worker processes can share one directory. A hit touches
+        the file's modification time, and the index is rebuilt from the directory oldest first on startup, so
+        the recency order survives restarts. Each process indexes the files it has written or read; files written
+        by other workers join the index on first use, so `max_bytes` is enforced approximately across processes.
+
+    Args:
+        directory (str): Where thumbnails are stored. Created when missing.
+        max_bytes (int): Total size above which the least recently used entries are deleted.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['thumbnails']`; see `thumbnail()`.
+    """
+
+    def __init__(self, directory: str, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            key, dot, extension = entry.name.partition(".")
+            if dot and extension in CONTENT_TYPES and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, key, extension, stat.st_size))
+        for _, key, extension, size in sorted(files):
+            self._entries[key] = (extension, size)
+            self._bytes += size
+
+    @staticmethod
+    def key(url: str, size: int) -> str:
+        return hashlib.sha256(f"{ENCODER_VERSION}\n{size}\n{url}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key: str):
+        """
+        Returns the image format and content of an entry, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        extensions = [entry[0]] if entry is not None else CONTENT_TYPES
+        for extension in extensions:
+            path = self._path(key, extension)
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (extension, len(content))
+                    self._bytes += len(content)
+                self._stats["hits"] += 1
+            return extension, content
+        with self._lock:
+            if key in self._entries:
+                # Evicted by another worker process.
+                self._bytes -= self._entries.pop(key)[1]
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, extension: str, content: bytes):
+        """
+        Stores an entry, then deletes least recently used entries until the cache fits in `max_bytes`.
+        """
+        fd, temporary = tempfile.mkstemp(prefix=".thumbnail-", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temporary, self._path(key, extension))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (extension, len(content))
+            self._bytes += len(content)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (old_extension, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._stats["evictions"] += 1
+                evicted.append(self._path(old_key, old_extension))
+        for path in evicted:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def metrics(self) -> dict:
+        """
+        Returns a snapshot of the cache's counters.
+
+        Returns:
+            dict: 'entries', 'bytes' and 'max_bytes' gauges plus cumulative 'hits', 'misses' and 'evictions'
+            counters.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, **self._stats}
+
+
+def is_public(address: str) -> bool:
+    """
+    Tells whether an IP address is globally routable: not loopback, private, link-local, shared, reserved or
+    multicast. IPv4 addresses mapped into IPv6 are judged as IPv4.
+    """
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def public_connection(address: tuple, timeout=None, source_address=None) -> socket.socket:
+    """
+    Like `socket.create_connection()`, but only connects to public addresses, see `is_public()`.
+
+    Note:
+        The host name is resolved here and the socket connects to the checked address itself, so a DNS answer that
+        changes between a check and the connection cannot point a download at an internal service.
+
+    Raises:
+        OSError: If the host has no public address, or none of them accepts the connection.
+    """
+    host, port = address
+    error = OSError(f"{host} has no public address")
+    for family, kind, protocol, _, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        if not is_public(sockaddr[0]):
+            continue
+        sock = socket.socket(family, kind, protocol)
+        try:
+            if timeout is not None:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as connect_error:
+            sock.close()
+            error = connect_error
+    raise error
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = public_connection
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = public_connection
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+# Downloads source images. Every connection, including those of redirects, goes to a public address, and
+# proxies from the environment are ignored, since a proxy would make the connection on our behalf unchecked.
+opener = urllib.request.build_opener(urllib.request.ProxyHandler({}), PublicHTTPHandler, PublicHTTPSHandler)
+
+
+def fetch_url(url: str) -> bytes:
+    """
+    Downloads a source image, the default `IMAGE_FETCHER`.
+
+    Note:
+        Image URLs can be set by any client, so downloads must not reach the server's own network: only public
+        addresses are connected to, see `opener`, and only responses with an image 'Content-Type' are read.
+        URLs under the app's static path, such as '/static/images/earth.png', are read from the static folder.
+        Downloads are limited to `THUMBNAIL_FETCH_TIMEOUT` seconds and `THUMBNAIL_MAX_SOURCE_BYTES` bytes.
+
+    Raises:
+        OSError: If the image cannot be read, is too large, or its host has no public address.
+        UnsupportedImage: If the response is not an image.
+    """
+    if url.startswith(current_app.static_url_path + "/"):
+        path = os.path.normpath(os.path.join(current_app.static_folder, url[len(current_app.static_url_path) + 1:]))
+        if not path.startswith(os.path.abspath(current_app.static_folder) + os.sep):
+            raise OSError(f"Not a static file: {url}")
+        with open(path, "rb") as f:
+            return f.read()
+    if urllib.parse.urlsplit(url).scheme not in ("http", "https"):
+        raise OSError(f"Unsupported image URL: {url}")
+    limit = current_app.config['THUMBNAIL_MAX_SOURCE_BYTES']
+    with opener.open(urllib.request.Request(url, headers={"User-Agent": "bitnbuild-thumbnails"}),
+                     timeout=current_app.config['THUMBNAIL_FETCH_TIMEOUT']) as response:
+        content_type = response.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            raise UnsupportedImage(f"{url} is {content_type or 'untyped'}, not an image")
+        content = response.read(limit + 1)
+    if len(content) > limit:
+        raise OSError(f"Image larger than {limit} bytes: {url}")
+    return content
+
+
+def directory_fetcher(directory: str):
+    """
+    Returns an `IMAGE_FETCHER` that reads every image from a local directory instead of downloading it.
+
+    Note:
+        The file is looked up by the last path segment of the URL, so
+        'https://upload.wikimedia.org/.../Mieszko1.jpg' reads '<directory>/Mieszko1.jpg'. Other URLs get one of
+        the directory's files, always the same one for the same URL, so any database can be served offline.
+        Meant for tests, benchmarks and offline development.
+
+    Usage:
+        create_app({'IMAGE_FETCHER': directory_fetcher('static/images')})
+    """
+    files = sorted(name for name in os.listdir(directory) if os.path.isfile(os.path.join(directory, name)))
+
+    def fetch(url: str) -> bytes:
+        name = os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(url).path))
+        if name not in files:
+            name = files[zlib.crc32(url.encode("utf-8")) % len(files)]
+        with open(os.path.join(directory, name), "rb") as f:
+            return f.read()
+    return fetch
+
+
+def sniff(content: bytes):
+    """
+    Returns the `CONTENT_TYPES` extension of an image from its leading bytes, or None if it is not a known image.
+    """
+    for signature, extension in SIGNATURES:
+        if content.startswith(signature):
+            return extension
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def encode(content: bytes, size: int) -> tuple:
+    """
+    Scales an image down so its longest side is at most `size` pixels and re-encodes it.
+
+    Note:
+        Thumbnails are WebP when Pillow supports it and JPEG otherwise; images are never scaled up. JPEG sources
+        are decoded at a reduced scale (`Image.draft()`), which skips most of the decoding work for large photos.
+        Only content whose leading bytes are a PNG, JPEG, GIF or WebP signature is decoded, and the source bytes are
+        never served as they are. Pillow is imported on first use, so workers that never make a thumbnail do not
+        load it.
+
+    Returns:
+        tuple: (extension, encoded bytes).
+
+    Raises:
+        UnsupportedImage: If the content is not an image, or Pillow is not installed.
+    """
+    if sniff(content) is None:
+        raise UnsupportedImage("Not a PNG, JPEG, GIF or WebP image")
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:
+        raise UnsupportedImage("Pillow is not installed") from None
+    with Image.open(io.BytesIO(content)) as image:
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        if features.check("webp"):
+            image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB").save(
+                output, "WEBP", quality=QUALITY, method=4)
+            return "webp", output.getvalue()
+        image.convert("RGB").save(output, "JPEG", quality=QUALITY, optimize=True, progressive=True)
+        return "jpg", output.getvalue()
+
+
+def thumbnail_path(kind: str, row_id, size=GAME_SIZE) -> str:
+    """
+    Returns the path of a thumbnail, for example '/thumbnails/event/12/320'.
+
+    Note:
+        Game rounds are rendered outside of requests by the round pool, so the path is built without `url_for()`.
+    """
+    return f"/thumbnails/{kind}/{row_id}/{size}"
+
+
+def prefetch_links(paths) -> str:
+    """
+    Returns a 'Link' header value that asks browsers to prefetch the first `PREFETCH_LIMIT` distinct images, or an
+    empty string for no paths.
+    """
+    distinct = []
+    for path in paths:
+        if len(distinct) == PREFETCH_LIMIT:
+            break
+        if path not in distinct:
+            distinct.append(path)
+    return ", ".join(f"<{path}>; rel=prefetch; as=image" for path in distinct)
+
+
+def image_url(kind: str, row_id: str):
+    """
+    Returns the source image URL of an event or module, read from the snapshot in read-only mode.
+
+    Raises:
+        FileNotFoundError: In read-only mode, if no snapshot has been published yet.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        if kind == "event":
+            index = snapshot.event_index(row_id)
+            return None if index is None else snapshot.event_row(index)[4]
+        index = snapshot.module_index(row_id)
+        return None if index is None else snapshot.module_row(index)[2]
+    from packages.backend import get_cursor
+
+    cur = get_cursor()
+    if kind == "event":
+        cur.execute("SELECT event_image_url FROM event WHERE event_id = ?", (row_id,))
+    else:
+        cur.execute("SELECT module_image_url FROM modules WHERE module_id = ?", (row_id,))
+    row = cur.fetchone()
+    return None if row is None else row[0]
+
+
+@api.route("/thumbnails/<any(event, module):kind>/<row_id>/<int:size>", methods=["GET"])
+@cross_origin()
+def thumbnail(kind, row_id, size):
+    """
+    Returns a scaled-down, re-encoded copy of an event's or a module's image.
+
+    Note:
+        Sizes are bucketed: a size that is not in `SIZES` is redirected to the next larger one, or to the largest.
+        Thumbnails are made on first request with the `IMAGE_FETCHER` and `encode()`, then served from the
+        `ThumbnailCache`. Responses carry the cache key as a strong 'ETag' and may be cached by clients for
+        `THUMBNAIL_MAX_AGE` seconds. When the row's image URL changes, so does the key, and the old thumbnail ages
+        out of the cache.
+
+    Args:
+        kind (str): 'event' or 'module'.
+        row_id (str): The ID of the event or module.
+        size (int): The longest side of the thumbnail in pixels.
+
+    Returns:
+        Response: The image, 404 for an unknown row, 415 if the source is not an image or Pillow is not installed,
+        502 if the source image cannot be fetched or decoded, or 503 in read-only mode before a snapshot has been
+        published.
+
+    Usage:
+        GET /thumbnails/event/12/320, or follow the 'thumbnail_url' of a game round.
+    """
+    if size not in SIZES:
+        bucket = next((bucket for bucket in SIZES if bucket >= size), SIZES[-1])
+        return redirect(url_for("thumbnails.thumbnail", kind=kind, row_id=row_id, size=bucket), 308)
+    try:
+        url = image_url(kind, row_id)
+    except FileNotFoundError:
+        return jsonify({"response": 503, "error": "No snapshot has been published"}), 503
+    if not url:
+        return jsonify({"response": 404, "error": f"No image for {kind} {row_id}"}), 404
+    cache = current_app.extensions['thumbnails']
+    key = ThumbnailCache.key(url, size)
+    if request.if_none_match.contains_weak(key):
+        response = current_app.response_class(status=304)
+    else:
+        cached = cache.get(key)
+        if cached is None:
+            fetch = current_app.config['IMAGE_FETCHER'] or fetch_url
+            try:
+                cached = encode(fetch(url), size)
+            except UnsupportedImage as error:
+                current_app.logger.warning("Thumbnail of %s refused: %s", url, error)
+                return jsonify({"response": 415, "error": f"Cannot make a thumbnail of {url}: {error}"}), 415
+            except Exception as error:
+                current_app.logger.warning("Thumbnail of %s failed: %s", url, error)
+                return jsonify({"response": 502, "error": f"Cannot make a thumbnail of {url}"}), 502
+            cache.put(key, *cached)
+        extension, content = cached
+        response = current_app.response_class(content, mimetype=CONTENT_TYPES[extension])
+    response.set_etag(key)
+    response.headers["Cache-Control"] = f"public, max-age={current_app.config['THUMBNAIL_MAX_AGE']}"
+    return response
@@ -0,0 +1,127 @@
+import contextlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b"BNBVERS\0"
+HEADER = struct.Struct("=8sQQ")
+COUNTER = struct.Struct("=Q")
+# Reserved slots, bumped by every write to any module's rows of that kind. Module slots follow.
+MODULES, EVENTS, QUESTIONS = range(3)
+RESERVED = 3
+
+
+class VersionCounters:
+    """
+    Content version counters shared by every process of the app through a memory-mapped file.
+
+    Note:
+        The file holds a header (magic, epoch, number of slots) followed by one unsigned 64-bit counter per slot.
+        Slots `MODULES`, `EVENTS` and `QUESTIONS` change on every write to that kind of row; every other slot
+        belongs to the modules whose ID maps to it, see `module_slot()`. Two modules may share a slot, which only
+        costs the other module a spurious revalidation. Reading a counter is a plain load from the shared mapping,
+        without a lock or a system call. Increments take a thread lock and, where `fcntl` exists, an exclusive
+        lock on the file, so writes from several worker processes are never lost. Without `fcntl` the counters are
+        only consistent within one process.
+
+        The epoch is drawn at random every time the file is opened, normally once per deploy by `create_app()`
+        in the server's master process, which the workers then inherit. Versions are only compared within one
+        epoch, so a restart, a different database or a change of response format never revalidates against a
+        version from before.
+
+    Args:
+        path (str): The counters file, created when missing.
+        slots (int): Number of counters, used only when the file is created. An existing file keeps its own
+            number, so every process maps modules to the same slots.
+
+    Usage:
+        Created by `create_app()` as `app.extensions['versions']`. Call `bump()` from the write handlers and
+        `version()` from the read handlers, see `conditional.check_etag()`.
+    """
+
+    def __init__(self, path: str, slots=4096):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._file_lock():
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            header = os.read(self._fd, HEADER.size)
+            if len(header) == HEADER.size and HEADER.unpack(header)[0] == MAGIC:
+                slots = HEADER.unpack(header)[2]
+            else:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, HEADER.size + slots * COUNTER.size)
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            os.write(self._fd, HEADER.pack(MAGIC, int.from_bytes(os.urandom(8), "little"), slots))
+        self.slots = slots
+        self._map = mmap.mmap(self._fd, HEADER.size + slots * COUNTER.size)
+        self._counters = memoryview(self._map)[HEADER.size:].cast("Q")
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    @property
+    def epoch(self) -> int:
+        return HEADER.unpack_from(self._map)[1]
+
+    def module_slot(self, module_id) -> int:
+        """
+        Returns the slot of a module. IDs that are not integers, which match no rows, are hashed.
+        """
+        try:
+            number = int(module_id)
+        except ValueError:
+            number = zlib.crc32(str(module_id).encode("utf-8"))
+        return RESERVED + number % (self.slots - RESERVED)
+
+    def version(self, slot: int) -> int:
+        """
+        Returns the current value of a slot's counter.
+        """
+        return self._counters[slot]
+
+    def bump(self, *slots):
+        """
+        Increments the counters of `slots`, once each.
+        """
+        with self._file_lock():
+            for slot in set(slots):
+                self._counters[slot] += 1
+
+    def bump_all(self):
+        """
+        Increments every counter, for changes that may touch any module, such as a bulk import.
+        """
+        with self._file_lock():
+            for slot in range(self.slots):
+                self._counters[slot] += 1
+
+    def close(self):
+        self._counters.release()
+        self._map.close()
+        os.close(self._fd)
+
+
+def get_versions() -> VersionCounters:
+    """
+    Returns the application's version counters.
+    """
+    return current_app.extensions['versions']
@@ -1,4 +1,6 @@
-from packages import app
+from packages import create_app
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # Development server only; the debugger and reloader are enabled with FLASK_DEBUG=1.
+    # Use `gunicorn -c gunicorn.conf.py wsgi:app` in production.
+    create_app().run()
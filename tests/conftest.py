@@ -0,0 +1,63 @@
+import os
+import sqlite3
+
+import pytest
+
+from benchmarks.synthetic import populate
+from packages import create_app
+from packages.thumbnails import directory_fetcher
+
+IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "images")
+
+
+@pytest.fixture
+def config(tmp_path) -> dict:
+    """
+    Settings of the test application: a fresh database in a temporary directory, images read from `static/images`
+    instead of the network, and no background round producer.
+    """
+    return {"DATABASE": str(tmp_path / "app.db"), "IMAGE_FETCHER": directory_fetcher(IMAGES), "ROUND_POOL_SIZE": 0}
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    yield app
+    app.extensions['scores'].flush()
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close()
+    app.extensions['versions'].close()
+
+
+@pytest.fixture
+def worker(config):
+    """
+    A second application on the same database and version counters, standing in for another worker process.
+    """
+    app = create_app(config)
+    yield app
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close()
+    app.extensions['versions'].close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def dataset(app) -> dict:
+    """
+    Fills the test database with 3 synthetic modules of 60 events and 12 questions each.
+
+    Returns:
+        dict: The output of `benchmarks.synthetic.populate()`.
+    """
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        dataset = populate(db, modules=3, events_per_module=60, questions_per_module=12)
+        db.execute("ANALYZE")
+    db.close()
+    return dataset
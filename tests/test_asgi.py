@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from packages import create_app
+from packages.asgi import GameApp
+
+
+def get(app: GameApp, path: str) -> tuple:
+    """
+    Sends one GET request through the ASGI app.
+
+    Returns:
+        tuple: (status, body bytes).
+    """
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [],
+             "http_version": "1.1", "scheme": "http", "server": ("localhost", 80), "root_path": ""}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"], b"".join(message.get("body", b"") for message in messages[1:])
+
+
+@pytest.fixture
+def game_app(app):
+    game_app = GameApp(app)
+    yield game_app
+    game_app.executor.shutdown(wait=True)
+
+
+def test_game_number_is_validated(game_app, dataset):
+    module_id = dataset["module_ids"][0]
+
+    assert get(game_app, f"/game/image-name/{module_id}/3")[0] == 200
+    assert get(game_app, f"/game/image-name/{module_id}/0")[0] == 400
+    assert get(game_app, f"/game/image-name/{module_id}/three")[0] == 404
+
+
+def test_game_without_snapshot_is_503(config, tmp_path):
+    config["SNAPSHOT_PATH"] = str(tmp_path / "missing.snapshot")
+    app = create_app(config)
+    game_app = GameApp(app)
+    try:
+        status, body = get(game_app, "/game/higher-lower/1")
+    finally:
+        game_app.executor.shutdown(wait=True)
+        app.extensions['versions'].close()
+
+    assert status == 503
+    assert b"No snapshot" in body
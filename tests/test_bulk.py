@@ -0,0 +1,44 @@
+import json
+
+from packages.versions import MODULES
+
+
+def ndjson(*records) -> bytes:
+    return "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+
+def test_import_reports_records_of_the_wrong_type(client):
+    body = ndjson({"type": "module", "id": "m", "title": "Space", "image_url": "/static/images/earth.png",
+                   "description": "Test"},
+                  {"type": "event", "module_id": "m", "date": 1969, "title": "Moon landing", "image_url": "x",
+                   "description": "Apollo 11"},
+                  {"type": "event", "module_id": "m", "date": "1969-07-20", "title": ["Moon"], "image_url": "x",
+                   "description": "Apollo 11"},
+                  {"type": "question", "module_id": "m", "question": {"text": "?"}, "answers": ["a"],
+                   "correct_answer": "a"},
+                  {"type": "question", "module_id": "m", "question": "First?", "answers": ["a", "b"],
+                   "correct_answer": 1},
+                  {"type": "event", "module_id": ["m"], "date": "1969-07-20", "title": "Moon landing",
+                   "image_url": "x", "description": "Apollo 11"},
+                  {"type": "event", "module_id": "m", "date": "1969-07-20", "title": "Moon landing",
+                   "image_url": "x", "description": "Apollo 11"})
+
+    response = client.post("/bulk/import", data=body, content_type="application/x-ndjson")
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report["modules"], report["events"], report["questions"]) == (1, 1, 0)
+    assert [error["line"] for error in report["errors"]] == [2, 3, 4, 5, 6]
+    assert report["errors"][0]["error"] == "Fields must be strings: date"
+
+
+def test_import_command_bumps_versions(app, tmp_path):
+    path = tmp_path / "dump.ndjson"
+    path.write_bytes(ndjson({"type": "module", "title": "Space", "image_url": "x", "description": "Test"}))
+    versions = app.extensions['versions']
+    before = versions.version(MODULES)
+
+    result = app.test_cli_runner().invoke(args=["bulk-import", str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert versions.version(MODULES) > before
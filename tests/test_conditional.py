@@ -0,0 +1,64 @@
+import pytest
+
+EVENT = {"date": "1969-07-20", "title": "Moon landing", "image_url": "/static/images/earth.png",
+         "description": "Apollo 11"}
+
+
+@pytest.mark.parametrize("path", ["/modules", "/events/2", "/timeline/2?limit=5", "/questions/2", "/timeline"])
+def test_current_copy_is_not_modified(client, dataset, path):
+    first = client.get(path)
+    assert first.headers["Cache-Control"].startswith("public, max-age=")
+
+    revalidated = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+    assert revalidated.headers["ETag"] == first.headers["ETag"]
+
+
+def test_write_changes_only_its_module_tags(client, dataset):
+    tags = {path: client.get(path).headers["ETag"] for path in ["/events/2", "/events/3", "/timeline", "/modules"]}
+    client.post("/events/2", json=EVENT)
+
+    assert client.get("/events/2", headers={"If-None-Match": tags["/events/2"]}).status_code == 200
+    assert client.get("/timeline", headers={"If-None-Match": tags["/timeline"]}).status_code == 200
+    assert client.get("/events/3", headers={"If-None-Match": tags["/events/3"]}).status_code == 304
+    assert client.get("/modules", headers={"If-None-Match": tags["/modules"]}).status_code == 304
+
+
+def test_write_of_another_worker_changes_the_tag(client, worker, dataset):
+    other = worker.test_client()
+    first = other.get("/events/2")
+    client.post("/events/2", json=EVENT)
+
+    response = other.get("/events/2", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200
+    assert len(response.get_json()) == len(first.get_json()) + 1
+
+
+def test_writes_and_games_have_no_tag(client, dataset):
+    assert "ETag" not in client.post("/events/2", json=EVENT).headers
+    assert "ETag" not in client.get("/game/higher-lower/2").headers
+
+
+def test_write_removes_cached_bodies(app, client, dataset):
+    cache = app.extensions['response_cache']
+    for path in ["/events/2", "/timeline/2", "/timeline", "/timeline?buckets=decade", "/events/3"]:
+        client.get(path)
+    assert cache.metrics()["size"] == 5
+
+    client.post("/events/2", json=EVENT)
+
+    assert cache.metrics()["size"] == 1
+    assert cache.metrics()["invalidations"] == 4
+
+
+def test_write_of_another_worker_replaces_cached_bodies(client, worker, dataset):
+    cache = worker.extensions['response_cache']
+    other = worker.test_client()
+    other.get("/events/2")
+    client.post("/events/2", json=EVENT)
+
+    assert len(other.get("/events/2").get_json()) == 61
+    assert len(other.get("/events/2").get_json()) == 61
+    assert cache.metrics() | {"maxsize": None} == {"size": 1, "maxsize": None, "hits": 1, "misses": 2,
+                                                   "evictions": 0, "expirations": 0, "invalidations": 1}
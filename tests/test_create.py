@@ -0,0 +1,29 @@
+MODULE = {"title": "Space race", "image_url": "/static/images/earth.png", "description": "1957 to 1975"}
+
+
+def test_create_returns_the_new_id(client, dataset):
+    response = client.post("/modules", json=MODULE).get_json()
+
+    assert response["id"] == max(dataset["module_ids"]) + 1
+    assert client.get(f"/modules/{response['id']}").get_json()["title"] == MODULE["title"]
+
+
+def test_idempotency_key_replays_the_first_create(client, dataset):
+    headers = {"Idempotency-Key": "c0ffee"}
+    first = client.post("/modules", json=MODULE, headers=headers)
+    retry = client.post("/modules", json=MODULE, headers=headers)
+
+    assert retry.get_json()["id"] == first.get_json()["id"]
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get("/modules").get_json()) == len(dataset["module_ids"]) + 1
+
+
+def test_idempotency_key_is_scoped_to_the_path(client, dataset):
+    headers = {"Idempotency-Key": "c0ffee"}
+    module_id = client.post("/modules", json=MODULE, headers=headers).get_json()["id"]
+    event = {"date": "1969-07-20", "title": "Moon landing", "image_url": "/static/images/earth.png",
+             "description": "Apollo 11"}
+    event_id = client.post(f"/events/{module_id}", json=event, headers=headers).get_json()["id"]
+
+    assert client.get(f"/events/{module_id}").get_json() == [event_id]
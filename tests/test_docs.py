@@ -0,0 +1,31 @@
+import gzip
+import subprocess
+import sys
+
+from packages.docs import ROOT_DIR
+
+
+def test_index_renders_the_readme(client):
+    response = client.get("/")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/html"
+    assert b"codehilite" in response.data
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_index_is_compressed_and_revalidated(client):
+    plain = client.get("/")
+    compressed = client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] != plain.headers["ETag"]
+    assert client.get("/", headers={"If-None-Match": plain.headers["ETag"]}).status_code == 304
+
+
+def test_app_starts_without_rendering_imports(config):
+    settings = {"DATABASE": config["DATABASE"], "ROUND_POOL_SIZE": 0}
+    code = ("import sys; from packages import create_app; create_app({0!r}); "
+            "sys.exit(bool({{'markdown', 'pygments'}} & sys.modules.keys()))").format(settings)
+    assert subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR).returncode == 0
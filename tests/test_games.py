@@ -0,0 +1,71 @@
+import pytest
+
+from packages.backend import get_cursor
+
+
+def test_sample_clamps_k(app, dataset):
+    sampler = app.extensions['samplers']['events']
+    module_id = dataset["module_ids"][0]
+    with app.app_context():
+        assert sampler.sample(get_cursor(), module_id, -1) == []
+        assert len(sampler.sample(get_cursor(), module_id, 1000)) == 60
+
+
+@pytest.mark.parametrize("game", ["image-name", "image-date", "chronological"])
+def test_number_of_events_is_validated(client, dataset, game):
+    module_id = dataset["module_ids"][0]
+
+    assert len(client.get(f"/game/{game}/{module_id}/3").get_json()) == 3
+    assert client.get(f"/game/{game}/{module_id}/0").status_code == 400
+    assert client.get(f"/game/{game}/{module_id}/-1").status_code == 404
+    assert client.get(f"/game/{game}/{module_id}/three").status_code == 404
+
+
+def test_event_sampler_sees_writes_of_other_workers(client, worker, dataset):
+    module_id = dataset["module_ids"][0]
+    other = worker.test_client()
+    assert len(other.get(f"/game/image-name/{module_id}/100").get_json()) == 60
+
+    client.post(f"/events/{module_id}", json={"date": "1969-07-20", "title": "Moon landing",
+                                              "image_url": "/static/images/earth.png", "description": "Apollo 11"})
+
+    assert len(other.get(f"/game/image-name/{module_id}/100").get_json()) == 61
+
+
+def test_question_cache_sees_writes_of_other_workers(client, worker, dataset):
+    module_id = dataset["module_ids"][0]
+    questions = worker.extensions['samplers']['questions']
+    with worker.app_context():
+        assert len(questions.ids(get_cursor(), module_id)) == 12
+
+    client.post(f"/questions/{module_id}", json={"question": "Who landed first?", "answers": ["Armstrong", "Aldrin"],
+                                                 "correct_answer": "Armstrong"})
+
+    with worker.app_context():
+        assert len(questions.ids(get_cursor(), module_id)) == 13
+
+
+def test_session_rounds_are_distinct(client, dataset):
+    module_id = dataset["module_ids"][0]
+    session = client.get(f"/game/session/chronological/{module_id}?rounds=5&events=3").get_json()
+
+    assert session["game"] == "chronological" and len(session["rounds"]) == 5
+    assert all(len(game_round) == 3 for game_round in session["rounds"])
+    assert len({frozenset(event["event_id"] for event in game_round) for game_round in session["rounds"]}) == 5
+
+
+def test_trivia_session_is_capped_by_the_questions(client, dataset):
+    module_id = dataset["module_ids"][0]
+    rounds = client.get(f"/game/session/trivia/{module_id}?rounds=50").get_json()["rounds"]
+
+    assert len(rounds) == 12
+    assert len({game_round["question"] for game_round in rounds}) == 12
+
+
+@pytest.mark.parametrize("query, status", [("", 200), ("?rounds=3&events=2", 200), ("?rounds=0", 400),
+                                           ("?rounds=101", 400), ("?events=0", 400), ("?rounds=abc", 400),
+                                           ("?rounds=", 400), ("?events=4.5", 400), ("?rounds=-3", 400)])
+def test_session_arguments_are_validated(client, dataset, query, status):
+    module_id = dataset["module_ids"][0]
+    assert client.get(f"/game/session/image-name/{module_id}{query}").status_code == status
+    assert client.get(f"/game/session/poker/{module_id}").status_code == 404
@@ -0,0 +1,37 @@
+import re
+
+
+def metric(text: str, name: str, labels: str = "") -> float:
+    match = re.search(rf"^{re.escape(name + labels)} (\S+)$", text, re.MULTILINE)
+    assert match is not None, f"{name}{labels} not found"
+    return float(match.group(1))
+
+
+def test_requests_are_counted_by_route_rule(client, dataset):
+    for module_id in dataset["module_ids"]:
+        client.get(f"/events/{module_id}")
+    client.get("/no/such/page")
+    response = client.get("/metrics")
+    text = response.data.decode()
+
+    assert response.mimetype == "text/plain"
+    assert metric(text, "http_request_duration_seconds_count",
+                  '{route="/events/<module_id>",method="GET",status="200"}') == 3
+    assert metric(text, "http_request_duration_seconds_count", '{route="<unmatched>",method="GET",status="404"}') == 1
+
+
+def test_queries_and_gauges_are_reported(client, dataset):
+    client.get("/events/2")
+    client.get("/events/2")
+    text = client.get("/metrics").data.decode()
+
+    statement = '{statement="SELECT json_quote(event_id) FROM event WHERE fk_module_id = ? ORDER BY event_id"}'
+    assert metric(text, "sqlite_query_duration_seconds_count", statement) == 1
+    assert metric(text, "sqlite_query_rows_total", statement) == 60
+    assert metric(text, "response_cache_hits") == 1
+    assert metric(text, "db_pool_timeouts") == 0
+
+
+def test_server_timing_header(client, dataset):
+    timing = client.get("/events/2").headers["Server-Timing"]
+    assert re.fullmatch(r'sql;desc="\d+ queries";dur=[\d.]+, app;dur=[\d.]+', timing)
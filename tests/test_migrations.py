@@ -0,0 +1,72 @@
+import os
+import sqlite3
+
+import pytest
+
+from packages import create_app
+from packages.backend import ROOT_DIR
+from packages.dates import UNDATED_KEY, legacy_date_key
+
+BASE_SCHEMA = os.path.join(ROOT_DIR, "databases", "app.sql")
+LEGACY_DATES = ["1410-07-15", "1410-July-15", "25 Dec 800", "44 BC", "unknown"]
+
+
+@pytest.fixture
+def legacy_app(config):
+    """
+    An application started on a database with the base schema only, as written before migrations existed, with
+    one event per date in `LEGACY_DATES`.
+    """
+    with open(BASE_SCHEMA, encoding="utf-8") as schema, sqlite3.connect(config['DATABASE']) as db:
+        db.executescript(schema.read())
+        db.execute("INSERT INTO modules (module_title, module_image_url, module_description) VALUES ('Old', '', '')")
+        db.executemany("INSERT INTO event (fk_module_id, event_date, event_title, event_image_url, event_description) "
+                       "VALUES (1, ?, ?, '', '')", [(date, date) for date in LEGACY_DATES])
+    db.close()
+    app = create_app(config)
+    yield app
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close()
+    app.extensions['versions'].close()
+
+
+@pytest.mark.parametrize("date, key", [("1410-July-15", 14100715), ("15 July 1410", 14100715),
+                                       ("1410/7/15", 14100715), ("March 44 BC", -429699), ("c. 1200", 12000101),
+                                       ("unknown", None), ("", None)])
+def test_legacy_date_key(date, key):
+    assert legacy_date_key(date) == key
+
+
+def test_migration_keeps_malformed_dates(legacy_app, caplog):
+    with sqlite3.connect(legacy_app.config['DATABASE']) as db:
+        keys = dict(db.execute("SELECT event_date, event_date_key FROM event"))
+    db.close()
+
+    assert keys == {"1410-07-15": 14100715, "1410-July-15": 14100715, "25 Dec 800": 8001225, "44 BC": -429899,
+                    "unknown": UNDATED_KEY}
+    assert "Event 5 has an unreadable date 'unknown'" in caplog.get_records("setup")[0].getMessage()
+
+
+def test_timeline_pages_past_undated_events(legacy_app):
+    client = legacy_app.test_client()
+    assert [event["date"] for event in client.get("/timeline").get_json()] == \
+        ["unknown", "44 BC", "25 Dec 800", "1410-07-15", "1410-July-15"]
+
+    dates, url = [], "/timeline?limit=1"
+    while url is not None:
+        response = client.get(url)
+        assert response.status_code == 200
+        dates += [event["date"] for event in response.get_json()]
+        link = response.headers.get("Link")
+        url = link[1:link.index(">")] if link else None
+    assert dates == ["unknown", "44 BC", "25 Dec 800", "1410-07-15", "1410-July-15"]
+
+
+def test_undated_events_are_left_out_of_ranges_and_buckets(legacy_app):
+    client = legacy_app.test_client()
+
+    assert [event["date"] for event in client.get("/timeline?to=1000").get_json()] == ["44 BC", "25 Dec 800"]
+    assert client.get("/timeline?buckets=century").get_json() == [
+        {"start": -100, "end": -1, "count": 1}, {"start": 800, "end": 899, "count": 1},
+        {"start": 1400, "end": 1499, "count": 2}]
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+
+def test_pages_follow_the_next_link(client, dataset):
+    module_id = dataset["module_ids"][1]
+    whole = client.get(f"/timeline/{module_id}").get_json()
+
+    pages, url = [], f"/timeline/{module_id}?limit=25"
+    while url is not None:
+        response = client.get(url)
+        pages.append(response.get_json())
+        link = response.headers.get("Link")
+        url = link[1:link.index(">")] if link else None
+
+    assert [len(page) for page in pages] == [25, 25, 10]
+    assert [event for page in pages for event in page] == whole
+
+
+def test_page_cursor_header(client, dataset):
+    module_id = dataset["module_ids"][0]
+    first = client.get(f"/events/{module_id}?limit=5")
+    after = first.headers["X-Next-Cursor"]
+
+    assert first.get_json() == client.get(f"/events/{module_id}").get_json()[:5]
+    assert client.get(f"/events/{module_id}?limit=5&after={after}").get_json()[0] > first.get_json()[-1]
+
+
+@pytest.mark.parametrize("stream", ["json", "ndjson"])
+def test_stream_returns_every_row(client, dataset, stream):
+    whole = client.get("/timeline").get_json()
+    response = client.get(f"/timeline?stream={stream}")
+
+    if stream == "ndjson":
+        rows = [json.loads(line) for line in response.data.splitlines()]
+    else:
+        rows = json.loads(response.data)
+    assert response.mimetype == ("application/x-ndjson" if stream == "ndjson" else "application/json")
+    assert rows == whole
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=ten", "stream=xml", "after=bogus"])
+def test_invalid_page_arguments(client, dataset, query):
+    assert client.get(f"/timeline?{query}").status_code == 400
@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.query_plans import collect_statements, plan_problems, prepare, routes
+
+
+@pytest.fixture(scope="module")
+def large_app(tmp_path_factory) -> tuple:
+    """
+    The app on a database of the size `python -m benchmarks.query_plans` checks by default, analyzed, so the
+    planner sees statistics like those of a production database.
+
+    Returns:
+        tuple: The output of `benchmarks.query_plans.prepare()`.
+    """
+    prepared = prepare(str(tmp_path_factory.mktemp("query-plans") / "app.db"))
+    yield prepared
+    app = prepared[0]
+    app.extensions['scores'].flush()
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close()
+    app.extensions['versions'].close()
+
+
+def test_plan_problems_flags_full_scans(app):
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        assert plan_problems(db, "SELECT * FROM event WHERE event_description = 'x'")
+        assert plan_problems(db, "SELECT * FROM event WHERE fk_module_id = 1 ORDER BY event_title")
+        assert not plan_problems(db, "SELECT * FROM event WHERE fk_module_id = 1 ORDER BY event_id")
+    db.close()
+
+
+def test_routes_use_indexes(large_app):
+    app, module_id, event_id, question_id = large_app
+
+    statements = collect_statements(app, routes(module_id, event_id, question_id))
+
+    assert len(statements) > 100
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        problems = {f"{route}: {statement}": plan_problems(db, statement) for statement, route in statements.items()}
+    db.close()
+    assert {statement: lines for statement, lines in problems.items() if lines} == {}
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from packages import create_app
+from packages.snapshot import compile_snapshot
+
+EVENT = {"date": "1969-07-20", "title": "Moon landing", "image_url": "/static/images/earth.png",
+         "description": "Apollo 11"}
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "app.snapshot")
+
+
+@pytest.fixture
+def readonly(config, snapshot_path):
+    """
+    A read-only application serving `snapshot_path`, which is checked for a new file on every request.
+    """
+    app = create_app({**config, "SNAPSHOT_PATH": snapshot_path, "SNAPSHOT_CHECK_INTERVAL": 0})
+    yield app
+    pool = app.extensions.get('db_pool')
+    if pool is not None:
+        pool.close()
+    app.extensions['versions'].close()
+
+
+def publish(app, snapshot_path: str):
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        compile_snapshot(db, snapshot_path)
+    db.close()
+
+
+@pytest.mark.parametrize("path", ["/modules", "/modules/2", "/events/2", "/event/70", "/timeline", "/timeline/2",
+                                  "/timeline/2?from=1500&to=1700", "/timeline/3?buckets=century",
+                                  "/timeline/2?limit=7", "/questions/2", "/question/15"])
+def test_snapshot_serves_the_database_content(app, client, readonly, dataset, snapshot_path, path):
+    publish(app, snapshot_path)
+    expected = client.get(path)
+    response = readonly.test_client().get(path)
+
+    assert response.status_code == 200
+    assert response.get_json() == expected.get_json()
+    assert response.headers.get("Link") == expected.headers.get("Link")
+
+
+def test_games_draw_from_the_snapshot(app, readonly, dataset, snapshot_path):
+    publish(app, snapshot_path)
+    rounds = readonly.test_client().get("/game/session/chronological/2?rounds=3&events=4").get_json()["rounds"]
+
+    assert {event["event_id"] for game_round in rounds for event in game_round} <= set(range(61, 121))
+
+
+def test_writes_are_refused(app, readonly, dataset, snapshot_path):
+    publish(app, snapshot_path)
+    other = readonly.test_client()
+
+    assert other.post("/events/2", json=EVENT).status_code == 405
+    assert other.delete("/event/70").status_code == 405
+
+
+def test_new_snapshot_is_picked_up(app, client, readonly, dataset, snapshot_path):
+    other = readonly.test_client()
+    assert other.get("/events/2").status_code == 503
+
+    publish(app, snapshot_path)
+    first = other.get("/events/2")
+    client.post("/events/2", json=EVENT)
+    publish(app, snapshot_path)
+
+    response = other.get("/events/2", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200
+    assert len(response.get_json()) == len(first.get_json()) + 1
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from packages.backend import draw_round
+
+
+@pytest.fixture
+def config(config) -> dict:
+    config.update({"ROUND_POOL_SIZE": 4, "ROUND_POOL_LOW_WATER": 2})
+    return config
+
+
+def wait_for_rounds(pool, rounds: int):
+    deadline = time.monotonic() + 5
+    while pool.metrics()["rounds"] < rounds and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("number", [0, -1])
+def test_pop_rejects_numbers_below_one(app, dataset, number):
+    pool = app.extensions['round_pool']
+    module_id = str(dataset["module_ids"][0])
+    with app.app_context():
+        draw_round("image-name", module_id, 3)
+
+    assert pool.pop("image-name", module_id, number) is None
+    assert pool._scheduled == set()
+
+
+@pytest.mark.parametrize("module_id", ["999999", "abc"])
+def test_pop_does_not_fill_unknown_modules(app, dataset, module_id):
+    pool = app.extensions['round_pool']
+    with app.app_context():
+        draw_round("higher-lower", module_id)
+
+    assert pool.pop("higher-lower", module_id) is None
+    assert pool._scheduled == set()
+    assert pool.metrics()["queues"] == 0
+
+
+def test_pop_fills_modules_with_rows(app, dataset):
+    pool = app.extensions['round_pool']
+    module_id = str(dataset["module_ids"][0])
+    assert pool.pop("higher-lower", module_id) is None
+    with app.app_context():
+        draw_round("higher-lower", module_id)
+
+    assert pool.pop("higher-lower", module_id) is None
+    wait_for_rounds(pool, 4)
+
+    assert len(app.json.loads(pool.pop("higher-lower", module_id))) == 2
+
+
+def test_pop_skips_rounds_of_modules_written_by_other_workers(client, worker, dataset):
+    pool = worker.extensions['round_pool']
+    module_id = str(dataset["module_ids"][0])
+    with worker.app_context():
+        draw_round("higher-lower", module_id)
+    pool.pop("higher-lower", module_id)
+    wait_for_rounds(pool, 4)
+    other_module = str(dataset["module_ids"][1])
+    with worker.app_context():
+        draw_round("higher-lower", other_module)
+    pool.pop("higher-lower", other_module)
+    wait_for_rounds(pool, 8)
+
+    event_id = client.get(f"/events/{module_id}").get_json()[0]
+    client.put(f"/event/{event_id}", json={"date": "1969-07-20", "title": "Moon landing",
+                                           "image_url": "/static/images/earth.png", "description": "Apollo 11"})
+
+    assert pool.pop("higher-lower", module_id) is None
+    assert pool.metrics()["discarded"] == 4
+    assert pool.pop("higher-lower", other_module) is not None
@@ -0,0 +1,141 @@
+import sqlite3
+
+import pytest
+
+from packages import create_app
+from packages.scores import Leaderboards, Score
+
+
+@pytest.fixture
+def config(config) -> dict:
+    config.update({"SCORING_ENABLED": True, "SECRET_KEY": "test"})
+    return config
+
+
+def correct_answer(app, question_id: int) -> str:
+    with sqlite3.connect(app.config['DATABASE']) as db:
+        answer = db.execute("SELECT answer FROM question_answers WHERE fk_question_id = ? AND is_correct = 1",
+                            (question_id,)).fetchone()[0]
+    db.close()
+    return answer
+
+
+def test_scored_rounds_leave_the_answers_out(client, dataset):
+    module_id = dataset["module_ids"][0]
+
+    trivia = client.get(f"/game/trivia/{module_id}").get_json()
+    higher_lower = client.get(f"/game/higher-lower/{module_id}").get_json()
+    chronological = client.get(f"/game/chronological/{module_id}/5").get_json()
+    image_date = client.get(f"/game/image-date/{module_id}/4").get_json()
+
+    assert "correct_answer" not in trivia and trivia["round_token"]
+    for game_round in (higher_lower, chronological, image_date):
+        assert game_round["round_token"]
+        assert all("date" not in event and "year" not in event for event in game_round["events"])
+    assert len(higher_lower["events"]) == 2 and len(chronological["events"]) == 5
+    assert image_date["years"] == sorted(image_date["years"]) and len(image_date["years"]) == 4
+
+
+def test_session_rounds_carry_tokens(client, dataset):
+    module_id = dataset["module_ids"][0]
+
+    rounds = client.get(f"/game/session/chronological/{module_id}?rounds=3&events=3").get_json()["rounds"]
+
+    assert len({game_round["round_token"] for game_round in rounds}) == 3
+
+
+def test_rounds_are_scored_once(app, client, dataset):
+    module_id = dataset["module_ids"][0]
+    trivia = client.get(f"/game/trivia/{module_id}").get_json()
+    answer = {"round_token": trivia["round_token"], "answer": correct_answer(app, trivia["question_id"])}
+
+    first = client.post(f"/scores/trivia/{module_id}", json={"player": "ana", "answers": [answer]})
+    again = client.post(f"/scores/trivia/{module_id}", json={"player": "ana", "answers": [answer]})
+    twice = client.post(f"/scores/trivia/{module_id}", json={"player": "ana", "answers": [answer, answer]})
+
+    assert first.get_json()["score"] == 1
+    assert again.status_code == 409
+    assert twice.status_code == 400
+
+
+def test_checking_a_round_uses_its_token(client, dataset):
+    module_id = dataset["module_ids"][0]
+    higher_lower = client.get(f"/game/higher-lower/{module_id}").get_json()
+    answer = {"round_token": higher_lower["round_token"], "answer": "higher"}
+
+    assert client.post(f"/game/check/higher-lower/{module_id}", json=answer).status_code == 200
+    assert client.post(f"/game/check/higher-lower/{module_id}", json=answer).status_code == 409
+    assert client.post(f"/scores/higher-lower/{module_id}",
+                       json={"player": "ana", "answers": [answer]}).status_code == 409
+
+
+def test_answers_need_a_token_of_the_round(client, dataset):
+    module_id, other_module_id = dataset["module_ids"][:2]
+    token = client.get(f"/game/trivia/{other_module_id}").get_json()["round_token"]
+
+    for answer in ({"answer": "a"}, {"round_token": "forged", "answer": "a"}, {"round_token": token, "answer": "a"}):
+        response = client.post(f"/game/check/trivia/{module_id}", json=answer)
+        assert response.status_code == 400
+
+
+def test_chronological_and_image_date_answers(client, dataset):
+    module_id = dataset["module_ids"][0]
+    chronological = client.get(f"/game/chronological/{module_id}/3").get_json()
+    image_date = client.get(f"/game/image-date/{module_id}/3").get_json()
+    event_ids = [event["event_id"] for event in chronological["events"]]
+
+    wrong_events = client.post(f"/game/check/chronological/{module_id}",
+                               json={"round_token": chronological["round_token"], "event_ids": event_ids[:2]})
+    ordered = client.post(f"/game/check/chronological/{module_id}",
+                          json={"round_token": chronological["round_token"], "event_ids": event_ids})
+    dated = client.post(f"/game/check/image-date/{module_id}",
+                        json={"round_token": image_date["round_token"], "years": image_date["years"]})
+
+    assert wrong_events.status_code == 400
+    assert ordered.status_code == 200 and isinstance(ordered.get_json()["correct"], bool)
+    assert dated.status_code == 200 and isinstance(dated.get_json()["correct"], bool)
+
+
+def test_scoring_is_disabled_by_default(config, dataset):
+    config.pop("SCORING_ENABLED")
+    app = create_app(config)
+    client = app.test_client()
+    module_id = dataset["module_ids"][0]
+
+    trivia = client.get(f"/game/trivia/{module_id}").get_json()
+    response = client.post(f"/game/check/trivia/{module_id}", json={"answer": trivia["correct_answer"]})
+
+    assert "round_token" not in trivia
+    assert response.status_code == 404
+    app.extensions['versions'].close()
+
+
+def test_scoring_needs_a_secret_key(config):
+    config.pop("SECRET_KEY")
+
+    with pytest.raises(ValueError):
+        create_app(config)
+
+
+class BoardCursor:
+    """
+    Stands in for the cursor of `Leaderboards.top()`, running `during` in place of the query.
+    """
+
+    def __init__(self, during):
+        self.during = during
+
+    def execute(self, statement, parameters):
+        self.during()
+        return []
+
+
+def test_leaderboard_reads_without_the_lock():
+    leaderboards = Leaderboards(size=3)
+    score = Score(1, "trivia", "ana", 5, 5, 1.0)
+
+    def during():
+        assert not leaderboards._lock.locked()
+        leaderboards.record(score)
+
+    assert leaderboards.top(BoardCursor(during), "trivia", 1) == [score]
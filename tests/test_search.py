@@ -0,0 +1,37 @@
+import pytest
+
+EVENT = {"date": "1410-07-15", "title": "Battle of Grunwald", "image_url": "/static/images/earth.png",
+         "description": "Poland and Lithuania defeat the Teutonic Order"}
+
+
+def test_search_finds_new_events_by_prefix(client, dataset):
+    module_id = dataset["module_ids"][1]
+    event_id = client.post(f"/events/{module_id}", json=EVENT).get_json()["id"]
+
+    results = client.get("/search?q=teutonic grunw").get_json()
+    assert [(result["type"], result["id"], result["module_id"]) for result in results] == [("event", event_id, module_id)]
+    assert "<mark>" in results[0]["snippet"]
+
+
+def test_search_forgets_deleted_events(client, dataset):
+    module_id = dataset["module_ids"][1]
+    event_id = client.post(f"/events/{module_id}", json=EVENT).get_json()["id"]
+    client.delete(f"/event/{event_id}")
+
+    assert client.get("/search?q=grunwald").get_json() == []
+
+
+def test_search_filters_and_pages(client, dataset):
+    module_id = dataset["module_ids"][2]
+    results = client.get(f"/search?q=synthetic&module_id={module_id}&type=event&limit=50").get_json()
+    assert len(results) == 50
+    assert {(result["type"], result["module_id"]) for result in results} == {("event", module_id)}
+
+    response = client.get(f"/search?q=synthetic&module_id={module_id}&type=event&limit=50&offset=50")
+    assert len(response.get_json()) == 10
+    assert "Link" not in response.headers
+
+
+@pytest.mark.parametrize("query", ["limit=0", "offset=-1", "type=module"])
+def test_invalid_search_arguments(client, dataset, query):
+    assert client.get(f"/search?q=battle&{query}").status_code == 400
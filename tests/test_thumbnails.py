@@ -0,0 +1,173 @@
+import io
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+from packages import thumbnails
+from tests.conftest import IMAGES
+
+
+class StubResponse(io.BytesIO):
+    def __init__(self, content: bytes, content_type="image/png"):
+        super().__init__(content)
+        self.headers = {"Content-Type": content_type}
+
+
+@pytest.fixture
+def opened(monkeypatch) -> list:
+    """
+    Replaces the network with a stub that answers every request with `static/images/earth.png`.
+
+    Returns:
+        list: The URLs requested so far.
+    """
+    with open(os.path.join(IMAGES, "earth.png"), "rb") as f:
+        content = f.read()
+    urls = []
+
+    def open_url(request, timeout=None):
+        urls.append(request.full_url)
+        return StubResponse(content, "text/html" if request.full_url.endswith(".html") else "image/png")
+    monkeypatch.setattr(thumbnails.opener, "open", open_url)
+    return urls
+
+
+def test_fetch_url_downloads_remote_images(app, opened):
+    with app.test_request_context():
+        content = thumbnails.fetch_url("https://upload.wikimedia.org/wikipedia/commons/a/a1/Earth.png")
+
+    assert thumbnails.sniff(content) == "png"
+    assert opened == ["https://upload.wikimedia.org/wikipedia/commons/a/a1/Earth.png"]
+
+
+def test_fetch_url_reads_static_files_without_downloading(app, opened):
+    with app.test_request_context():
+        content = thumbnails.fetch_url("/static/images/earth.png")
+
+    assert thumbnails.sniff(content) == "png"
+    assert opened == []
+
+
+@pytest.mark.parametrize("url", ["http://127.0.0.1:9/secret.png", "http://localhost:9/secret.png",
+                                 "http://169.254.169.254/latest/meta-data", "http://[::ffff:10.0.0.1]:9/x.png"])
+def test_fetch_url_refuses_non_public_addresses(app, url):
+    with app.test_request_context(), pytest.raises(OSError, match="no public address"):
+        thumbnails.fetch_url(url)
+
+
+def test_fetch_url_refuses_non_image_responses(app, opened):
+    with app.test_request_context(), pytest.raises(thumbnails.UnsupportedImage):
+        thumbnails.fetch_url("https://example.com/index.html")
+
+
+@pytest.fixture
+def source(app) -> dict:
+    """
+    Serves thumbnail sources from a dict of URL to bytes, filled by the test.
+    """
+    sources = {}
+    app.config["IMAGE_FETCHER"] = sources.__getitem__
+    return sources
+
+
+def add_event(client, image_url: str) -> int:
+    module = client.post("/modules", json={"title": "Space", "image_url": image_url, "description": "Test"})
+    event = client.post(f"/events/{module.get_json()['id']}", json={"date": "1969-07-20", "title": "Moon landing",
+                                                                      "image_url": image_url,
+                                                                      "description": "Apollo 11"})
+    return event.get_json()["id"]
+
+
+def test_thumbnail_of_non_image_is_415(client, source):
+    source["https://example.com/secret"] = b"root:x:0:0:root:/root:/bin/bash\n"
+    event_id = add_event(client, "https://example.com/secret")
+
+    response = client.get(f"/thumbnails/event/{event_id}/160")
+
+    assert response.status_code == 415
+    assert b"root:x" not in response.data
+
+
+def test_thumbnail_without_pillow_is_415(client, source, monkeypatch):
+    monkeypatch.setitem(sys.modules, "PIL", None)
+    with open(os.path.join(IMAGES, "earth.png"), "rb") as f:
+        source["https://example.com/earth.png"] = f.read()
+    event_id = add_event(client, "https://example.com/earth.png")
+
+    response = client.get(f"/thumbnails/event/{event_id}/160")
+
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("image, size, expected", [("polish_uprisings.jpg", 320, (320, 210)),
+                                                   ("USA_presidents.jpg", 160, (134, 160)),
+                                                   ("earth.png", 640, (600, 600))])
+def test_thumbnail_is_resized_and_cached(app, client, image, size, expected):
+    event_id = add_event(client, f"/static/images/{image}")
+    cache = app.extensions['thumbnails']
+
+    response = client.get(f"/thumbnails/event/{event_id}/{size}")
+
+    assert response.status_code == 200
+    assert response.mimetype in ("image/webp", "image/jpeg")
+    with Image.open(io.BytesIO(response.data)) as thumbnail:
+        assert thumbnail.format == {"image/webp": "WEBP", "image/jpeg": "JPEG"}[response.mimetype]
+        assert thumbnail.size == expected
+    assert cache.metrics()["misses"] == 1
+
+    again = client.get(f"/thumbnails/event/{event_id}/{size}")
+    assert again.data == response.data
+    assert cache.metrics()["hits"] == 1 and cache.metrics()["entries"] == 1
+
+
+def test_thumbnail_is_revalidated_with_its_etag(client):
+    event_id = add_event(client, "/static/images/earth.png")
+    first = client.get(f"/thumbnails/event/{event_id}/160")
+
+    response = client.get(f"/thumbnails/event/{event_id}/160", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == first.headers["ETag"]
+    assert response.headers["Cache-Control"] == first.headers["Cache-Control"]
+
+
+@pytest.mark.parametrize("size, bucket", [(100, 160), (200, 320), (480, 640), (4000, 640)])
+def test_other_sizes_redirect_to_a_bucket(client, size, bucket):
+    event_id = add_event(client, "/static/images/earth.png")
+
+    response = client.get(f"/thumbnails/event/{event_id}/{size}")
+
+    assert response.status_code == 308
+    assert response.headers["Location"].endswith(f"/thumbnails/event/{event_id}/{bucket}")
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = thumbnails.ThumbnailCache(str(tmp_path), max_bytes=250)
+    cache.put("a", "webp", b"a" * 100)
+    cache.put("b", "webp", b"b" * 100)
+    assert cache.get("a") == ("webp", b"a" * 100)
+
+    cache.put("c", "jpg", b"c" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == ("jpg", b"c" * 100)
+    assert sorted(os.listdir(tmp_path)) == ["a.webp", "c.jpg"]
+    assert cache.metrics() == {"entries": 2, "bytes": 200, "max_bytes": 250, "hits": 2, "misses": 1,
+                               "evictions": 1}
+
+
+def test_cache_index_is_rebuilt_oldest_first(tmp_path):
+    for age, key in enumerate(["new", "old", "middle"]):
+        path = tmp_path / f"{key}.webp"
+        path.write_bytes(b"x" * 100)
+        mtime = 1_000_000 - {"new": 0, "old": 2, "middle": 1}[key] * 1000
+        os.utime(path, (mtime, mtime))
+    (tmp_path / "notes.txt").write_text("not a thumbnail")
+
+    cache = thumbnails.ThumbnailCache(str(tmp_path), max_bytes=350)
+    assert cache.metrics()["bytes"] == 300
+    cache.put("latest", "webp", b"x" * 100)
+
+    assert sorted(os.listdir(tmp_path)) == ["latest.webp", "middle.webp", "new.webp", "notes.txt"]
@@ -0,0 +1,40 @@
+import pytest
+
+from packages.dates import date_key
+
+
+def test_range_is_inclusive_of_whole_periods(client, dataset):
+    module_id = dataset["module_ids"][1]
+    events = client.get(f"/timeline/{module_id}?limit=500").get_json()
+    ranged = client.get(f"/timeline/{module_id}?from=1500&to=1700&limit=500").get_json()
+
+    assert 0 < len(ranged) < len(events)
+    assert ranged == [event for event in events if 15000101 <= date_key(event["date"]) <= 17001231]
+    assert [date_key(event["date"]) for event in ranged] == sorted(date_key(event["date"]) for event in ranged)
+
+
+def test_range_sees_new_events(client, dataset):
+    module_id = dataset["module_ids"][1]
+    client.get(f"/timeline/{module_id}?from=1700-12&to=1700-12")
+    client.post(f"/events/{module_id}", json={"date": "1700-12-31", "title": "Last day of the century",
+                                              "image_url": "/static/images/earth.png", "description": "Not 1701"})
+
+    dates = [event["date"] for event in client.get(f"/timeline/{module_id}?from=1700-12&to=1700-12").get_json()]
+    assert "1700-12-31" in dates
+
+
+@pytest.mark.parametrize("buckets, years", [("decade", 10), ("century", 100)])
+def test_buckets_count_every_event(client, dataset, buckets, years):
+    module_id = dataset["module_ids"][1]
+    keys = [date_key(event["date"]) for event in client.get(f"/timeline/{module_id}?limit=500").get_json()]
+    counts = client.get(f"/timeline/{module_id}?buckets={buckets}").get_json()
+
+    assert sum(bucket["count"] for bucket in counts) == len(keys)
+    for bucket in counts:
+        assert bucket["end"] - bucket["start"] == years - 1
+        assert bucket["count"] == sum(bucket["start"] <= key // 10000 <= bucket["end"] for key in keys)
+
+
+@pytest.mark.parametrize("query", ["from=soon", "to=1700-13", "buckets=millennium"])
+def test_invalid_timeline_arguments(client, dataset, query):
+    assert client.get(f"/timeline?{query}").status_code == 400